@@ -0,0 +1,409 @@
+"""
+翻译后端
+定义 PDFProcessor、调度器和界面依赖的后端接口，并提供两个不需要本地大模型的实现：
+- StubBackend：确定性的本地替身，可配置延迟，用于在没有 GPU 的机器上压测和基准测试
+- OpenAICompatibleBackend：调用 OpenAI 兼容的 /v1/chat/completions 接口（可由本地模拟服务满足）
+"""
+import json
+import logging
+import threading
+import time
+import urllib.error
+import urllib.request
+from typing import Optional, Dict, Any, Iterator, Protocol
+
+from chunker import estimate_tokens
+from generation_budget import STOP_BUDGET, STOP_EOS, generation_budget, generation_stats
+from postprocess import postprocess
+from prompts import build_prompt
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("chatglm", "stub", "openai")
+
+
+class TranslationBackend(Protocol):
+    """
+    翻译后端接口
+
+    translate 和 translate_batch 返回的结果字典格式与 ChatGLMTranslator 一致：
+    成功时 {"success": True, "translated_text", "source_language", "target_language"}，
+    失败时 {"success": False, "error", "translated_text": ""}。
+    translate_stream 先产出 finished=False 的部分结果，最后产出一条 finished=True 的完整结果。
+    """
+
+    device: str
+
+    def translate(self, text: str, source_language: str = "English", target_language: str = "Chinese") -> Dict[str, Any]:
+        ...
+
+    def translate_batch(self, texts: list, source_language: str = "English", target_language: str = "Chinese") -> list:
+        ...
+
+    def translate_stream(
+        self, text: str, source_language: str = "English", target_language: str = "Chinese"
+    ) -> Iterator[Dict[str, Any]]:
+        ...
+
+
+def _empty_text_result() -> Dict[str, Any]:
+    return {
+        "success": False,
+        "error": "文本为空",
+        "translated_text": ""
+    }
+
+
+class StubBackend:
+    """确定性的本地替身后端"""
+
+    def __init__(
+        self,
+        latency_ms: Optional[float] = None,
+        token_latency_ms: Optional[float] = None,
+        memory=None
+    ):
+        """
+        Args:
+            latency_ms: 每次调用的固定延迟（模拟预填充），批量调用只计一次
+            token_latency_ms: 每个输出 token 的延迟（模拟解码），批量调用按最长的一条计
+            memory: 翻译记忆实例，便于测试缓存命中，为 None 时不使用
+        """
+        from config import STUB_LATENCY_MS, STUB_TOKEN_LATENCY_MS
+
+        self.latency = (latency_ms if latency_ms is not None else STUB_LATENCY_MS) / 1000
+        self.token_latency = (token_latency_ms if token_latency_ms is not None else STUB_TOKEN_LATENCY_MS) / 1000
+        self.memory = memory
+        self.device = "cpu"
+        self.model_path = "stub"
+        self._calls = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def render(text: str, target_language: str) -> str:
+        """替身的“译文”：在原文前加上目标语言标记，同样的输入总是得到同样的输出"""
+        return f"[{target_language}] {text.strip()}"
+
+    def count_tokens(self, text: str) -> int:
+        return estimate_tokens(text)
+
+    def chunk_token_budget(self, source_language: str, target_language: str) -> int:
+        from config import CHUNK_MAX_TOKENS
+        return CHUNK_MAX_TOKENS
+
+    def _cached(self, text: str, source_language: str, target_language: str):
+        if self.memory is None:
+            return None, None
+        key = self.memory.make_key(text, source_language, target_language, {"backend": "stub"})
+        translated_text = self.memory.get(key)
+        if translated_text is None:
+            return key, None
+        return key, {
+            "success": True,
+            "translated_text": translated_text,
+            "source_language": source_language,
+            "target_language": target_language,
+            "cached": True
+        }
+
+    def translate(self, text: str, source_language: str = "English", target_language: str = "Chinese", **kwargs) -> Dict[str, Any]:
+        """
+        翻译文本（替身）
+
+        Args:
+            text: 待翻译的文本
+            source_language: 源语言
+            target_language: 目标语言
+
+        Returns:
+            翻译结果字典
+        """
+        return self.translate_batch([text], source_language, target_language)[0]
+
+    def translate_batch(self, texts: list, source_language: str = "English", target_language: str = "Chinese", **kwargs) -> list:
+        """
+        批量翻译（替身），延迟为一次固定延迟加上最长一条的逐 token 延迟
+
+        Args:
+            texts: 待翻译的文本列表
+            source_language: 源语言
+            target_language: 目标语言
+
+        Returns:
+            翻译结果列表
+        """
+        results = [None] * len(texts)
+        pending = {}
+        for idx, text in enumerate(texts):
+            if not text or not text.strip():
+                results[idx] = _empty_text_result()
+                continue
+            key, cached = self._cached(text, source_language, target_language)
+            if cached:
+                results[idx] = cached
+            else:
+                pending[idx] = key
+
+        if pending:
+            outputs = {idx: self.render(texts[idx], target_language) for idx in pending}
+            longest = max(self.count_tokens(output) for output in outputs.values())
+            time.sleep(self.latency + self.token_latency * longest)
+            with self._lock:
+                self._calls += 1
+            for idx, key in pending.items():
+                results[idx] = {
+                    "success": True,
+                    "translated_text": outputs[idx],
+                    "source_language": source_language,
+                    "target_language": target_language
+                }
+                if key is not None:
+                    self.memory.put(key, outputs[idx])
+        return results
+
+    def translate_stream(
+        self, text: str, source_language: str = "English", target_language: str = "Chinese", **kwargs
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        流式翻译（替身），按词产出部分结果
+
+        Yields:
+            部分结果或最终结果字典
+        """
+        if not text or not text.strip():
+            result = _empty_text_result()
+            result["finished"] = True
+            yield result
+            return
+
+        key, cached = self._cached(text, source_language, target_language)
+        if cached:
+            cached["finished"] = True
+            yield cached
+            return
+
+        output = self.render(text, target_language)
+        start = time.perf_counter()
+        time.sleep(self.latency)
+        first_token_at = None
+        words = output.split(" ")
+        for i in range(len(words)):
+            partial = " ".join(words[:i + 1])
+            time.sleep(self.token_latency * self.count_tokens(words[i]))
+            first_token_at = first_token_at or time.perf_counter()
+            yield {"success": True, "translated_text": partial, "finished": False}
+        end = time.perf_counter()
+
+        if key is not None:
+            self.memory.put(key, output)
+        output_tokens = self.count_tokens(output)
+        decode_time = end - first_token_at
+        yield {
+            "success": True,
+            "translated_text": output,
+            "source_language": source_language,
+            "target_language": target_language,
+            "finished": True,
+            "ttft_ms": (first_token_at - start) * 1000,
+            "output_tokens": output_tokens,
+            "tokens_per_second": output_tokens / decode_time if decode_time > 0 else 0.0
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """调用统计"""
+        with self._lock:
+            return {"calls": self._calls}
+
+
+class OpenAICompatibleBackend:
+    """OpenAI 兼容的 HTTP 后端（/v1/chat/completions）"""
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        model: Optional[str] = None,
+        api_key: Optional[str] = None,
+        timeout: Optional[float] = None
+    ):
+        """
+        Args:
+            base_url: 接口地址，例如 http://127.0.0.1:8000/v1
+            model: 模型名称
+            api_key: API 密钥，可为空
+            timeout: 请求超时（秒）
+        """
+        from config import OPENAI_BASE_URL, OPENAI_MODEL, OPENAI_API_KEY, OPENAI_TIMEOUT
+
+        self.base_url = (base_url or OPENAI_BASE_URL).rstrip("/")
+        self.model_path = model or OPENAI_MODEL
+        self.api_key = api_key if api_key is not None else OPENAI_API_KEY
+        self.timeout = timeout or OPENAI_TIMEOUT
+        self.device = "remote"
+
+    def count_tokens(self, text: str) -> int:
+        return estimate_tokens(text)
+
+    def chunk_token_budget(self, source_language: str, target_language: str) -> int:
+        from config import CHUNK_MAX_TOKENS
+        return CHUNK_MAX_TOKENS
+
+    def _request(self, prompt: str, stream: bool, max_length: Optional[int], top_p: Optional[float], temperature: Optional[float]):
+        from config import MAX_LENGTH, TOP_P, TEMPERATURE
+
+        payload = {
+            "model": self.model_path,
+            "messages": [{"role": "user", "content": prompt}],
+            "max_tokens": max_length or MAX_LENGTH,
+            "top_p": top_p or TOP_P,
+            "temperature": temperature or TEMPERATURE,
+            "stream": stream
+        }
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        request = urllib.request.Request(
+            f"{self.base_url}/chat/completions",
+            data=json.dumps(payload).encode("utf-8"),
+            headers=headers,
+            method="POST"
+        )
+        return urllib.request.urlopen(request, timeout=self.timeout)
+
+    def translate(
+        self,
+        text: str,
+        source_language: str = "English",
+        target_language: str = "Chinese",
+        max_length: Optional[int] = None,
+        top_p: Optional[float] = None,
+        temperature: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        翻译文本
+
+        Args:
+            text: 待翻译的文本
+            source_language: 源语言
+            target_language: 目标语言
+            max_length: 最大生成 token 数，默认按原文长度计算（见 generation_budget）
+            top_p: top_p 参数
+            temperature: temperature 参数
+
+        Returns:
+            翻译结果字典
+        """
+        if not text or not text.strip():
+            return _empty_text_result()
+        try:
+            prompt = build_prompt(text, source_language, target_language)
+            max_length = max_length or generation_budget(estimate_tokens(text), target_language)
+            with self._request(prompt, False, max_length, top_p, temperature) as response:
+                body = json.loads(response.read().decode("utf-8"))
+            choice = body["choices"][0]
+            result = postprocess(choice["message"]["content"], source_language, target_language)
+            usage = body.get("usage") or {}
+            if "completion_tokens" in usage:
+                reason = STOP_BUDGET if choice.get("finish_reason") == "length" else STOP_EOS
+                result.update(generation_stats(usage["completion_tokens"], 0, max_length, reason))
+            return result
+        except (urllib.error.URLError, OSError, ValueError, KeyError, IndexError) as e:
+            logger.error(f"翻译失败: {str(e)}")
+            return {
+                "success": False,
+                "error": str(e),
+                "translated_text": ""
+            }
+
+    def translate_batch(self, texts: list, source_language: str = "English", target_language: str = "Chinese", **kwargs) -> list:
+        """
+        批量翻译：逐条请求，由服务端自行组批
+
+        Returns:
+            翻译结果列表
+        """
+        return [self.translate(text, source_language, target_language, **kwargs) for text in texts]
+
+    def translate_stream(
+        self,
+        text: str,
+        source_language: str = "English",
+        target_language: str = "Chinese",
+        max_length: Optional[int] = None,
+        top_p: Optional[float] = None,
+        temperature: Optional[float] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        流式翻译，解析服务端的 SSE 增量
+
+        Yields:
+            部分结果或最终结果字典
+        """
+        if not text or not text.strip():
+            result = _empty_text_result()
+            result["finished"] = True
+            yield result
+            return
+
+        start = time.perf_counter()
+        first_token_at = None
+        content = ""
+        try:
+            prompt = build_prompt(text, source_language, target_language)
+            max_length = max_length or generation_budget(estimate_tokens(text), target_language)
+            with self._request(prompt, True, max_length, top_p, temperature) as response:
+                for raw_line in response:
+                    line = raw_line.decode("utf-8").strip()
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                    if not delta:
+                        continue
+                    first_token_at = first_token_at or time.perf_counter()
+                    content += delta
+                    yield {"success": True, "translated_text": content, "finished": False}
+        except (urllib.error.URLError, OSError, ValueError, KeyError, IndexError) as e:
+            logger.error(f"流式翻译失败: {str(e)}")
+            yield {
+                "success": False,
+                "error": str(e),
+                "translated_text": "",
+                "finished": True
+            }
+            return
+        end = time.perf_counter()
+
+        result = postprocess(content, source_language, target_language)
+        output_tokens = self.count_tokens(content)
+        first_token_at = first_token_at or end
+        decode_time = end - first_token_at
+        result["finished"] = True
+        result["ttft_ms"] = (first_token_at - start) * 1000
+        result["output_tokens"] = output_tokens
+        result["tokens_per_second"] = output_tokens / decode_time if decode_time > 0 else 0.0
+        yield result
+
+
+def create_translator(backend: Optional[str] = None):
+    """
+    按配置创建翻译后端
+
+    Args:
+        backend: chatglm、stub 或 openai，默认使用 TRANSLATION_BACKEND
+
+    Returns:
+        翻译后端实例
+    """
+    from config import TRANSLATION_BACKEND
+
+    backend = (backend or TRANSLATION_BACKEND).lower()
+    if backend == "stub":
+        return StubBackend()
+    if backend == "openai":
+        return OpenAICompatibleBackend()
+    if backend != "chatglm":
+        raise ValueError(f"不支持的翻译后端: {backend}，可选: {', '.join(BACKENDS)}")
+    from translator import ChatGLMTranslator
+    return ChatGLMTranslator()
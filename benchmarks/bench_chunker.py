@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+分段基准测试
+
+比较按 2000 字符硬切分与按段落/句子边界 + token 预算打包两种方式：
+每页块数、预算填充浪费（未用满的 token 比例）以及切在句子中间的块数。
+
+用法:
+    python benchmarks/bench_chunker.py                      # 合成文本，估算 token
+    python benchmarks/bench_chunker.py --pdf book.pdf --tokenizer THUDM/chatglm2-6b
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chunker import split_text, estimate_tokens
+
+SENTENCE_END_RE = re.compile(r"[.!?。！？；…\"'”’)]\s*$")
+
+WORDS = (
+    "system data model translation page chapter network memory process thread "
+    "request latency throughput cache token budget sentence paragraph document"
+).split()
+
+
+def synthetic_pages(num_pages, seed=0):
+    """生成长短不一的英文页面"""
+    rng = random.Random(seed)
+    pages = []
+    for _ in range(num_pages):
+        paragraphs = []
+        for _ in range(rng.randint(2, 12)):
+            sentences = []
+            for _ in range(rng.randint(2, 10)):
+                words = [rng.choice(WORDS) for _ in range(rng.randint(5, 30))]
+                sentences.append(" ".join(words).capitalize() + ".")
+            paragraphs.append(" ".join(sentences))
+        pages.append("\n\n".join(paragraphs))
+    return pages
+
+
+def pdf_pages(pdf_path):
+    from pdf_processor import PDFProcessor
+    return [page["text"] for page in PDFProcessor().iter_pages(pdf_path)]
+
+
+def naive_split(text, max_chars=2000):
+    return [text[i:i + max_chars] for i in range(0, len(text), max_chars)]
+
+
+def evaluate(name, pages, splitter, count_tokens, budget):
+    start = time.perf_counter()
+    total_chunks = 0
+    used_tokens = 0
+    broken = 0
+    for text in pages:
+        if not text.strip():
+            continue
+        chunks = splitter(text)
+        total_chunks += len(chunks)
+        for chunk in chunks[:-1]:
+            if not SENTENCE_END_RE.search(chunk):
+                broken += 1
+        used_tokens += sum(count_tokens(chunk) for chunk in chunks)
+    elapsed = time.perf_counter() - start
+    capacity = total_chunks * budget
+    waste = 1 - used_tokens / capacity if capacity else 0.0
+    pages_with_text = sum(1 for text in pages if text.strip())
+    print(f"{name:<12} 块数/页: {total_chunks / max(pages_with_text, 1):.2f}  "
+          f"预算浪费: {waste:.1%}  句中切断: {broken}  耗时: {elapsed:.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="分段基准测试")
+    parser.add_argument("--pdf", help="使用真实 PDF 的页面文本")
+    parser.add_argument("--pages", type=int, default=200, help="合成页数")
+    parser.add_argument("--tokenizer", help="用于计数的 tokenizer，默认按字符估算")
+    parser.add_argument("--budget", type=int, default=900, help="每块的原文 token 预算")
+    args = parser.parse_args()
+
+    count_tokens = estimate_tokens
+    if args.tokenizer:
+        from transformers import AutoTokenizer
+        tokenizer = AutoTokenizer.from_pretrained(args.tokenizer, trust_remote_code=True)
+        count_tokens = lambda text: len(tokenizer.encode(text, add_special_tokens=False))
+
+    pages = pdf_pages(args.pdf) if args.pdf else synthetic_pages(args.pages)
+    print("=" * 70)
+    print(f"页数: {len(pages)}  token 预算: {args.budget}  计数: {args.tokenizer or '估算'}")
+    # 硬切分的块可能超出预算，浪费按实际 token 与预算之差计算（超出时为负）
+    evaluate("2000 字符", pages, naive_split, count_tokens, args.budget)
+    evaluate("句子打包", pages, lambda text: split_text(text, args.budget, count_tokens),
+             count_tokens, args.budget)
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+连续批处理 vs 静态批处理基准测试
+
+使用小型本地替身模型（默认 sshleifer/tiny-gpt2），在长短混合的分段负载（大量标题、图注和少量长段落）上比较：
+    static      BatchScheduler 组批后调用 translate_batch（同批序列一起开始、一起结束）
+    continuous  ContinuousBatchingEngine（每个解码步骤都可以加入和离开）
+报告吞吐（条/秒、输出 tokens/秒）和每条请求的延迟分位数。
+
+替身模型不会按原文长度输出结束 token，因此两种方式都按“译文 token 数 = 原文 token 数 × --output-ratio”
+截断每条输出；静态批处理仍要生成到同批最长的一条为止，与真实模型遇到结束 token 时的开销一致。
+
+用法:
+    python benchmarks/bench_continuous_batching.py --requests 64 --batch-size 8
+    python benchmarks/bench_continuous_batching.py --rate 20          # 按泊松过程每秒到达 20 条
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault("TRANSLATION_MEMORY_ENABLED", "False")
+
+import torch
+
+from bench_batch import StandInTranslator
+from continuous_batching import ContinuousBatchingEngine
+from scheduler import BatchScheduler
+
+SHORT_TEXTS = [
+    "Chapter 3",
+    "Figure 2.1: System overview",
+    "Table of Contents",
+    "Introduction",
+    "References",
+    "Listing 4: Retry loop",
+]
+
+WORDS = (
+    "system data model translation page chapter network memory process thread "
+    "request latency throughput cache token budget sentence paragraph document"
+).split()
+
+
+def make_workload(count: int, long_ratio: float, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(count):
+        if rng.random() < long_ratio:
+            texts.append(" ".join(rng.choice(WORDS) for _ in range(rng.randint(60, 120))).capitalize() + ".")
+        else:
+            texts.append(rng.choice(SHORT_TEXTS))
+    return texts
+
+
+class BudgetTranslator(StandInTranslator):
+    """按预设的译文长度截断输出的替身翻译器（静态批处理路径）"""
+
+    budgets = {}
+
+    def _generate_batch(self, prompts, max_length, top_p, temperature, criteria, processor=None):
+        self.tokenizer.padding_side = "left"
+        inputs = self.tokenizer(prompts, return_tensors="pt", padding=True)
+        prompt_length = inputs["input_ids"].shape[1]
+        budgets = [self.budgets[prompt] for prompt in prompts]
+        with torch.no_grad():
+            outputs = self.model.generate(
+                **inputs,
+                max_new_tokens=max(budgets),
+                min_new_tokens=max(budgets),
+                do_sample=True,
+                top_p=top_p,
+                temperature=temperature,
+                pad_token_id=self.tokenizer.pad_token_id,
+                logits_processor=self._logits_processor(processor)
+            )
+        return [
+            self.tokenizer.decode(output[prompt_length:prompt_length + budget], skip_special_tokens=True)
+            for output, budget in zip(outputs.tolist(), budgets)
+        ]
+
+
+class BudgetEngine(ContinuousBatchingEngine):
+    """按预设的译文长度结束序列的引擎（连续批处理路径）"""
+
+    budgets = {}
+
+    def _append_token(self, sequence, token):
+        sequence.generated.append(token)
+        return len(sequence.generated) >= self.budgets[sequence.text]
+
+
+async def drive(submit, texts: list, rate: float, seed: int = 0) -> tuple:
+    """按到达过程提交全部请求，返回总耗时和每条请求的延迟"""
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    latencies = [0.0] * len(texts)
+
+    async def one(idx: int, delay: float):
+        await asyncio.sleep(delay)
+        sent = time.perf_counter()
+        result = await submit(texts[idx])
+        if not result["success"]:
+            raise RuntimeError(result["error"])
+        latencies[idx] = time.perf_counter() - sent
+
+    delays = []
+    arrival = 0.0
+    for _ in texts:
+        delays.append(arrival)
+        if rate > 0:
+            arrival += rng.expovariate(rate)
+    await asyncio.gather(*(one(idx, delay) for idx, delay in enumerate(delays)))
+    return time.perf_counter() - start, latencies
+
+
+def percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def report(name: str, seconds: float, latencies: list, output_tokens: int, stats: dict):
+    print(f"{name:<11}{seconds:>8.2f}s {len(latencies) / seconds:>8.2f} {output_tokens / seconds:>10.1f} "
+          f"{percentile(latencies, 0.5) * 1000:>8.0f} {percentile(latencies, 0.95) * 1000:>8.0f} "
+          f"{max(latencies) * 1000:>8.0f} {stats.get('avg_batch_size', 0.0):>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="连续批处理 vs 静态批处理基准测试")
+    parser.add_argument("--model", default="sshleifer/tiny-gpt2", help="替身模型路径或名称")
+    parser.add_argument("--requests", type=int, default=64, help="请求条数")
+    parser.add_argument("--long-ratio", type=float, default=0.2, help="长段落所占比例")
+    parser.add_argument("--batch-size", type=int, default=8, help="静态批大小 / 连续批处理的槽位数")
+    parser.add_argument("--output-ratio", type=float, default=1.0, help="译文 token 数相对原文的比例")
+    parser.add_argument("--rate", type=float, default=0, help="每秒到达的请求数，0 表示同时到达")
+    args = parser.parse_args()
+
+    translator = BudgetTranslator(model_path=args.model, device="cpu", lazy=False)
+    texts = make_workload(args.requests, args.long_ratio)
+    budgets = {}
+    for text in set(texts):
+        budget = max(1, int(translator.count_tokens(text) * args.output_ratio))
+        budgets[text] = budget
+        budgets[translator._build_chat_prompt(translator._build_prompt(text, "English", "Chinese"))] = budget
+    BudgetTranslator.budgets = BudgetEngine.budgets = budgets
+    output_tokens = sum(budgets[text] for text in texts)
+    # 足够容纳最长提示词和译文，实际长度由预设的译文长度决定
+    max_length = 4096
+
+    scheduler = BatchScheduler(translator, max_batch_size=args.batch_size)
+    engine = BudgetEngine(translator, max_batch_size=args.batch_size, max_length=max_length)
+    # 预热
+    translator.translate_batch(texts[:2], max_batch_size=2, max_length=max_length)
+
+    short = sum(1 for text in texts if text in SHORT_TEXTS)
+    print("=" * 82)
+    print(f"请求: {len(texts)}（短 {short}，长 {len(texts) - short}）  输出 tokens: {output_tokens}  "
+          f"批大小: {args.batch_size}  到达率: {args.rate or '同时'}")
+    print(f"{'方式':<11}{'总耗时':>9} {'条/s':>8} {'tokens/s':>10} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'平均批':>8}")
+
+    seconds, latencies = asyncio.run(drive(scheduler.submit, texts, args.rate))
+    report("static", seconds, latencies, output_tokens, scheduler.stats())
+    seconds, latencies = asyncio.run(drive(engine.submit, texts, args.rate))
+    report("continuous", seconds, latencies, output_tokens, engine.stats())
+    print("=" * 82)
+
+    scheduler.shutdown()
+    engine.shutdown()
+
+
+if __name__ == "__main__":
+    main()
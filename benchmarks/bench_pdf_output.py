@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+PDF 输出阶段基准测试
+
+生成每页带一张随机图片（难以压缩）和固定文字量的合成 PDF，只比较输出阶段：
+    reflow   PDFProcessor._create_translated_pdf（ReportLab 重新排版）
+    blocks   BlockPDFWriter（按文字块写回，逐页复制到新文档）
+    inplace  InPlacePDFWriter（复制原文件后增量改写文字）
+译文由替身后端预先生成，不包含提取和翻译耗时。每种写入方式在独立子进程中运行，报告耗时、峰值 RSS
+和输出大小。reflow 会丢弃图片，输出最小；文字量不变而图片变大时，inplace 增加的耗时只有复制和保存一次文件，
+以及 MuPDF 涂改（redact）页面时读取该页图片的时间。
+
+用法:
+    python benchmarks/bench_pdf_output.py --pages 30 --image-kb 0,500,2000
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+WRITERS = ("reflow", "blocks", "inplace")
+
+
+def generate_pdf(path: str, pages: int, words_per_page: int, image_kb: int):
+    """生成每页带一张约 image_kb KB 随机图片的合成 PDF"""
+    import fitz
+    from bench_pdf_pipeline import generate_pdf as generate_text_pdf
+
+    generate_text_pdf(path, pages, words_per_page)
+    if not image_kb:
+        return
+    side = int((image_kb * 1024 / 3) ** 0.5)
+    doc = fitz.open(path)
+    for page in doc:
+        pixmap = fitz.Pixmap(fitz.csRGB, side, side, os.urandom(side * side * 3), False)
+        page.insert_image(fitz.Rect(400, 700, 560, 820), pixmap=pixmap)
+    doc.saveIncr()
+    doc.close()
+
+
+def translated_pages(pdf_path: str, with_blocks: bool) -> list:
+    """用替身后端的译文格式生成各页翻译结果"""
+    from backends import StubBackend
+    from pdf_processor import PDFProcessor
+
+    pages = []
+    for page_data in PDFProcessor().iter_pages(pdf_path, with_blocks=with_blocks):
+        page = dict(page_data, translated_text=StubBackend.render(page_data["text"], "Chinese"))
+        if with_blocks:
+            page["blocks"] = [
+                dict(block, translated_text=StubBackend.render(block["text"], "Chinese"))
+                for block in page_data["blocks"]
+            ]
+        pages.append(page)
+    return pages
+
+
+def peak_rss_mb() -> float:
+    """本进程的峰值 RSS（VmHWM 在 exec 后重新计算，ru_maxrss 会继承父进程的值）"""
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def child(writer: str, input_path: str, output_path: str, pages_path: str):
+    from pdf_processor import PDFProcessor
+    from pdf_writer import BlockPDFWriter, InPlacePDFWriter
+
+    with open(pages_path, "r", encoding="utf-8") as f:
+        pages = json.load(f)
+    start = time.perf_counter()
+    if writer == "reflow":
+        PDFProcessor()._create_translated_pdf(pages, output_path)
+    else:
+        writer_class = BlockPDFWriter if writer == "blocks" else InPlacePDFWriter
+        with writer_class(output_path, input_path, "Chinese") as pdf_writer:
+            for page in pages:
+                pdf_writer.add_page(page)
+    seconds = time.perf_counter() - start
+    print(json.dumps({
+        "seconds": seconds,
+        "peak_rss_mb": peak_rss_mb(),
+        "output_mb": os.path.getsize(output_path) / 1024 / 1024
+    }))
+
+
+def run_writer(writer: str, input_path: str, output_path: str, pages_path: str) -> dict:
+    command = [sys.executable, os.path.abspath(__file__), "--child", writer, input_path, output_path, pages_path]
+    output = subprocess.run(command, cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PDF 输出阶段基准测试")
+    parser.add_argument("--pages", type=int, default=30, help="合成 PDF 的页数")
+    parser.add_argument("--words", type=int, default=300, help="每页单词数")
+    parser.add_argument("--image-kb", default="0,500,2000", help="逗号分隔的每页图片大小（KB）")
+    parser.add_argument("--writers", default=",".join(WRITERS), help="逗号分隔的写入方式")
+    parser.add_argument("--child", nargs=4, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(*args.child)
+        return
+
+    workdir = tempfile.mkdtemp(prefix="bench_pdf_output_")
+    print("=" * 78)
+    print(f"页数: {args.pages}  每页单词: {args.words}")
+    print(f"{'图片/页':>8} {'输入':>9} {'写入方式':<8} {'耗时':>8} {'峰值 RSS':>10} {'输出':>9}")
+    for image_kb in (int(kb) for kb in args.image_kb.split(",")):
+        input_path = os.path.join(workdir, f"input_{image_kb}.pdf")
+        generate_pdf(input_path, args.pages, args.words, image_kb)
+        input_mb = os.path.getsize(input_path) / 1024 / 1024
+        # 预先提取并生成译文，子进程只负责写入
+        pages_paths = {}
+        for with_blocks in (False, True):
+            pages_paths[with_blocks] = os.path.join(workdir, f"pages_{int(with_blocks)}.json")
+            with open(pages_paths[with_blocks], "w", encoding="utf-8") as f:
+                json.dump(translated_pages(input_path, with_blocks), f, ensure_ascii=False)
+        for writer in args.writers.split(","):
+            output_path = os.path.join(workdir, f"output_{image_kb}_{writer}.pdf")
+            result = run_writer(writer, input_path, output_path, pages_paths[writer != "reflow"])
+            print(f"{image_kb:>6}KB {input_mb:>7.1f}MB {writer:<8} {result['seconds']:>7.2f}s "
+                  f"{result['peak_rss_mb']:>8.0f}MB {result['output_mb']:>7.1f}MB")
+            os.remove(output_path)
+        for path in [input_path, *pages_paths.values()]:
+            os.remove(path)
+    os.rmdir(workdir)
+    print("=" * 78)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+PDF 翻译流水线端到端基准测试
+
+生成指定页数和文字密度的合成 PDF，用延迟可调的替身后端（StubBackend）运行
+PDFProcessor.translate_pdf，报告：页/秒、提取/翻译/渲染各阶段耗时、峰值内存和输出文件大小。
+结果可保存为 JSON，并与之前的结果对比。
+
+用法:
+    python benchmarks/bench_pdf_pipeline.py --pages 50 --words 300
+    python benchmarks/bench_pdf_pipeline.py --pages 200 --latency-ms 20 --output after.json --compare before.json
+    python benchmarks/bench_pdf_pipeline.py --scheduler --workers 4     # 经过 BatchScheduler 组批
+    python benchmarks/bench_pdf_pipeline.py --layout blocks             # 按文字块写回原页面
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# 基准测试不需要断点续传，且必须在导入 config 之前设置
+os.environ.setdefault("PDF_CHECKPOINT_ENABLED", "False")
+
+WORDS = (
+    "system data model translation page chapter network memory process thread "
+    "request latency throughput cache token budget sentence paragraph document"
+).split()
+
+# 对比时越小越好的指标，其余越大越好
+LOWER_IS_BETTER = {"seconds", "extract_s", "translate_s", "render_s", "peak_rss_mb", "output_bytes"}
+
+
+def generate_pdf(path: str, pages: int, words_per_page: int, seed: int = 0):
+    """生成每页约 words_per_page 个单词的合成 PDF"""
+    import fitz
+
+    rng = random.Random(seed)
+    doc = fitz.open()
+    for _ in range(pages):
+        page = doc.new_page(width=595, height=842)
+        paragraphs = []
+        remaining = words_per_page
+        while remaining > 0:
+            count = min(remaining, rng.randint(30, 80))
+            remaining -= count
+            sentence_words = [rng.choice(WORDS) for _ in range(count)]
+            paragraphs.append(" ".join(sentence_words).capitalize() + ".")
+        page.insert_textbox(fitz.Rect(40, 40, 555, 802), "\n\n".join(paragraphs), fontsize=8)
+    doc.save(path)
+    doc.close()
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def run(args) -> dict:
+    os.environ["PDF_TRANSLATE_WORKERS"] = str(args.workers)
+    from backends import StubBackend
+    from pdf_processor import PDFProcessor
+
+    translator = StubBackend(latency_ms=args.latency_ms, token_latency_ms=args.token_latency_ms)
+    scheduler = None
+    if args.scheduler:
+        from scheduler import BatchScheduler
+        scheduler = BatchScheduler(translator)
+
+    workdir = tempfile.mkdtemp(prefix="bench_pdf_")
+    input_path = os.path.join(workdir, "input.pdf")
+    output_path = os.path.join(workdir, "output.pdf")
+    generate_pdf(input_path, args.pages, args.words)
+
+    processor = PDFProcessor(translator=scheduler or translator)
+    start = time.perf_counter()
+    result = processor.translate_pdf(input_path, output_path, "English", "Chinese", layout_mode=args.layout)
+    seconds = time.perf_counter() - start
+    if scheduler:
+        scheduler.shutdown()
+    if not result["success"]:
+        raise RuntimeError(result["error"])
+
+    stage_times = result.get("stage_times", {})
+    metrics = {
+        "seconds": seconds,
+        "pages_per_second": args.pages / seconds,
+        "extract_s": stage_times.get("extract", 0.0),
+        "translate_s": stage_times.get("translate", 0.0),
+        "render_s": stage_times.get("render", 0.0),
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "output_bytes": os.path.getsize(output_path),
+    }
+    for path in (input_path, output_path):
+        os.remove(path)
+    os.rmdir(workdir)
+
+    return {
+        "config": {
+            "pages": args.pages,
+            "words": args.words,
+            "latency_ms": args.latency_ms,
+            "token_latency_ms": args.token_latency_ms,
+            "workers": args.workers,
+            "scheduler": args.scheduler,
+            "layout": args.layout,
+        },
+        "metrics": metrics,
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+
+def print_result(result: dict):
+    m = result["metrics"]
+    print("=" * 70)
+    print(f"配置: {json.dumps(result['config'], ensure_ascii=False)}")
+    print(f"总耗时: {m['seconds']:.2f}s  吞吐: {m['pages_per_second']:.2f} 页/s")
+    print(f"阶段耗时: 提取 {m['extract_s']:.2f}s  翻译 {m['translate_s']:.2f}s  渲染 {m['render_s']:.2f}s")
+    print(f"峰值 RSS: {m['peak_rss_mb']:.0f} MB  输出大小: {m['output_bytes'] / 1024:.0f} KB")
+    print("=" * 70)
+
+
+def print_comparison(before: dict, after: dict):
+    if before.get("config") != after.get("config"):
+        print("⚠️  两次运行的配置不同，对比仅供参考")
+    print(f"{'指标':<18}{'之前':>14}{'现在':>14}{'变化':>10}")
+    for name, new in after["metrics"].items():
+        old = before["metrics"].get(name)
+        if old is None:
+            continue
+        change = (new - old) / old if old else 0.0
+        better = change < 0 if name in LOWER_IS_BETTER else change > 0
+        mark = "" if abs(change) < 0.02 else ("✓" if better else "✗")
+        print(f"{name:<18}{old:>14.2f}{new:>14.2f}{change:>+9.1%} {mark}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PDF 翻译流水线端到端基准测试")
+    parser.add_argument("--pages", type=int, default=50, help="合成 PDF 的页数")
+    parser.add_argument("--words", type=int, default=300, help="每页单词数（文字密度）")
+    parser.add_argument("--latency-ms", type=float, default=20, help="替身后端每次调用的固定延迟")
+    parser.add_argument("--token-latency-ms", type=float, default=0.5, help="替身后端每个输出 token 的延迟")
+    parser.add_argument("--workers", type=int, default=1, help="并行翻译页面的线程数")
+    parser.add_argument("--scheduler", action="store_true", help="经过 BatchScheduler 组批")
+    parser.add_argument("--layout", choices=("reflow", "blocks", "inplace"), default="reflow", help="输出布局方式")
+    parser.add_argument("--output", help="把结果保存为 JSON")
+    parser.add_argument("--compare", help="与之前保存的 JSON 结果对比")
+    args = parser.parse_args()
+
+    result = run(args)
+    print_result(result)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存: {args.output}")
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            print_comparison(json.load(f), result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+多进程工作池吞吐基准测试
+
+用不同的工作进程数运行同一批翻译请求，比较吞吐（条/秒）。每个进程的线程数为
+CPU 核心数 / 进程数。
+
+替身模型：
+    --model sshleifer/tiny-gpt2   小型因果语言模型（需要 torch 和 transformers）
+    --synthetic                   纯 Python 的 CPU 密集替身，不依赖 torch，只验证分发和扩展性
+
+用法:
+    python benchmarks/bench_pool.py --workers 1,2,4 --texts 64
+    python benchmarks/bench_pool.py --synthetic --workers 1,2,4
+"""
+import argparse
+import functools
+import hashlib
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from translator_pool import TranslatorPool
+
+SAMPLE_SENTENCES = [
+    "Hello, how are you?",
+    "This is a test document.",
+    "The quick brown fox jumps over the lazy dog.",
+    "Chapter 1. Introduction to distributed systems and their failure modes.",
+    "Please keep the original formatting, including line breaks and paragraphs.",
+    "In this book we will learn how to build reliable software at scale, step by step.",
+]
+
+
+class SyntheticTranslator:
+    """按文本长度消耗固定 CPU 时间的替身翻译器"""
+
+    def __init__(self, rounds_per_char: int = 2000):
+        self.rounds_per_char = rounds_per_char
+
+    def translate(self, text, source_language="English", target_language="Chinese", **kwargs):
+        digest = text.encode("utf-8")
+        for _ in range(len(text) * self.rounds_per_char):
+            digest = hashlib.sha256(digest).digest()
+        return {
+            "success": True,
+            "translated_text": digest.hex()[:len(text)],
+            "source_language": source_language,
+            "target_language": target_language
+        }
+
+    def translate_batch(self, texts, source_language="English", target_language="Chinese", **kwargs):
+        return [self.translate(text, source_language, target_language) for text in texts]
+
+    def chunk_token_budget(self, source_language, target_language):
+        return 1024
+
+
+def make_stand_in(model_path):
+    """在工作进程中创建小型因果语言模型替身"""
+    from bench_batch import StandInTranslator
+    return StandInTranslator(model_path=model_path, device="cpu", lazy=False)
+
+
+def make_synthetic():
+    return SyntheticTranslator()
+
+
+def run(factory, workers, texts, batch_size, max_length):
+    pool = TranslatorPool(num_workers=workers, translator_factory=factory)
+    try:
+        # 预热
+        pool.translate_batch(texts[:workers], max_length=max_length)
+        start = time.perf_counter()
+        results = []
+        for i in range(0, len(texts), batch_size):
+            results.extend(pool.translate_batch(texts[i:i + batch_size], max_length=max_length))
+        elapsed = time.perf_counter() - start
+        ok = sum(1 for result in results if result["success"])
+        return elapsed, ok, pool.threads_per_worker
+    finally:
+        pool.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多进程工作池吞吐基准测试")
+    parser.add_argument("--model", default="sshleifer/tiny-gpt2", help="替身模型路径或名称")
+    parser.add_argument("--synthetic", action="store_true", help="使用纯 Python 的 CPU 密集替身")
+    parser.add_argument("--workers", default="1,2,4", help="逗号分隔的工作进程数")
+    parser.add_argument("--texts", type=int, default=64, help="文本条数")
+    parser.add_argument("--batch-size", type=int, default=16, help="每次提交给工作池的条数")
+    parser.add_argument("--max-length", type=int, default=128)
+    args = parser.parse_args()
+
+    # 工作进程继承环境变量，关闭翻译记忆以免命中缓存
+    os.environ["TRANSLATION_MEMORY_ENABLED"] = "False"
+    if args.synthetic:
+        factory = make_synthetic
+    else:
+        # 工作进程需要能导入 bench_batch
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        os.environ["PYTHONPATH"] = os.pathsep.join(filter(None, [os.path.dirname(os.path.abspath(__file__)), os.environ.get("PYTHONPATH")]))
+        factory = functools.partial(make_stand_in, args.model)
+    texts = [SAMPLE_SENTENCES[i % len(SAMPLE_SENTENCES)] for i in range(args.texts)]
+
+    print("=" * 60)
+    print(f"替身: {'synthetic' if args.synthetic else args.model}  文本: {len(texts)} 条  CPU: {os.cpu_count()}")
+    baseline = None
+    for workers in (int(w) for w in args.workers.split(",")):
+        elapsed, ok, threads = run(factory, workers, texts, args.batch_size, args.max_length)
+        throughput = len(texts) / elapsed
+        baseline = baseline or throughput
+        print(f"进程 {workers:>2} × {threads:>2} 线程  耗时: {elapsed:.2f}s  吞吐: {throughput:.1f} 条/s  "
+              f"加速比: {throughput / baseline:.2f}x  成功: {ok}/{len(texts)}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+后处理基准测试
+
+在录制的模型输出语料上比较原先“翻译器清理一次 + PDF 处理器再清理一次”的两遍处理
+与 postprocess 模块的单遍处理：耗时以及两者输出不一致的条数。
+
+语料为 JSONL，每行包含 source_language、target_language、response 三个字段。
+
+用法:
+    python benchmarks/bench_postprocess.py
+    python benchmarks/bench_postprocess.py --corpus my_outputs.jsonl --repeat 200
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from postprocess import postprocess_batch
+from script_detection import script_stats, iter_line_stats
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "recorded_outputs.jsonl")
+
+_SCRIPT = {"Japanese": "kana", "Korean": "hangul"}
+_TRANSLATOR_SKIP = ['Translation', 'Original text', 'Requirements', 'Note', '翻译', '原文', '要求', 'English']
+_PDF_SKIP = ['原文', 'Original', 'Translation', '翻译', '要求', 'Requirements', '事项', 'Matters']
+
+
+def legacy_translator_pass(response, target_language):
+    """原 ChatGLMTranslator._build_result 中的清理（阈值 0.5）"""
+    text = response.strip()
+    script = _SCRIPT.get(target_language)
+    if not script:
+        return text
+    stats = script_stats(text)
+    if stats.han and not getattr(stats, script):
+        lines = [
+            line.strip() for line, s in iter_line_stats(text)
+            if getattr(s, script) or (script == "kana" and not s.han and s.non_ascii)
+        ]
+        if lines:
+            text = '\n'.join(lines)
+        elif script == "hangul":
+            return None
+    skip = _TRANSLATOR_SKIP + (['Japanese', '日本語'] if script == "kana" else ['Korean'])
+    lines = []
+    for line, s in iter_line_stats(text):
+        line = line.strip()
+        if any(k in line for k in skip) or not line or line in ['：', ':', '-', '—']:
+            continue
+        if getattr(s, script) or s.non_ascii / len(line) > 0.5:
+            lines.append(line)
+    return '\n'.join(lines) if lines else response.strip()
+
+
+def legacy_pdf_pass(text, target_language):
+    """原 PDFProcessor._translate_page 中对同一结果的第二遍清理（阈值 0.3）"""
+    script = _SCRIPT.get(target_language)
+    if not script:
+        return text
+    skip = _PDF_SKIP + (['English', 'Japanese'] if script == "kana" else [])
+    lines = []
+    for line, s in iter_line_stats(text.strip()):
+        line = line.strip()
+        if any(k in line for k in skip) or not line or line in ['：', ':', '-', '—', '1.', '2.', '3.']:
+            continue
+        if getattr(s, script):
+            lines.append(line)
+        elif script == "kana" and s.han:
+            continue
+        elif s.non_ascii > len(line) * 0.3:
+            lines.append(line)
+    return '\n'.join(lines) if lines else text
+
+
+def legacy(corpus):
+    outputs = []
+    for row in corpus:
+        text = legacy_translator_pass(row["response"], row["target_language"])
+        outputs.append("" if text is None else legacy_pdf_pass(text, row["target_language"]))
+    return outputs
+
+
+def unified(corpus):
+    # 与 translate_batch 一样按语言对成批处理
+    outputs = [None] * len(corpus)
+    groups = {}
+    for idx, row in enumerate(corpus):
+        groups.setdefault((row["source_language"], row["target_language"]), []).append(idx)
+    for (source_language, target_language), indices in groups.items():
+        results = postprocess_batch([corpus[idx]["response"] for idx in indices], source_language, target_language)
+        for idx, result in zip(indices, results):
+            outputs[idx] = result["translated_text"]
+    return outputs
+
+
+def timed(func, corpus, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(corpus)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="后处理基准测试")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="录制的模型输出（JSONL）")
+    parser.add_argument("--scale", type=int, default=100, help="语料重复次数")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    with open(args.corpus, encoding="utf-8") as f:
+        corpus = [json.loads(line) for line in f if line.strip()]
+
+    mismatches = [
+        (row["target_language"], old, new)
+        for row, old, new in zip(corpus, legacy(corpus), unified(corpus))
+        if old != new
+    ]
+    corpus = corpus * args.scale
+    legacy_time = timed(legacy, corpus, args.repeat)
+    unified_time = timed(unified, corpus, args.repeat)
+
+    print("=" * 50)
+    print(f"语料: {len(corpus) // args.scale} 条 × {args.scale}")
+    print(f"两遍清理: {legacy_time * 1000:.1f} ms")
+    print(f"单遍清理: {unified_time * 1000:.1f} ms")
+    print(f"加速比: {legacy_time / unified_time:.1f}x")
+    print(f"输出不一致: {len(mismatches)} 条")
+    for target_language, old, new in mismatches:
+        print(f"  [{target_language}] {old!r} -> {new!r}")
+    print("=" * 50)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+提示词前缀 KV 缓存基准测试
+
+使用小型本地替身模型（默认 sshleifer/tiny-gpt2）比较：
+    预填充    完整提示词的一次前向 vs 复制前缀缓存后只预填充原文部分
+    端到端    单条 translate_batch 关闭 / 开启前缀缓存时的平均延迟（替身模型没有 chat 方法）
+前缀越长、原文越短，缓存节省的比例越大。替身模型很小时固定开销占比较高，节省比例会低于真实模型。
+
+用法:
+    python benchmarks/bench_prefix_cache.py --texts 24 --repeat 5
+    python benchmarks/bench_prefix_cache.py --model /path/to/local/model --target Korean
+"""
+import argparse
+import copy
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault("TRANSLATION_MEMORY_ENABLED", "False")
+
+import torch
+
+from bench_batch import SAMPLE_SENTENCES, StandInTranslator
+
+
+def full_prefill(translator, input_ids):
+    with torch.no_grad():
+        translator.model(input_ids=input_ids, attention_mask=torch.ones_like(input_ids), use_cache=True)
+
+
+def cached_prefill(translator, input_ids, prefix_ids, prefix_past):
+    cached = len(prefix_ids)
+    total = input_ids.shape[1]
+    with torch.no_grad():
+        translator.model(
+            input_ids=input_ids[:, cached:],
+            past_key_values=copy.deepcopy(prefix_past),
+            position_ids=torch.arange(cached, total).unsqueeze(0),
+            attention_mask=torch.ones((1, total), dtype=torch.long),
+            use_cache=True
+        )
+
+
+def time_calls(func, items, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for item in items:
+            func(item)
+    return (time.perf_counter() - start) / (repeat * len(items))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="提示词前缀 KV 缓存基准测试")
+    parser.add_argument("--model", default="sshleifer/tiny-gpt2", help="替身模型路径或名称")
+    parser.add_argument("--texts", type=int, default=24, help="文本条数")
+    parser.add_argument("--repeat", type=int, default=5, help="预填充测试的重复次数")
+    parser.add_argument("--source", default="English")
+    parser.add_argument("--target", default="Chinese")
+    parser.add_argument("--new-tokens", type=int, default=32, help="端到端测试每条生成的 token 数")
+    args = parser.parse_args()
+
+    translator = StandInTranslator(model_path=args.model, device="cpu", lazy=False)
+    texts = [SAMPLE_SENTENCES[i % len(SAMPLE_SENTENCES)] for i in range(args.texts)]
+    entry = translator._get_prefix_entry(args.source, args.target)
+    if entry is None:
+        print("该模型无法缓存提示词前缀")
+        return
+    prefix_ids, prefix_past = entry
+
+    prompts = [
+        translator.tokenizer(
+            translator._build_chat_prompt(translator._build_prompt(text, args.source, args.target)),
+            return_tensors="pt"
+        )["input_ids"]
+        for text in texts
+    ]
+    prompt_tokens = sum(p.shape[1] for p in prompts) / len(prompts)
+
+    # 预热
+    full_prefill(translator, prompts[0])
+    cached_prefill(translator, prompts[0], prefix_ids, prefix_past)
+
+    full_time = time_calls(lambda ids: full_prefill(translator, ids), prompts, args.repeat)
+    cached_time = time_calls(lambda ids: cached_prefill(translator, ids, prefix_ids, prefix_past), prompts, args.repeat)
+
+    def translate(text):
+        torch.manual_seed(0)
+        translator.translate_batch(
+            [text], args.source, args.target, max_batch_size=1, max_length=prompts[0].shape[1] + args.new_tokens
+        )
+
+    translator.prefix_cache_enabled = False
+    translate(texts[0])
+    plain_latency = time_calls(translate, texts, 1)
+    translator.prefix_cache_enabled = True
+    translate(texts[0])
+    cached_latency = time_calls(translate, texts, 1)
+
+    print("=" * 60)
+    print(f"语言对: {args.source} → {args.target}")
+    print(f"前缀: {len(prefix_ids)} tokens  平均提示词: {prompt_tokens:.0f} tokens")
+    print(f"预填充  无缓存: {full_time * 1000:7.2f} ms/条  有缓存: {cached_time * 1000:7.2f} ms/条  "
+          f"({full_time / cached_time:.2f}x)")
+    print(f"端到端  无缓存: {plain_latency * 1000:7.2f} ms/条  有缓存: {cached_latency * 1000:7.2f} ms/条  "
+          f"({plain_latency / cached_latency:.2f}x)")
+    print(f"缓存统计: {translator.prefix_cache_stats()}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
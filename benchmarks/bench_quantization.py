@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+CPU 量化基准测试
+
+每种量化方式（QUANTIZATION=none/int8/int4）在独立子进程中加载模型并翻译同一组文本，报告：
+生成吞吐（tokens/s）、加载后的常驻内存和峰值 RSS，以及与 float32 基线输出的一致程度
+（完全一致的条数和平均字符相似度）。生成使用固定随机种子和极低的 temperature，近似贪心解码。
+
+用法:
+    python benchmarks/bench_quantization.py                                  # ChatGLM2-6B（MODEL_PATH）
+    python benchmarks/bench_quantization.py --stand-in sshleifer/tiny-gpt2   # 小型替身模型，int4 会退回 int8
+"""
+import argparse
+import difflib
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+SAMPLE_TEXTS = [
+    "Hello, how are you?",
+    "The quick brown fox jumps over the lazy dog.",
+    "Chapter 1. Introduction to distributed systems and their failure modes.",
+    "Please keep the original formatting, including line breaks and paragraphs.",
+    "In this book we will learn how to build reliable software at scale, step by step.",
+    "Memory bandwidth, not arithmetic, usually limits the speed of token generation on CPUs.",
+]
+
+
+def child(stand_in, max_length, temperature):
+    import torch
+
+    if stand_in:
+        from bench_batch import StandInTranslator
+
+        class QuantizedStandIn(StandInTranslator):
+            def _load_model(self):
+                super()._load_model()
+                # 替身模型没有 quantize 方法，int4 同样退回 int8
+                if self.quantization != "none":
+                    self.quantization = "int8"
+                    self._quantize_int8()
+
+        translator = QuantizedStandIn(model_path=stand_in, device="cpu", lazy=False)
+    else:
+        from translator import ChatGLMTranslator
+        translator = ChatGLMTranslator(device="cpu", lazy=False)
+    memory = translator.memory_usage()
+
+    outputs = []
+    output_tokens = 0
+    elapsed = 0.0
+    for text in SAMPLE_TEXTS:
+        torch.manual_seed(0)
+        start = time.perf_counter()
+        result = translator.translate_batch([text], max_length=max_length, temperature=temperature)[0]
+        elapsed += time.perf_counter() - start
+        outputs.append(result.get("translated_text", ""))
+        output_tokens += translator.count_tokens(outputs[-1])
+
+    print(json.dumps({
+        "quantization": translator.quantization,
+        "tokens_per_second": output_tokens / elapsed if elapsed else 0.0,
+        "rss_mb": memory.get("rss_mb", 0.0),
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "outputs": outputs
+    }, ensure_ascii=False))
+
+
+def run_mode(mode, args):
+    env = dict(os.environ)
+    env["QUANTIZATION"] = mode
+    env["TRANSLATION_MEMORY_ENABLED"] = "False"
+    command = [sys.executable, os.path.abspath(__file__), "--child",
+               "--max-length", str(args.max_length), "--temperature", str(args.temperature)]
+    if args.stand_in:
+        command += ["--stand-in", args.stand_in]
+    output = subprocess.run(command, env=env, cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CPU 量化基准测试")
+    parser.add_argument("--stand-in", default=None, help="使用小型因果语言模型替身")
+    parser.add_argument("--modes", default="none,int8,int4", help="逗号分隔的量化方式，第一个为基线")
+    parser.add_argument("--max-length", type=int, default=256)
+    parser.add_argument("--temperature", type=float, default=0.01)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.stand_in, args.max_length, args.temperature)
+        return
+
+    modes = args.modes.split(",")
+    results = {mode: run_mode(mode, args) for mode in modes}
+    baseline = results[modes[0]]
+
+    print("=" * 80)
+    print(f"模型: {args.stand_in or 'MODEL_PATH'}  文本: {len(SAMPLE_TEXTS)} 条  基线: {modes[0]}")
+    for mode in modes:
+        result = results[mode]
+        exact = sum(1 for a, b in zip(baseline["outputs"], result["outputs"]) if a == b)
+        similarity = sum(
+            difflib.SequenceMatcher(None, a, b).ratio() for a, b in zip(baseline["outputs"], result["outputs"])
+        ) / len(SAMPLE_TEXTS)
+        applied = result["quantization"]
+        label = mode if applied == mode else f"{mode}→{applied}"
+        print(f"{label:<10} {result['tokens_per_second']:>7.1f} tokens/s  RSS: {result['rss_mb']:.0f} MB  "
+              f"峰值: {result['peak_rss_mb']:.0f} MB  一致: {exact}/{len(SAMPLE_TEXTS)}  相似度: {similarity:.1%}")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+目标文字约束解码基准测试
+
+使用小型本地替身模型（默认 sshleifer/tiny-gpt2）模拟 ChatGLM2 翻译成韩文、日文时整段回复中文的问题：
+每次生成开始时以 --wrong-rate 的概率让该行“选择中文”（汉字 token 的 logit 加 --prior），
+所有行的目标文字 token 加 --target-boost。分别在 SCRIPT_CONSTRAINT_MODE=off、bias、mask 下翻译同一批文本，
+回复含汉字但没有目标文字（或后处理判定失败）的生成需要重跑，最多 --max-attempts 次，报告：
+    生成次数、错误语言的生成次数、重跑后仍失败的条数、浪费在错误语言上的 token 数和总耗时
+
+替身模型的词表很小（只有少量韩文 token，没有假名），结果只用于比较各约束方式，
+日文目标需要用 --model 指定词表包含假名的模型。
+
+用法:
+    python benchmarks/bench_script_constraint.py --texts 32
+    python benchmarks/bench_script_constraint.py --target Japanese --model /path/to/local/model
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault("TRANSLATION_MEMORY_ENABLED", "False")
+
+import torch
+
+from bench_batch import SAMPLE_SENTENCES, StandInTranslator
+from script_constraint import TokenScripts
+from script_detection import script_stats
+
+# 各目标语言特有的文字（ScriptStats 的字段名）
+TARGET_SCRIPTS = {"Korean": "hangul", "Japanese": "kana"}
+
+
+class ChinesePriorTranslator(StandInTranslator):
+    """部分生成会整段偏向中文的替身翻译器"""
+
+    target_language = "Korean"
+    wrong_rate = 0.3
+    prior = 6.0
+    target_boost = 4.0
+    seed = 0
+
+    def _load_model(self):
+        super()._load_model()
+        token_scripts = TokenScripts(self.tokenizer)
+        self.rng = random.Random(self.seed)
+        self.rows_wrong = []
+        self.responses = {}
+        vocab_size = self.model.get_output_embeddings().weight.shape[0]
+        self.han_ids = [token_id for token_id in token_scripts.ids["han"] if token_id < vocab_size]
+        self.target_ids = [
+            token_id for token_id in token_scripts.ids[TARGET_SCRIPTS[self.target_language]] if token_id < vocab_size
+        ]
+        self.model.register_forward_hook(self._prior_hook, with_kwargs=True)
+
+    def _prior_hook(self, module, args, kwargs, output):
+        logits = output.logits
+        input_ids = kwargs.get("input_ids", args[0] if args else None)
+        # 预填充时为每行决定本次生成是否“选择中文”，解码步骤沿用
+        if input_ids is not None and input_ids.shape[1] > 1:
+            self.rows_wrong = [self.rng.random() < self.wrong_rate for _ in range(logits.shape[0])]
+        logits[..., self.target_ids] += self.target_boost
+        for row, wrong in enumerate(self.rows_wrong[:logits.shape[0]]):
+            if wrong:
+                logits[row, :, self.han_ids] += self.prior
+        return output
+
+    def _generate_batch(self, prompts, *args, **kwargs):
+        responses = super()._generate_batch(prompts, *args, **kwargs)
+        for prompt, response in zip(prompts, responses):
+            self.responses.setdefault(prompt, []).append(response)
+        return responses
+
+
+def wrong_language(response: str, target_language: str) -> bool:
+    """回复含汉字但没有目标语言特有的文字"""
+    stats = script_stats(response)
+    return bool(stats.han) and not getattr(stats, TARGET_SCRIPTS[target_language])
+
+
+def run(translator, texts, target_language, max_attempts, batch_size):
+    """翻译全部文本，错误语言或失败的条目重跑，返回统计"""
+    stats = {"generations": 0, "wrong": 0, "failed": 0, "wasted_tokens": 0, "output_tokens": 0}
+    pending = list(range(len(texts)))
+    start = time.perf_counter()
+    for _ in range(max_attempts):
+        if not pending:
+            break
+        translator.responses = {}
+        results = translator.translate_batch(
+            [texts[idx] for idx in pending], "English", target_language, max_batch_size=batch_size
+        )
+        retry = []
+        for idx, result in zip(pending, results):
+            stats["generations"] += 1
+            tokens = result.get("generated_tokens", 0)
+            stats["output_tokens"] += tokens
+            # translate_batch 按提示词长度重排后生成，按提示词取回对应的原始回复
+            prompt = translator._build_chat_prompt(translator._build_prompt(texts[idx], "English", target_language))
+            response = translator.responses[prompt].pop()
+            if not result["success"] or wrong_language(response, target_language):
+                stats["wrong"] += 1
+                stats["wasted_tokens"] += tokens
+                retry.append(idx)
+        pending = retry
+    stats["failed"] = len(pending)
+    stats["seconds"] = time.perf_counter() - start
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="目标文字约束解码基准测试")
+    parser.add_argument("--model", default="sshleifer/tiny-gpt2", help="替身模型路径或名称")
+    parser.add_argument("--texts", type=int, default=32, help="文本条数")
+    parser.add_argument("--target", default="Korean", choices=sorted(TARGET_SCRIPTS), help="目标语言")
+    parser.add_argument("--wrong-rate", type=float, default=0.3, help="每次生成整段偏向中文的概率")
+    parser.add_argument("--prior", type=float, default=6.0, help="偏向中文时汉字 token 的 logit 增量")
+    parser.add_argument("--target-boost", type=float, default=4.0, help="目标文字 token 的 logit 增量")
+    parser.add_argument("--max-attempts", type=int, default=3, help="每条最多生成次数")
+    parser.add_argument("--batch-size", type=int, default=8)
+    args = parser.parse_args()
+
+    ChinesePriorTranslator.target_language = args.target
+    ChinesePriorTranslator.wrong_rate = args.wrong_rate
+    ChinesePriorTranslator.prior = args.prior
+    ChinesePriorTranslator.target_boost = args.target_boost
+    translator = ChinesePriorTranslator(model_path=args.model, device="cpu", lazy=False)
+    if not translator.target_ids:
+        print(f"替身模型的词表中没有 {args.target} 特有的文字，请用 --model 指定其他模型")
+        return
+    texts = [SAMPLE_SENTENCES[i % len(SAMPLE_SENTENCES)] for i in range(args.texts)]
+
+    print("=" * 76)
+    print(f"目标语言: {args.target}  文本: {len(texts)}  偏向中文的概率: {args.wrong_rate}  "
+          f"最多生成: {args.max_attempts} 次")
+    print(f"{'约束':<6}{'生成次数':>10}{'错误语言':>10}{'最终失败':>10}{'浪费 tokens':>14}{'总 tokens':>12}{'耗时':>10}")
+    for mode in ("off", "bias", "mask"):
+        translator.script_constraint = mode
+        translator.rng = random.Random(args.wrong_rate)
+        torch.manual_seed(0)
+        stats = run(translator, texts, args.target, args.max_attempts, args.batch_size)
+        print(f"{mode:<6}{stats['generations']:>14}{stats['wrong']:>12}{stats['failed']:>12}"
+              f"{stats['wasted_tokens']:>15}{stats['output_tokens']:>13}{stats['seconds']:>11.2f}s")
+    print("=" * 76)
+
+
+if __name__ == "__main__":
+    main()
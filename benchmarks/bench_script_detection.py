@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+文字系统识别微基准测试
+
+在大段翻译结果上比较原先逐字符范围比较的逐行检查与 script_detection 的查表统计。
+
+用法:
+    python benchmarks/bench_script_detection.py --lines 5000
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from script_detection import iter_line_stats
+
+SAMPLES = [
+    "これは日本語の翻訳結果です。カタカナも含まれています。",
+    "이것은 한국어 번역 결과입니다. 문장이 길 수도 있습니다.",
+    "这是一段混入的中文内容，没有任何假名。",
+    "Translation (Japanese): the model echoed part of the prompt.",
+    "第1章　システムの概要とデータモデル（2024年版）",
+    "1. Requirements: keep formatting",
+]
+
+
+def legacy_line_checks(text):
+    """原实现：每行多次逐字符扫描"""
+    kept = 0
+    for line in text.split('\n'):
+        line = line.strip()
+        if any('\u3040' <= char <= '\u309f' or '\u30a0' <= char <= '\u30ff' for char in line):
+            kept += 1
+        elif any('\u4e00' <= char <= '\u9fff' for char in line) and not any('\u3040' <= char <= '\u309f' or '\u30a0' <= char <= '\u30ff' for char in line):
+            continue
+        elif any('\uAC00' <= char <= '\uD7A3' for char in line):
+            kept += 1
+        elif not all(c.isascii() or c.isspace() or c in '.,;:!?()[]{}' for c in line):
+            non_ascii_ratio = sum(1 for c in line if not c.isascii() and not c.isspace()) / max(len(line), 1)
+            if non_ascii_ratio > 0.5:
+                kept += 1
+    return kept
+
+
+def table_line_checks(text):
+    """新实现：整段查表一次，按行读取直方图"""
+    kept = 0
+    for line, stats in iter_line_stats(text):
+        line = line.strip()
+        if stats.kana:
+            kept += 1
+        elif stats.han:
+            continue
+        elif stats.hangul:
+            kept += 1
+        elif stats.non_ascii:
+            if stats.non_ascii / max(len(line), 1) > 0.5:
+                kept += 1
+    return kept
+
+
+def main():
+    parser = argparse.ArgumentParser(description="文字系统识别微基准测试")
+    parser.add_argument("--lines", type=int, default=5000, help="每页行数")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    page = "\n".join(rng.choice(SAMPLES) for _ in range(args.lines))
+    assert legacy_line_checks(page) == table_line_checks(page)
+
+    legacy = min(timeit.repeat(lambda: legacy_line_checks(page), number=1, repeat=args.repeat))
+    table = min(timeit.repeat(lambda: table_line_checks(page), number=1, repeat=args.repeat))
+
+    print("=" * 50)
+    print(f"页面: {args.lines} 行，{len(page)} 字符")
+    print(f"逐字符扫描: {legacy * 1000:.1f} ms")
+    print(f"查表统计:   {table * 1000:.1f} ms")
+    print(f"加速比: {legacy / table:.1f}x")
+    print("=" * 50)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+翻译前分段过滤基准测试
+
+生成一本合成技术书 PDF（正文段落、页码页脚、代码清单、公式、网址、参考文献页和少量已是中文的注释），
+用延迟可调的替身后端（StubBackend）分别在 SEGMENT_FILTER_ENABLED 关闭 / 开启时运行
+PDFProcessor.translate_pdf，报告：送入模型的分段数、模型调用次数、总耗时，以及各原因跳过的分段数。
+也可以用 --pdf 指定真实的书籍。
+
+用法:
+    python benchmarks/bench_segment_filter.py --pages 40
+    python benchmarks/bench_segment_filter.py --layout blocks
+    python benchmarks/bench_segment_filter.py --pdf /path/to/book.pdf --layout blocks
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# 基准测试不需要断点续传和翻译记忆，且必须在导入 config 之前设置
+os.environ.setdefault("PDF_CHECKPOINT_ENABLED", "False")
+os.environ.setdefault("TRANSLATION_MEMORY_ENABLED", "False")
+
+import config
+from backends import StubBackend
+
+WORDS = (
+    "system data model translation page chapter network memory process thread "
+    "request latency throughput cache token budget sentence paragraph document"
+).split()
+
+CODE_LISTINGS = [
+    "def translate_batch(texts, max_batch_size=8):\n    results = []\n    for i in range(0, len(texts), max_batch_size):\n"
+    "        batch = texts[i:i + max_batch_size]\n        results.extend(model.generate(batch))\n    return results",
+    "public static void main(String[] args) {\n    Cache cache = new Cache(1024);\n    cache.put(\"key\", value);\n"
+    "    System.out.println(cache.get(\"key\"));\n}",
+    "for (int i = 0; i < n; i++) {\n    sum += values[i] * weights[i];\n}\nreturn sum / n;",
+]
+
+FORMULAS = ["T = n / (t_p + k * t_d)", "f(x) = sin(x) + cos(2x)", "L = -log p(y | x)", "x_i + y_i <= 1"]
+
+URLS = ["https://github.com/example/translator", "https://example.org/docs/api.html", "support@example.org"]
+
+CHINESE_NOTES = ["译者注：本节中的术语保留英文原文。", "注意：以下示例需要较新的显卡驱动。"]
+
+
+def prose(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def reference(rng: random.Random, number: int) -> str:
+    author = rng.choice(["Smith", "Chen", "Garcia", "Tanaka", "Kim"])
+    return (f"[{number}] {author[0]}. {author}, A. Lee. {prose(rng, 6)[:-1]}. "
+            f"In Proc. of the Conference on {rng.choice(WORDS).capitalize()}, pp. {number}-{number + 9}, "
+            f"{rng.randint(1995, 2023)}.")
+
+
+def generate_book(path: str, pages: int, seed: int = 0):
+    """生成混合正文、代码、公式、网址和参考文献的合成技术书，每个元素是单独的文字块"""
+    import fitz
+
+    rng = random.Random(seed)
+    doc = fitz.open()
+    references_from = pages - max(1, pages // 10)
+    for page_number in range(1, pages + 1):
+        page = doc.new_page(width=595, height=842)
+        y = 40
+
+        def add(text: str, height: int, fontname: str = "helv", fontsize: float = 9):
+            nonlocal y
+            page.insert_textbox(fitz.Rect(40, y, 555, y + height), text, fontsize=fontsize, fontname=fontname)
+            y += height + 10
+
+        if page_number >= references_from:
+            if page_number == references_from:
+                add("References", 20, fontsize=14)
+            for number in range(1, 9):
+                add(reference(rng, (page_number - references_from) * 8 + number), 40)
+        else:
+            add(prose(rng, rng.randint(60, 100)), 120)
+            kind = rng.random()
+            if kind < 0.3:
+                add(CODE_LISTINGS[rng.randrange(len(CODE_LISTINGS))], 110, fontname="cour", fontsize=8)
+            elif kind < 0.5:
+                add(FORMULAS[rng.randrange(len(FORMULAS))], 20)
+            elif kind < 0.6:
+                add(URLS[rng.randrange(len(URLS))], 20)
+            elif kind < 0.7:
+                add(CHINESE_NOTES[rng.randrange(len(CHINESE_NOTES))], 20, fontname="china-s")
+            add(prose(rng, rng.randint(40, 80)), 100)
+        page.insert_text(fitz.Point(290, 815), str(page_number), fontsize=8)
+    doc.save(path)
+    doc.close()
+
+
+class CountingStub(StubBackend):
+    """记录送入模型的分段数的替身后端"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.segments = 0
+
+    def translate_batch(self, texts: list, source_language: str = "English", target_language: str = "Chinese", **kwargs) -> list:
+        with self._lock:
+            self.segments += sum(1 for text in texts if text and text.strip())
+        return super().translate_batch(texts, source_language, target_language, **kwargs)
+
+
+def run(input_path: str, layout: str, enabled: bool, latency_ms: float, token_latency_ms: float) -> dict:
+    from pdf_processor import PDFProcessor
+
+    config.SEGMENT_FILTER_ENABLED = enabled
+    translator = CountingStub(latency_ms=latency_ms, token_latency_ms=token_latency_ms)
+    output_path = input_path + f".{layout}.{int(enabled)}.pdf"
+    start = time.perf_counter()
+    result = PDFProcessor(translator=translator).translate_pdf(
+        input_path, output_path, "English", "Chinese", layout_mode=layout
+    )
+    seconds = time.perf_counter() - start
+    if not result["success"]:
+        raise RuntimeError(result["error"])
+    os.remove(output_path)
+    return {
+        "segments": translator.segments,
+        "calls": translator.stats()["calls"],
+        "seconds": seconds,
+        "bypass_stats": result.get("bypass_stats", {})
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="翻译前分段过滤基准测试")
+    parser.add_argument("--pages", type=int, default=40, help="合成 PDF 的页数")
+    parser.add_argument("--pdf", help="使用已有的 PDF 文件代替合成书籍")
+    parser.add_argument("--layout", default="reflow", choices=["reflow", "blocks"], help="输出布局方式")
+    parser.add_argument("--latency-ms", type=float, default=20, help="替身后端每次调用的固定延迟")
+    parser.add_argument("--token-latency-ms", type=float, default=0.5, help="替身后端每个输出 token 的延迟")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_filter_")
+    input_path = args.pdf
+    if not input_path:
+        input_path = os.path.join(workdir, "book.pdf")
+        generate_book(input_path, args.pages)
+
+    off = run(input_path, args.layout, False, args.latency_ms, args.token_latency_ms)
+    on = run(input_path, args.layout, True, args.latency_ms, args.token_latency_ms)
+
+    if not args.pdf:
+        os.remove(input_path)
+    os.rmdir(workdir)
+
+    print("=" * 64)
+    print(f"文件: {args.pdf or f'合成技术书 {args.pages} 页'}  布局: {args.layout}")
+    print(f"{'过滤':<8}{'送入模型的分段':>16}{'模型调用':>10}{'耗时':>10}")
+    print(f"{'关闭':<8}{off['segments']:>16}{off['calls']:>12}{off['seconds']:>11.2f}s")
+    print(f"{'开启':<8}{on['segments']:>16}{on['calls']:>12}{on['seconds']:>11.2f}s")
+    stats = on["bypass_stats"]
+    if stats:
+        print(f"跳过 {stats['bypassed']}/{stats['segments']} 个分段 ({stats['bypass_ratio']:.0%}): {stats['reasons']}")
+    if off["segments"]:
+        print(f"模型处理的分段减少 {1 - on['segments'] / off['segments']:.0%}")
+    print("=" * 64)
+
+
+if __name__ == "__main__":
+    main()
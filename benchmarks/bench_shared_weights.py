@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+多进程权重共享基准测试
+
+同时启动 N 个工作进程，各自构造 ChatGLMTranslator（CPU）并保持存活，
+分别在普通加载和内存映射加载（MODEL_MMAP_WEIGHTS）两种模式下，
+从 /proc/<pid>/smaps_rollup 读取每个进程的 RSS、PSS 和独占内存（USS）。
+所有进程的 PSS 之和约等于这组进程实际占用的物理内存，USS 即每多一个工作进程新增的内存。
+
+仅支持 Linux。
+
+用法:
+    python benchmarks/bench_shared_weights.py --model sshleifer/tiny-gpt2 --workers 4
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils import get_process_memory
+
+
+def worker(model):
+    from translator import ChatGLMTranslator
+
+    ChatGLMTranslator(model_path=model, device="cpu", lazy=False)
+    print(json.dumps({"ready": True}), flush=True)
+    # 保持存活直到父进程关闭标准输入
+    sys.stdin.read()
+
+
+def run_group(model, workers, mmap, cache_dir):
+    env = dict(os.environ)
+    env["TRANSLATION_MEMORY_ENABLED"] = "False"
+    env["MODEL_CACHE_ENABLED"] = "False"
+    env["MODEL_MMAP_WEIGHTS"] = "True" if mmap else "False"
+    env["MODEL_CACHE_DIR"] = cache_dir
+    command = [sys.executable, os.path.abspath(__file__), "--worker", "--model", model]
+
+    if mmap:
+        # 先由一个进程生成快照，之后的工作进程都直接内存映射加载
+        subprocess.run(command, env=env, cwd=ROOT, input="", capture_output=True, text=True, check=True)
+
+    processes = [
+        subprocess.Popen(command, env=env, cwd=ROOT, stdin=subprocess.PIPE,
+                         stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        for _ in range(workers)
+    ]
+    try:
+        for process in processes:
+            line = process.stdout.readline()
+            if not line:
+                raise RuntimeError(f"工作进程 {process.pid} 启动失败")
+        return [get_process_memory(process.pid) for process in processes]
+    finally:
+        for process in processes:
+            process.stdin.close()
+            process.wait()
+
+
+def report(name, usages):
+    total_pss = sum(usage["pss_mb"] for usage in usages)
+    avg = lambda field: sum(usage[field] for usage in usages) / len(usages)
+    print(f"{name:<8} 进程数: {len(usages)}  平均 RSS: {avg('rss_mb'):.0f} MB  平均 USS: {avg('uss_mb'):.0f} MB  "
+          f"平均共享: {avg('shared_mb'):.0f} MB  PSS 合计: {total_pss:.0f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多进程权重共享基准测试")
+    parser.add_argument("--model", default=None, help="模型路径或名称，默认使用 MODEL_PATH")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if not args.model:
+        from config import MODEL_PATH
+        args.model = MODEL_PATH
+
+    if args.worker:
+        worker(args.model)
+        return
+
+    cache_dir = tempfile.mkdtemp(prefix="model_cache_")
+    try:
+        print("=" * 90)
+        print(f"模型: {args.model}")
+        report("普通加载", run_group(args.model, args.workers, False, cache_dir))
+        report("内存映射", run_group(args.model, args.workers, True, cache_dir))
+        print("=" * 90)
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
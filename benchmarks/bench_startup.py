@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+模型冷启动基准测试
+
+每种模式在独立子进程中构造 ChatGLMTranslator（CPU），记录到模型可用为止的耗时、
+各加载阶段耗时和进程峰值内存（ru_maxrss）：
+
+    direct   直接从原始权重加载并转换为 float32（原先的启动方式）
+    warmup   启用快照缓存的首次启动（转换后写入快照）
+    snapshot 从已缓存的 float32 快照内存映射加载
+    lazy     延迟加载，只构造翻译器
+
+用法:
+    python benchmarks/bench_startup.py --model sshleifer/tiny-gpt2
+    python benchmarks/bench_startup.py --model THUDM/chatglm2-6b
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def child(model, lazy):
+    start = time.perf_counter()
+    from translator import ChatGLMTranslator
+
+    translator = ChatGLMTranslator(model_path=model, device="cpu", lazy=lazy)
+    elapsed = time.perf_counter() - start
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({
+        "seconds": elapsed,
+        "peak_rss_mb": peak_rss_mb,
+        "timings": translator.load_timings
+    }))
+
+
+def run_mode(model, lazy, cache_dir):
+    env = dict(os.environ)
+    env["TRANSLATION_MEMORY_ENABLED"] = "False"
+    env["MODEL_CACHE_ENABLED"] = "True" if cache_dir else "False"
+    if cache_dir:
+        env["MODEL_CACHE_DIR"] = cache_dir
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", "--model", model] + (["--lazy"] if lazy else []),
+        env=env, cwd=ROOT, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="模型冷启动基准测试")
+    parser.add_argument("--model", default=None, help="模型路径或名称，默认使用 MODEL_PATH")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--lazy", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.model, args.lazy)
+        return
+
+    if not args.model:
+        from config import MODEL_PATH
+        args.model = MODEL_PATH
+
+    cache_dir = tempfile.mkdtemp(prefix="model_cache_")
+    try:
+        modes = [
+            ("direct", False, None),
+            ("warmup", False, cache_dir),
+            ("snapshot", False, cache_dir),
+            ("lazy", True, None),
+        ]
+        print("=" * 70)
+        print(f"模型: {args.model}")
+        for name, lazy, mode_cache_dir in modes:
+            result = run_mode(args.model, lazy, mode_cache_dir)
+            phases = "，".join(f"{phase} {seconds:.2f}s" for phase, seconds in result["timings"].items())
+            print(f"{name:<9} 耗时: {result['seconds']:.2f}s  峰值 RSS: {result['peak_rss_mb']:.0f} MB  {phases}")
+        print("=" * 70)
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
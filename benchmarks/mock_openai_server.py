@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+OpenAI 兼容接口的本地模拟服务
+
+实现 POST /v1/chat/completions（含 stream=true 的 SSE 输出），“译文”为提示词中原文部分加上语言标记，
+延迟可配置，用于在没有模型的机器上测试和压测 OpenAICompatibleBackend。
+
+用法:
+    python benchmarks/mock_openai_server.py --port 8000 --latency-ms 50 --token-latency-ms 5
+    TRANSLATION_BACKEND=openai OPENAI_BASE_URL=http://127.0.0.1:8000/v1 python main.py
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chunker import estimate_tokens
+
+# 提示词模板中原文位于这些标记之后、最后一行提示之前
+_SOURCE_RE = re.compile(r"(?:English:|原文：)\n(.*)\n\n[^\n]*$", re.S)
+
+
+def fake_translation(prompt: str) -> str:
+    match = _SOURCE_RE.search(prompt)
+    source = match.group(1) if match else prompt
+    return f"[mock] {source.strip()}"
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    latency = 0.05
+    token_latency = 0.005
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_error(404)
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        prompt = request["messages"][-1]["content"]
+        output = fake_translation(prompt)
+        time.sleep(self.latency)
+
+        if not request.get("stream"):
+            time.sleep(self.token_latency * estimate_tokens(output))
+            body = json.dumps({
+                "id": "mock",
+                "object": "chat.completion",
+                "model": request.get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": output}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": estimate_tokens(prompt), "completion_tokens": estimate_tokens(output)}
+            }, ensure_ascii=False).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        for word in re.findall(r"\S+\s*", output):
+            time.sleep(self.token_latency * estimate_tokens(word))
+            chunk = {"choices": [{"index": 0, "delta": {"content": word}, "finish_reason": None}]}
+            self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+        self.wfile.write(b"data: [DONE]\n\n")
+
+
+def serve(host: str = "127.0.0.1", port: int = 8000, latency_ms: float = 50, token_latency_ms: float = 5):
+    """
+    创建模拟服务（未启动），调用方负责 serve_forever / shutdown
+
+    Returns:
+        ThreadingHTTPServer 实例
+    """
+    handler = type("ConfiguredMockHandler", (MockHandler,), {
+        "latency": latency_ms / 1000,
+        "token_latency": token_latency_ms / 1000
+    })
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI 兼容接口的本地模拟服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--token-latency-ms", type=float, default=5)
+    args = parser.parse_args()
+
+    server = serve(args.host, args.port, args.latency_ms, args.token_latency_ms)
+    print(f"模拟服务已启动: http://{args.host}:{server.server_port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+PDF 翻译断点续传
+按输入文件内容哈希和语言对记录已完成的页面，进程中断后重新运行时跳过这些页面
+"""
+import hashlib
+import itertools
+import json
+import logging
+import os
+import threading
+from typing import Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """
+    计算文件内容的 SHA-256
+
+    Args:
+        path: 文件路径
+        chunk_size: 每次读取的字节数
+
+    Returns:
+        十六进制哈希值
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _try_lock(f) -> bool:
+    """对打开的文件加非阻塞排他锁，进程退出（包括崩溃）时由系统释放"""
+    try:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+def _truncate_partial_line(path: str, chunk_size: int = 64 * 1024):
+    """截掉文件末尾没有换行符的不完整记录（进程在写入过程中中断时留下）"""
+    with open(path, "rb+") as f:
+        end = f.seek(0, os.SEEK_END)
+        if end == 0:
+            return
+        f.seek(end - 1)
+        if f.read(1) == b"\n":
+            return
+        position = end
+        keep = 0
+        while position > 0:
+            start = max(0, position - chunk_size)
+            f.seek(start)
+            newline = f.read(position - start).rfind(b"\n")
+            if newline >= 0:
+                keep = start + newline + 1
+                break
+            position = start
+        f.truncate(keep)
+        logger.warning(f"截掉检查点末尾不完整的记录: {path}（{end - keep} 字节）")
+
+
+class TranslationCheckpoint:
+    """
+    单个 PDF 翻译任务的检查点
+
+    同一文件、语言对和布局方式的任务共用一组检查点槽位，每个运行中的任务对自己的槽位持有排他锁，
+    同时翻译同一文件的任务各自记录、互不删除；任务中断后锁随之释放，重新运行时优先使用有进度的空闲槽位。
+    """
+
+    def __init__(
+        self,
+        pdf_path: str,
+        source_language: str,
+        target_language: str,
+        checkpoint_dir: Optional[str] = None,
+        layout_mode: str = "reflow"
+    ):
+        """
+        初始化检查点
+
+        Args:
+            pdf_path: 输入 PDF 文件路径
+            source_language: 源语言
+            target_language: 目标语言
+            checkpoint_dir: 检查点目录，默认在 TEMP_DIR 下
+            layout_mode: 输出布局方式，不同方式的页面数据格式不同，分开记录
+        """
+        from config import TEMP_DIR
+
+        self.checkpoint_dir = checkpoint_dir or os.path.join(TEMP_DIR, "checkpoints")
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+
+        key = f"{file_sha256(pdf_path)}:{source_language}:{target_language}"
+        if layout_mode != "reflow":
+            key += f":{layout_mode}"
+        base_id = hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+        self._lock = threading.Lock()
+
+        # 锁住一个没有被其他运行中任务占用的槽位，优先选择有进度的（上次中断的任务留下的）。
+        # 锁文件不随检查点删除（删除与其他任务加锁交错时两个任务可能共用一个槽位），
+        # 因此遇到第一个不存在的锁文件即可停止查找
+        job_id, lock_file = None, None
+        for slot in itertools.count():
+            candidate = base_id if slot == 0 else f"{base_id}-{slot}"
+            lock_path = os.path.join(self.checkpoint_dir, f"{candidate}.lock")
+            if lock_file is not None and not os.path.exists(lock_path):
+                break
+            candidate_file = open(lock_path, "a+b")
+            if not _try_lock(candidate_file):
+                candidate_file.close()
+                continue
+            data_path = os.path.join(self.checkpoint_dir, f"{candidate}.jsonl")
+            has_progress = os.path.exists(data_path) and os.path.getsize(data_path) > 0
+            if lock_file is not None and not has_progress:
+                candidate_file.close()
+                continue
+            if lock_file is not None:
+                lock_file.close()
+            job_id, lock_file = candidate, candidate_file
+            if has_progress:
+                break
+        self.job_id = job_id
+        self.path = os.path.join(self.checkpoint_dir, f"{job_id}.jsonl")
+        self._lock_file = lock_file
+
+        if os.path.exists(self.path):
+            _truncate_partial_line(self.path)
+
+    def load(self) -> Dict[int, Dict]:
+        """
+        读取已完成的页面
+
+        Returns:
+            页码到翻译后页面数据的映射
+        """
+        pages = {}
+        if not os.path.exists(self.path):
+            return pages
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    page_data = json.loads(line)
+                except json.JSONDecodeError:
+                    # 进程在写入过程中中断时最后一行可能不完整
+                    logger.warning(f"忽略检查点中不完整的记录: {self.path}")
+                    continue
+                pages[page_data["page_number"]] = page_data
+        if pages:
+            logger.info(f"找到检查点 {self.job_id}，已完成 {len(pages)} 页")
+        return pages
+
+    def record(self, page_data: Dict):
+        """
+        追加一页翻译结果并立即落盘
+
+        Args:
+            page_data: 翻译后的页面数据
+        """
+        line = json.dumps(page_data, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def remove(self):
+        """任务完成后删除检查点并释放槽位"""
+        with self._lock:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+        self.close()
+
+    def close(self):
+        """释放槽位（保留已记录的页面，供下次运行续传）"""
+        with self._lock:
+            if self._lock_file is not None:
+                self._lock_file.close()
+                self._lock_file = None
@@ -0,0 +1,114 @@
+"""
+文本分段模块
+按段落、句子边界（含中日韩标点）切分长文本，并按 token 预算打包成翻译块
+"""
+import re
+from typing import Callable, List
+
+# 段落边界：空行
+_PARAGRAPH_RE = re.compile(r"(?<=\n)(?=[ \t　]*\n)")
+# 句子边界：中日韩句末标点之后，或西文句末标点后紧跟空白处
+_SENTENCE_RE = re.compile(r"(?<=[。！？；…」』])|(?<=[.!?;:])(?=\s)")
+# 词边界：空白之后
+_WORD_RE = re.compile(r"(?<=\s)(?=\S)")
+# 中日韩字符（含假名、谚文）
+_CJK_RE = re.compile(r"[぀-ヿ㐀-鿿가-힣豈-﫿]")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    无 tokenizer 时估算 token 数：中日韩字符按 1 个计，其余按 4 个字符 1 个计
+
+    Args:
+        text: 文本
+
+    Returns:
+        估算的 token 数
+    """
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def _split_keep(pattern: re.Pattern, text: str) -> List[str]:
+    """按零宽模式切分，保留所有字符（拼接后与原文一致）"""
+    return [piece for piece in pattern.split(text) if piece]
+
+
+def _hard_split(text: str, max_tokens: int, count_tokens: Callable[[str], int]) -> List[str]:
+    """在没有任何自然边界时，按字符二分查找能放入预算的最长前缀"""
+    pieces = []
+    while text:
+        if count_tokens(text) <= max_tokens:
+            pieces.append(text)
+            break
+        low, high = 1, len(text)
+        while low < high:
+            mid = (low + high + 1) // 2
+            if count_tokens(text[:mid]) <= max_tokens:
+                low = mid
+            else:
+                high = mid - 1
+        pieces.append(text[:low])
+        text = text[low:]
+    return pieces
+
+
+def _split_units(text: str, max_tokens: int, count_tokens: Callable[[str], int]) -> List[str]:
+    """逐级切分（段落 → 句子 → 词 → 字符），直到每个单元都不超过预算"""
+    units = []
+    for paragraph in _split_keep(_PARAGRAPH_RE, text):
+        if count_tokens(paragraph) <= max_tokens:
+            units.append(paragraph)
+            continue
+        for sentence in _split_keep(_SENTENCE_RE, paragraph):
+            if count_tokens(sentence) <= max_tokens:
+                units.append(sentence)
+                continue
+            for word in _split_keep(_WORD_RE, sentence):
+                if count_tokens(word) <= max_tokens:
+                    units.append(word)
+                else:
+                    units.extend(_hard_split(word, max_tokens, count_tokens))
+    return units
+
+
+def split_text(
+    text: str,
+    max_tokens: int,
+    count_tokens: Callable[[str], int] = estimate_tokens
+) -> List[str]:
+    """
+    将文本切分为不超过 token 预算的翻译块
+
+    优先在段落边界切分，其次是句子边界，只有单个句子超出预算时才按词或字符切分。
+    相邻单元会被贪心合并，使每块尽量接近预算。
+
+    Args:
+        text: 待切分文本
+        max_tokens: 每块的 token 上限
+        count_tokens: token 计数函数
+
+    Returns:
+        翻译块列表（已去除首尾空白，不含空块）
+    """
+    max_tokens = max(1, max_tokens)
+    if not text or not text.strip():
+        return []
+    if count_tokens(text) <= max_tokens:
+        return [text.strip()]
+
+    chunks = []
+    current = ""
+    current_tokens = 0
+    for unit in _split_units(text, max_tokens, count_tokens):
+        unit_tokens = count_tokens(unit)
+        if current and current_tokens + unit_tokens > max_tokens:
+            chunks.append(current)
+            current = ""
+            current_tokens = 0
+        current += unit
+        current_tokens += unit_tokens
+    if current:
+        chunks.append(current)
+
+    return [chunk.strip() for chunk in chunks if chunk.strip()]
@@ -12,6 +12,42 @@ DEVICE = os.getenv("DEVICE", "cuda")  # cuda 或 cpu
 MAX_LENGTH = int(os.getenv("MAX_LENGTH", "2048"))
 TOP_P = float(os.getenv("TOP_P", "0.7"))
 TEMPERATURE = float(os.getenv("TEMPERATURE", "0.95"))
+MODEL_LAZY_LOAD = os.getenv("MODEL_LAZY_LOAD", "True").lower() == "true"  # 首次请求时才加载模型
+QUANTIZATION = os.getenv("QUANTIZATION", "none").lower()  # CPU 推理量化方式：none、int8、int4
+PREFIX_CACHE_ENABLED = os.getenv("PREFIX_CACHE_ENABLED", "False").lower() == "true"  # 复用提示词前缀的 KV 缓存
+
+# 生成预算配置
+GENERATION_BUDGET_ENABLED = os.getenv("GENERATION_BUDGET_ENABLED", "True").lower() == "true"  # 按原文长度计算每条请求的生成上限
+GENERATION_BUDGET_MARGIN = float(os.getenv("GENERATION_BUDGET_MARGIN", "1.5"))  # 在典型译文长度之上预留的倍数
+GENERATION_BUDGET_MIN_TOKENS = int(os.getenv("GENERATION_BUDGET_MIN_TOKENS", "32"))  # 每条请求额外预留的 token 数
+REPETITION_STOP_TOKENS = int(os.getenv("REPETITION_STOP_TOKENS", "32"))  # 末尾重复达到多少 token 判定为循环并停止，0 表示不检测
+SCRIPT_CONSTRAINT_MODE = os.getenv("SCRIPT_CONSTRAINT_MODE", "off").lower()  # 按目标语言约束解码：off、bias（压低其他文字）、mask（屏蔽其他文字）
+SCRIPT_CONSTRAINT_BIAS = float(os.getenv("SCRIPT_CONSTRAINT_BIAS", "5.0"))  # 压低其他文字时 logit 的减少量
+
+# 翻译后端配置
+TRANSLATION_BACKEND = os.getenv("TRANSLATION_BACKEND", "chatglm").lower()  # chatglm、stub 或 openai
+STUB_LATENCY_MS = float(os.getenv("STUB_LATENCY_MS", "50"))  # 替身后端每次调用的固定延迟
+STUB_TOKEN_LATENCY_MS = float(os.getenv("STUB_TOKEN_LATENCY_MS", "5"))  # 替身后端每个输出 token 的延迟
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "http://127.0.0.1:8000/v1")
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "chatglm2-6b")
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "120"))
+
+# 批量生成配置
+BATCH_SIZE = int(os.getenv("BATCH_SIZE", "8"))  # 单次 generate 的最大条数
+BATCH_MAX_TOKENS = int(os.getenv("BATCH_MAX_TOKENS", "8192"))  # 单批填充后的提示词 token 上限
+SCHEDULER_MAX_WAIT_MS = float(os.getenv("SCHEDULER_MAX_WAIT_MS", "10"))  # 调度器收集一批请求的最长等待时间
+CONTINUOUS_BATCHING_ENABLED = os.getenv("CONTINUOUS_BATCHING_ENABLED", "False").lower() == "true"  # 界面请求使用连续批处理引擎
+
+# 分段配置
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "1024"))  # 单个翻译块的原文 token 上限
+CHUNK_OUTPUT_RATIO = float(os.getenv("CHUNK_OUTPUT_RATIO", "1.0"))  # 为译文预留的长度（相对原文 token 数）
+
+# 多进程工作池配置（纯 CPU 部署）
+TRANSLATOR_POOL_WORKERS = int(os.getenv("TRANSLATOR_POOL_WORKERS", "0"))  # 工作进程数，0 表示不使用工作池
+TRANSLATOR_POOL_THREADS = int(os.getenv("TRANSLATOR_POOL_THREADS", "0"))  # 每个进程的线程数，0 表示按核心数平均分配
+TRANSLATOR_POOL_HEALTH_INTERVAL = float(os.getenv("TRANSLATOR_POOL_HEALTH_INTERVAL", "10"))  # 健康检查间隔（秒）
+TRANSLATOR_POOL_START_TIMEOUT = float(os.getenv("TRANSLATOR_POOL_START_TIMEOUT", "1800"))  # 等待进程加载模型的最长时间（秒）
 
 # Gradio 配置
 GRADIO_SERVER_NAME = os.getenv("GRADIO_SERVER_NAME", "0.0.0.0")
@@ -42,6 +78,32 @@ PDF_DPI = 200
 PDF_IMAGE_FORMAT = "PNG"
 TEMP_DIR = os.path.join(os.path.dirname(__file__), "temp")
 OUTPUT_DIR = os.path.join(os.path.dirname(__file__), "output")
+PDF_PIPELINE_QUEUE_SIZE = int(os.getenv("PDF_PIPELINE_QUEUE_SIZE", "8"))  # 流水线各阶段之间的队列长度
+PDF_TRANSLATE_WORKERS = int(os.getenv("PDF_TRANSLATE_WORKERS", "1"))  # 并行翻译页面的线程数
+PDF_WRITER_FLUSH_PAGES = int(os.getenv("PDF_WRITER_FLUSH_PAGES", "10"))  # 输出文件每累计多少页写盘一次
+PDF_CHECKPOINT_ENABLED = os.getenv("PDF_CHECKPOINT_ENABLED", "True").lower() == "true"  # 断点续传
+PDF_LAYOUT_MODE = os.getenv("PDF_LAYOUT_MODE", "reflow").lower()  # reflow 重新排版，blocks/inplace 按文字块写回原页面
+PDF_BLOCK_FONT_FILE = os.getenv("PDF_BLOCK_FONT_FILE", "")  # blocks/inplace 模式使用的字体文件，空表示按目标语言选择内置字体
+PDF_BLOCK_MIN_FONT_SIZE = float(os.getenv("PDF_BLOCK_MIN_FONT_SIZE", "4"))  # blocks/inplace 模式译文放不下时缩小字号的下限
+SEGMENT_FILTER_ENABLED = os.getenv("SEGMENT_FILTER_ENABLED", "True").lower() == "true"  # 页码、网址、代码、参考文献等分段不调用模型，保留原文
+
+# 翻译记忆缓存配置
+TRANSLATION_MEMORY_ENABLED = os.getenv("TRANSLATION_MEMORY_ENABLED", "True").lower() == "true"
+TRANSLATION_MEMORY_PATH = os.getenv(
+    "TRANSLATION_MEMORY_PATH", os.path.join(TEMP_DIR, "translation_memory.sqlite3")
+)
+TRANSLATION_MEMORY_MAX_ENTRIES = int(os.getenv("TRANSLATION_MEMORY_MAX_ENTRIES", "100000"))
+
+# 模型快照缓存配置（CPU 推理时缓存转换为 float32 的权重）
+MODEL_CACHE_ENABLED = os.getenv("MODEL_CACHE_ENABLED", "False").lower() == "true"
+MODEL_CACHE_DIR = os.getenv("MODEL_CACHE_DIR", os.path.join(TEMP_DIR, "model_cache"))
+MODEL_MMAP_WEIGHTS = os.getenv("MODEL_MMAP_WEIGHTS", "False").lower() == "true"  # 内存映射加载，多进程共享权重
+
+# 性能埋点配置
+INSTRUMENTATION_ENABLED = os.getenv("INSTRUMENTATION_ENABLED", "False").lower() == "true"  # 记录各阶段耗时和 token 数
+INSTRUMENTATION_MAX_EVENTS = int(os.getenv("INSTRUMENTATION_MAX_EVENTS", "100000"))  # JSON trace 保留的最近事件数
+INSTRUMENTATION_TRACE_PATH = os.getenv("INSTRUMENTATION_TRACE_PATH", "")  # 每次 PDF 翻译结束后写入 JSON trace，空表示不写
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # Prometheus 指标端口，0 表示不启动
 
 # 创建临时目录
 os.makedirs(TEMP_DIR, exist_ok=True)
@@ -0,0 +1,625 @@
+"""
+连续批处理（iteration-level batching）生成引擎
+每个解码步骤都可以有序列加入或离开正在运行的批次：标题、图注等短文本生成完立即返回，
+空出的 KV 缓存槽位由排队中的请求复用，不必等待同批最长的序列结束。
+
+批内各行的 KV 缓存左侧填充对齐到同一长度。新序列单独预填充（可复用提示词前缀缓存）后，
+补齐到批次长度放入空闲槽位；所有行的左侧都是填充时裁掉这些列。
+
+接口与 BatchScheduler 相同（submit、submit_stream、translate、translate_batch、stats、shutdown），
+可以直接替换，目前只支持 ChatGLMTranslator。
+"""
+import asyncio
+import collections
+import copy
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Optional, Dict, Any, List, AsyncIterator, Callable
+
+import torch
+
+from generation_budget import RepetitionDetector, STOP_BUDGET, STOP_EOS, STOP_REPETITION, generation_budget, generation_stats
+from instrumentation import tracer
+
+logger = logging.getLogger(__name__)
+
+
+class _Sequence:
+    """排队或正在生成的单条请求"""
+
+    __slots__ = (
+        "text", "source_language", "target_language", "memory_key", "future", "on_update",
+        "prompt_tokens", "max_new_tokens", "generated", "detector", "wasted", "stop_reason", "constraint",
+        "enqueued_at", "started_at", "first_token_at"
+    )
+
+    def __init__(
+        self,
+        text: str,
+        source_language: str,
+        target_language: str,
+        memory_key: Optional[str],
+        future: Future,
+        on_update: Optional[Callable[[Dict[str, Any]], None]]
+    ):
+        self.text = text
+        self.source_language = source_language
+        self.target_language = target_language
+        self.memory_key = memory_key
+        self.future = future
+        self.on_update = on_update
+        self.prompt_tokens = 0
+        self.max_new_tokens = 0
+        self.generated = []
+        self.detector = None
+        self.wasted = 0
+        self.stop_reason = STOP_BUDGET
+        self.constraint = None
+        self.enqueued_at = time.perf_counter()
+        self.started_at = 0.0
+        self.first_token_at = 0.0
+
+
+def _cache_layers(past) -> List[tuple]:
+    """把 past_key_values 转成每层 (key, value) 的列表"""
+    if isinstance(past, (tuple, list)):
+        return [(layer[0], layer[1]) for layer in past]
+    if hasattr(past, "layers"):
+        # transformers >= 4.56
+        return [(layer.keys, layer.values) for layer in past.layers]
+    return list(zip(past.key_cache, past.value_cache))
+
+
+def _build_cache(layers: List[tuple], legacy: bool):
+    """用每层 (key, value) 重新构建模型接受的 past_key_values"""
+    if legacy:
+        return tuple(layers)
+    from transformers import DynamicCache
+
+    cache = DynamicCache()
+    for idx, (key, value) in enumerate(layers):
+        cache.update(key, value, idx)
+    return cache
+
+
+class ContinuousBatchingEngine:
+    """在后台线程中逐步解码、允许序列随时加入和离开的生成引擎"""
+
+    def __init__(
+        self,
+        translator,
+        max_batch_size: Optional[int] = None,
+        max_length: Optional[int] = None,
+        top_p: Optional[float] = None,
+        temperature: Optional[float] = None
+    ):
+        """
+        初始化引擎并启动解码线程
+
+        Args:
+            translator: ChatGLMTranslator 实例（模型可以尚未加载）
+            max_batch_size: 同时生成的最大序列数（KV 缓存槽位数）
+            max_length: 单条序列的最大长度（提示词 + 译文）
+            top_p: top_p 参数
+            temperature: temperature 参数
+        """
+        from config import BATCH_SIZE, MAX_LENGTH, TOP_P, TEMPERATURE, REPETITION_STOP_TOKENS
+
+        self.translator = translator
+        self.max_batch_size = max(1, max_batch_size or BATCH_SIZE)
+        self.max_length = max_length or MAX_LENGTH
+        self.top_p = top_p or TOP_P
+        self.temperature = temperature or TEMPERATURE
+        self.repetition_tokens = REPETITION_STOP_TOKENS
+
+        # 运行中的批次：rows[i] 为 None 表示空闲槽位
+        self._rows = []
+        self._past = None
+        self._mask = None
+        self._next_tokens = None
+        self._positions = []
+        # KV 张量的批次维和序列维，首次预填充时确定
+        self._batch_dim = 0
+        self._seq_dim = 2
+        self._legacy_cache = False
+        self._eos_ids = None
+        self._warpers = None
+
+        # 统计信息
+        self._stats_lock = threading.Lock()
+        self._requests = 0
+        self._completed = 0
+        self._steps = 0
+        self._step_rows = 0
+        self._total_wait = 0.0
+        self._max_wait_seen = 0.0
+
+        self._queue = queue.Queue()
+        self._waiting = collections.deque()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="continuous-batching", daemon=True)
+        self._thread.start()
+
+    def __getattr__(self, name):
+        # 其余属性（memory、count_tokens、chunk_token_budget、device 等）透传给翻译器
+        return getattr(self.translator, name)
+
+    def _submit(
+        self,
+        text: str,
+        source_language: str,
+        target_language: str,
+        on_update: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> Future:
+        """检查输入和翻译记忆，需要生成时放入队列，返回结果的 Future"""
+        future = Future()
+        if not text or not text.strip():
+            future.set_result({"success": False, "error": "文本为空", "translated_text": ""})
+            return future
+        if not self.translator.ensure_loaded():
+            future.set_result({
+                "success": False,
+                "error": self.translator._not_loaded_message(),
+                "translated_text": ""
+            })
+            return future
+
+        memory_key = self.translator._memory_key(
+            text, source_language, target_language, self.max_length, self.top_p, self.temperature
+        )
+        cached = self.translator._lookup_memory(memory_key, source_language, target_language)
+        if cached:
+            future.set_result(cached)
+            return future
+
+        with self._stats_lock:
+            self._requests += 1
+        self._queue.put(_Sequence(text, source_language, target_language, memory_key, future, on_update))
+        return future
+
+    async def submit(
+        self,
+        text: str,
+        source_language: str = "English",
+        target_language: str = "Chinese"
+    ) -> Dict[str, Any]:
+        """
+        提交一条翻译请求并等待结果，可在任意事件循环中调用
+
+        Args:
+            text: 待翻译的文本
+            source_language: 源语言
+            target_language: 目标语言
+
+        Returns:
+            与 translate() 格式相同的结果字典
+        """
+        loop = asyncio.get_running_loop()
+        future = await loop.run_in_executor(None, self._submit, text, source_language, target_language)
+        return await asyncio.wrap_future(future)
+
+    def translate(
+        self,
+        text: str,
+        source_language: str = "English",
+        target_language: str = "Chinese"
+    ) -> Dict[str, Any]:
+        """
+        同步翻译接口，供 PDFProcessor 等同步代码使用
+
+        Args:
+            text: 待翻译的文本
+            source_language: 源语言
+            target_language: 目标语言
+
+        Returns:
+            翻译结果字典
+        """
+        return self._submit(text, source_language, target_language).result()
+
+    def translate_batch(
+        self,
+        texts: list,
+        source_language: str = "English",
+        target_language: str = "Chinese"
+    ) -> list:
+        """
+        同步批量翻译接口，各条文本作为独立序列加入运行中的批次
+
+        Args:
+            texts: 待翻译的文本列表
+            source_language: 源语言
+            target_language: 目标语言
+
+        Returns:
+            翻译结果列表（与输入顺序一致）
+        """
+        futures = [self._submit(text, source_language, target_language) for text in texts]
+        return [future.result() for future in futures]
+
+    async def submit_stream(
+        self,
+        text: str,
+        source_language: str = "English",
+        target_language: str = "Chinese"
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        流式翻译，每个解码步骤产出一次已生成的文本
+
+        Args:
+            text: 待翻译的文本
+            source_language: 源语言
+            target_language: 目标语言
+
+        Yields:
+            {"translated_text": 已生成的原始文本, "finished": False}，最后是带 finished=True 的完整结果
+        """
+        loop = asyncio.get_running_loop()
+        items = asyncio.Queue()
+        future = await loop.run_in_executor(
+            None,
+            self._submit,
+            text,
+            source_language,
+            target_language,
+            lambda item: loop.call_soon_threadsafe(items.put_nowait, item)
+        )
+        future.add_done_callback(lambda _: loop.call_soon_threadsafe(items.put_nowait, None))
+        while True:
+            item = await items.get()
+            if item is None:
+                break
+            yield item
+        result = future.result()
+        result["finished"] = True
+        yield result
+
+    def _run(self):
+        while not self._stop.is_set():
+            if not self._waiting and not self._active_rows():
+                try:
+                    self._waiting.append(self._queue.get(timeout=0.1))
+                except queue.Empty:
+                    continue
+            while True:
+                try:
+                    self._waiting.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                while self._waiting and self._active_rows() < self.max_batch_size:
+                    self._admit(self._waiting.popleft())
+                self._compact()
+                if self._active_rows():
+                    self._step()
+            except Exception as e:
+                logger.error(f"连续批处理解码失败: {str(e)}")
+                for sequence in self._rows:
+                    if sequence is not None:
+                        self._fail(sequence, e)
+                self._reset()
+
+        error = RuntimeError("连续批处理引擎已停止")
+        while True:
+            try:
+                self._waiting.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        for sequence in list(self._waiting) + [row for row in self._rows if row is not None]:
+            self._fail(sequence, error)
+
+    def _active_rows(self) -> int:
+        return sum(1 for sequence in self._rows if sequence is not None)
+
+    def _reset(self):
+        self._rows = []
+        self._past = None
+        self._mask = None
+        self._next_tokens = None
+        self._positions = []
+
+    def _setup(self, layers: List[tuple], prompt_length: int, past):
+        """首次预填充后确定 KV 张量布局、结束 token 和采样参数"""
+        # ChatGLM2 的 KV 为 [序列, 批次, 头, 维度]，其余模型为 [批次, 头, 序列, 维度]
+        key = layers[0][0]
+        if key.shape[0] == prompt_length and key.shape[1] == 1:
+            self._batch_dim, self._seq_dim = 1, 0
+        else:
+            self._batch_dim, self._seq_dim = 0, 2
+        self._legacy_cache = isinstance(past, (tuple, list))
+
+        self._eos_ids = self.translator._eos_token_ids()
+
+        from transformers import LogitsProcessorList, TemperatureLogitsWarper, TopPLogitsWarper
+        self._warpers = LogitsProcessorList([
+            TemperatureLogitsWarper(self.temperature),
+            TopPLogitsWarper(self.top_p)
+        ])
+
+    def _forward(self, **kwargs):
+        """调用模型前向，只计算最后一个位置的 logits"""
+        return self.translator._forward_last(**kwargs)
+
+    def _sample(self, logits: torch.Tensor, sequences: List[Optional[_Sequence]]) -> torch.Tensor:
+        scores = logits.float()
+        # 目标文字约束按行应用（各行的目标语言和已生成内容不同）
+        for idx, sequence in enumerate(sequences):
+            if sequence is not None and sequence.constraint is not None:
+                scores[idx:idx + 1] = sequence.constraint.apply(scores[idx:idx + 1])
+        scores = self._warpers(None, scores)
+        return torch.multinomial(torch.softmax(scores, dim=-1), num_samples=1).squeeze(1)
+
+    def _prefill(self, sequence: _Sequence):
+        """单独预填充一条提示词，提示词前缀缓存可用时从缓存继续"""
+        translator = self.translator
+        chat_prompt = translator._build_chat_prompt(
+            translator._build_prompt(sequence.text, sequence.source_language, sequence.target_language)
+        )
+        input_ids = translator.tokenizer(chat_prompt, return_tensors="pt")["input_ids"].to(translator.model.device)
+        total = input_ids.shape[1]
+
+        past = None
+        start = 0
+        if getattr(translator, "prefix_cache_enabled", False):
+            entry = translator._get_prefix_entry(sequence.source_language, sequence.target_language)
+            if entry is not None:
+                prefix_ids, prefix_past = entry
+                if total > len(prefix_ids) and input_ids[0, :len(prefix_ids)].tolist() == prefix_ids:
+                    past = copy.deepcopy(prefix_past)
+                    start = len(prefix_ids)
+
+        with tracer.span("engine.prefill", prompt_tokens=total, cached_tokens=start):
+            logits, past = self._forward(
+                input_ids=input_ids[:, start:],
+                past_key_values=past,
+                position_ids=torch.arange(start, total, device=input_ids.device).unsqueeze(0),
+                attention_mask=torch.ones((1, total), dtype=torch.long, device=input_ids.device)
+            )
+        return total, logits, past
+
+    def _admit(self, sequence: _Sequence):
+        """预填充新序列并放入批次的空闲槽位"""
+        sequence.started_at = time.perf_counter()
+        wait = sequence.started_at - sequence.enqueued_at
+        with self._stats_lock:
+            self._total_wait += wait
+            self._max_wait_seen = max(self._max_wait_seen, wait)
+
+        try:
+            prompt_length, logits, past = self._prefill(sequence)
+            layers = _cache_layers(past)
+            if self._eos_ids is None:
+                self._setup(layers, prompt_length, past)
+            sequence.constraint = self.translator._script_processor(sequence.target_language)
+            token = self._sample(logits, [sequence])
+        except Exception as e:
+            logger.error(f"预填充失败: {str(e)}")
+            self._fail(sequence, e)
+            return
+
+        try:
+            self._insert(sequence, prompt_length, token, past, layers)
+        except Exception as e:
+            # 序列已离开等待队列但还没放入批次，先让它失败，再由 _run 处理可能已不完整的批次
+            self._fail(sequence, e)
+            raise
+
+    def _insert(self, sequence: _Sequence, prompt_length: int, token: torch.Tensor, past, layers: List[tuple]):
+        """记录预填充结果并把序列放入批次（单独预填充的 KV 左侧填充到批次长度）"""
+        sequence.prompt_tokens = prompt_length
+        sequence.max_new_tokens = generation_budget(
+            self.translator.count_tokens(sequence.text), sequence.target_language, prompt_length, self.max_length
+        )
+        if self.repetition_tokens > 0:
+            sequence.detector = RepetitionDetector(self.repetition_tokens)
+        sequence.first_token_at = time.perf_counter()
+        if self._append_token(sequence, int(token[0])):
+            self._finish(sequence)
+            return
+
+        device = token.device
+        if self._past is None:
+            self._rows = [sequence]
+            self._past = past
+            self._mask = torch.ones((1, prompt_length), dtype=torch.long, device=device)
+            self._next_tokens = token
+            self._positions = [prompt_length]
+            return
+
+        # 左侧填充，使新序列与批次的 KV 长度一致
+        batch_length = self._mask.shape[1]
+        if prompt_length > batch_length:
+            self._pad_batch(prompt_length - batch_length)
+            batch_length = prompt_length
+        padding = batch_length - prompt_length
+        layers = [(self._left_pad(key, padding), self._left_pad(value, padding)) for key, value in layers]
+        mask = torch.cat([
+            torch.zeros((1, padding), dtype=torch.long, device=device),
+            torch.ones((1, prompt_length), dtype=torch.long, device=device)
+        ], dim=1)
+
+        slot = next((idx for idx, row in enumerate(self._rows) if row is None), None)
+        if slot is None:
+            batch_layers = [
+                (torch.cat([key, new_key], dim=self._batch_dim), torch.cat([value, new_value], dim=self._batch_dim))
+                for (key, value), (new_key, new_value) in zip(_cache_layers(self._past), layers)
+            ]
+            self._past = _build_cache(batch_layers, self._legacy_cache)
+            self._mask = torch.cat([self._mask, mask], dim=0)
+            self._next_tokens = torch.cat([self._next_tokens, token])
+            self._rows.append(sequence)
+            self._positions.append(prompt_length)
+        else:
+            # 复用已结束序列留下的槽位
+            for (key, value), (new_key, new_value) in zip(_cache_layers(self._past), layers):
+                key.narrow(self._batch_dim, slot, 1).copy_(new_key)
+                value.narrow(self._batch_dim, slot, 1).copy_(new_value)
+            self._mask[slot] = mask[0]
+            self._next_tokens[slot] = token[0]
+            self._rows[slot] = sequence
+            self._positions[slot] = prompt_length
+
+    def _left_pad(self, tensor: torch.Tensor, length: int) -> torch.Tensor:
+        if length <= 0:
+            return tensor
+        shape = list(tensor.shape)
+        shape[self._seq_dim] = length
+        return torch.cat([tensor.new_zeros(shape), tensor], dim=self._seq_dim)
+
+    def _pad_batch(self, length: int):
+        layers = [(self._left_pad(key, length), self._left_pad(value, length)) for key, value in _cache_layers(self._past)]
+        self._past = _build_cache(layers, self._legacy_cache)
+        self._mask = torch.cat([self._mask.new_zeros((self._mask.shape[0], length)), self._mask], dim=1)
+
+    def _compact(self):
+        """没有请求等待时移除空闲槽位，并裁掉所有行左侧都是填充的列"""
+        if self._past is None:
+            return
+        keep = [idx for idx, row in enumerate(self._rows) if row is not None]
+        if not keep:
+            self._reset()
+            return
+        drop_rows = len(keep) < len(self._rows) and not self._waiting
+        filled = self._mask[keep].any(dim=0).nonzero()
+        drop_columns = int(filled[0]) if len(filled) else 0
+        if not drop_rows and not drop_columns:
+            return
+
+        index = torch.tensor(keep if drop_rows else list(range(len(self._rows))), device=self._mask.device)
+        layers = []
+        for key, value in _cache_layers(self._past):
+            if drop_rows:
+                key = key.index_select(self._batch_dim, index)
+                value = value.index_select(self._batch_dim, index)
+            if drop_columns:
+                key = key.narrow(self._seq_dim, drop_columns, key.shape[self._seq_dim] - drop_columns)
+                value = value.narrow(self._seq_dim, drop_columns, value.shape[self._seq_dim] - drop_columns)
+            layers.append((key.contiguous(), value.contiguous()))
+        self._past = _build_cache(layers, self._legacy_cache)
+        self._mask = self._mask.index_select(0, index)[:, drop_columns:]
+        self._next_tokens = self._next_tokens.index_select(0, index)
+        if drop_rows:
+            self._rows = [self._rows[idx] for idx in keep]
+            self._positions = [self._positions[idx] for idx in keep]
+
+    def _step(self):
+        """所有行各解码一个 token，结束的序列立即返回并空出槽位"""
+        batch_size = len(self._rows)
+        device = self._mask.device
+        self._mask = torch.cat([self._mask, self._mask.new_ones((batch_size, 1))], dim=1)
+        with tracer.span("engine.decode", batch_size=self._active_rows()):
+            logits, self._past = self._forward(
+                input_ids=self._next_tokens.unsqueeze(1),
+                past_key_values=self._past,
+                position_ids=torch.tensor(self._positions, device=device).unsqueeze(1),
+                attention_mask=self._mask
+            )
+            tokens = self._sample(logits, self._rows)
+        with self._stats_lock:
+            self._steps += 1
+            self._step_rows += self._active_rows()
+
+        self._next_tokens = tokens
+        token_list = tokens.tolist()
+        for idx, sequence in enumerate(self._rows):
+            self._positions[idx] += 1
+            if sequence is None:
+                continue
+            if self._append_token(sequence, token_list[idx]):
+                self._finish(sequence)
+                self._rows[idx] = None
+                # 空出的槽位在复用前不参与注意力
+                self._mask[idx].zero_()
+                self._mask[idx, -1] = 1
+
+    def _append_token(self, sequence: _Sequence, token: int) -> bool:
+        """记录新 token，返回序列是否结束"""
+        if token in self._eos_ids:
+            sequence.stop_reason = STOP_EOS
+            return True
+        sequence.generated.append(token)
+        if sequence.constraint is not None:
+            sequence.constraint.observe(0, token)
+        if sequence.detector is not None and sequence.detector.update(token):
+            # 陷入重复循环：丢弃重复的部分并结束
+            sequence.wasted = sequence.detector.repeated
+            sequence.stop_reason = STOP_REPETITION
+            return True
+        if sequence.on_update is not None:
+            sequence.on_update({
+                "success": True,
+                "translated_text": self._decode(sequence),
+                "finished": False
+            })
+        return len(sequence.generated) >= sequence.max_new_tokens
+
+    def _decode(self, sequence: _Sequence) -> str:
+        kept = len(sequence.generated) - sequence.wasted
+        return self.translator._decode_response(sequence.generated[:kept])
+
+    def _finish(self, sequence: _Sequence):
+        end = time.perf_counter()
+        output_tokens = len(sequence.generated)
+        try:
+            with tracer.span("translator.postprocess"):
+                result = self.translator._build_result(
+                    self._decode(sequence), sequence.source_language, sequence.target_language
+                )
+        except Exception as e:
+            self._fail(sequence, e)
+            return
+        decode_time = end - sequence.first_token_at
+        result["queue_wait_ms"] = (sequence.started_at - sequence.enqueued_at) * 1000
+        result["ttft_ms"] = (sequence.first_token_at - sequence.enqueued_at) * 1000
+        result["output_tokens"] = output_tokens
+        result["tokens_per_second"] = output_tokens / decode_time if decode_time > 0 else 0.0
+        result.update(generation_stats(output_tokens, sequence.wasted, sequence.max_new_tokens, sequence.stop_reason))
+        self.translator._store_memory(sequence.memory_key, result)
+        tracer.count("tokens_total", sequence.prompt_tokens, direction="input")
+        tracer.count("tokens_total", output_tokens, direction="output")
+        tracer.count("generate_calls_total")
+        with self._stats_lock:
+            self._completed += 1
+        if not sequence.future.done():
+            sequence.future.set_result(result)
+
+    def _fail(self, sequence: _Sequence, error: Exception):
+        with self._stats_lock:
+            self._completed += 1
+        if not sequence.future.done():
+            sequence.future.set_result({"success": False, "error": str(error), "translated_text": ""})
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取调度统计
+
+        Returns:
+            队列深度、运行中的序列数、解码步数、平均批大小和排队等待时间
+        """
+        with self._stats_lock:
+            requests = self._requests
+            completed = self._completed
+            steps = self._steps
+            step_rows = self._step_rows
+            total_wait = self._total_wait
+            max_wait = self._max_wait_seen
+        queued = self._queue.qsize() + len(self._waiting)
+        started = requests - queued
+        return {
+            "queue_depth": queued,
+            "running": started - completed,
+            "requests": requests,
+            "steps": steps,
+            "avg_batch_size": step_rows / steps if steps else 0.0,
+            "avg_wait_ms": total_wait / started * 1000 if started else 0.0,
+            "max_wait_ms": max_wait * 1000
+        }
+
+    def shutdown(self):
+        """停止引擎，未完成的请求返回失败结果"""
+        self._stop.set()
+        self._thread.join(timeout=5)
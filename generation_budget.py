@@ -0,0 +1,245 @@
+"""
+生成预算模块
+按原文 token 数和目标语言的译文长度比例为每条请求计算生成上限，并检测重复循环提前停止，
+代替所有请求共用的固定 MAX_LENGTH
+"""
+import math
+import threading
+from typing import Dict, Any, Iterable, List, Optional
+
+# 译文 token 数相对原文 token 数的典型比例（ChatGLM2 tokenizer），未列出的目标语言使用 DEFAULT_EXPANSION_RATIO
+EXPANSION_RATIOS = {
+    "Chinese": 1.0,
+    "English": 1.3,
+    "Japanese": 1.6,
+    "Korean": 2.5,
+    "French": 1.5,
+    "German": 1.5,
+    "Spanish": 1.5,
+    "Italian": 1.5,
+    "Portuguese": 1.5,
+    "Russian": 2.0,
+    "Arabic": 2.0,
+    "Thai": 3.0,
+    "Vietnamese": 2.0,
+    "Hindi": 3.0,
+    "Turkish": 1.8,
+}
+DEFAULT_EXPANSION_RATIO = 2.0
+
+# 检测重复循环时考虑的最长重复单元（token 数）
+MAX_REPEAT_PERIOD = 64
+
+STOP_EOS = "eos"
+STOP_BUDGET = "budget"
+STOP_REPETITION = "repetition"
+
+
+def generation_budget(
+    source_tokens: int,
+    target_language: str,
+    prompt_tokens: int = 0,
+    max_length: Optional[int] = None
+) -> int:
+    """
+    计算一条请求最多生成的 token 数
+
+    预算 = 原文 token 数 × 目标语言比例 × GENERATION_BUDGET_MARGIN + GENERATION_BUDGET_MIN_TOKENS，
+    同时不超过 max_length 扣除提示词后的剩余长度。未启用时直接返回剩余长度。
+
+    Args:
+        source_tokens: 原文 token 数
+        target_language: 目标语言
+        prompt_tokens: 提示词 token 数
+        max_length: 提示词与译文的总长度上限，为 None 时使用 MAX_LENGTH
+
+    Returns:
+        最多生成的 token 数（至少为 1）
+    """
+    from config import MAX_LENGTH, GENERATION_BUDGET_ENABLED, GENERATION_BUDGET_MARGIN, GENERATION_BUDGET_MIN_TOKENS
+
+    remaining = max(1, (max_length or MAX_LENGTH) - prompt_tokens)
+    if not GENERATION_BUDGET_ENABLED:
+        return remaining
+    ratio = EXPANSION_RATIOS.get(target_language, DEFAULT_EXPANSION_RATIO)
+    budget = math.ceil(source_tokens * ratio * GENERATION_BUDGET_MARGIN) + GENERATION_BUDGET_MIN_TOKENS
+    return max(1, min(budget, remaining))
+
+
+class RepetitionDetector:
+    """逐 token 检测输出末尾是否陷入重复循环"""
+
+    __slots__ = ("min_tokens", "tokens", "runs", "repeated")
+
+    def __init__(self, min_tokens: int):
+        """
+        Args:
+            min_tokens: 末尾重复部分（第一次出现之后的副本）达到多少 token 判定为循环
+        """
+        self.min_tokens = min_tokens
+        self.tokens = []
+        # runs[p - 1]：末尾连续满足 tokens[i] == tokens[i - p] 的 token 数
+        self.runs = [0] * MAX_REPEAT_PERIOD
+        self.repeated = 0
+
+    def update(self, token: int) -> bool:
+        """
+        追加一个 token
+
+        Args:
+            token: 新生成的 token
+
+        Returns:
+            是否判定为重复循环（此时 repeated 为可以丢弃的末尾 token 数）
+        """
+        tokens = self.tokens
+        tokens.append(token)
+        length = len(tokens)
+        runs = self.runs
+        detected = 0
+        for period in range(1, min(MAX_REPEAT_PERIOD, length - 1) + 1):
+            if tokens[-1] == tokens[-1 - period]:
+                run = runs[period - 1] + 1
+                runs[period - 1] = run
+                # 至少完整重复两遍单元，避免把较长的正常短语当成循环
+                if not detected and run >= self.min_tokens and run >= 2 * period:
+                    detected = run
+            else:
+                runs[period - 1] = 0
+        if detected:
+            self.repeated = detected
+            return True
+        return False
+
+
+class GenerationCriteria:
+    """
+    generate 的停止条件：每行在达到自身预算或陷入重复循环时结束，并记录生成和浪费的 token 数
+
+    以 StoppingCriteriaList([criteria]) 传给 generate、model.chat 或 model.stream_chat。
+    """
+
+    def __init__(self, budgets: List[int], eos_token_ids: Iterable[int], repetition_tokens: int):
+        """
+        Args:
+            budgets: 每行最多生成的 token 数
+            eos_token_ids: 结束 token
+            repetition_tokens: 重复循环判定阈值，0 表示不检测
+        """
+        self.budgets = list(budgets)
+        self.eos_token_ids = set(eos_token_ids)
+        self.repetition_tokens = repetition_tokens
+        self.reset()
+        try:
+            # transformers >= 4.39 支持逐行停止，更早的版本只能在所有行结束时停止
+            from transformers.generation.stopping_criteria import EosTokenCriteria  # noqa: F401
+            self.per_row = True
+        except ImportError:
+            self.per_row = False
+
+    def reset(self):
+        """清空各行的状态，用于重新生成"""
+        self.detectors = [
+            RepetitionDetector(self.repetition_tokens) if self.repetition_tokens > 0 else None for _ in self.budgets
+        ]
+        self.generated = [0] * len(self.budgets)
+        self.reasons = [None] * len(self.budgets)
+
+    def __call__(self, input_ids, scores=None, **kwargs):
+        for row, token in enumerate(input_ids[:, -1].tolist()):
+            if self.reasons[row] is not None:
+                continue
+            if token in self.eos_token_ids:
+                self.reasons[row] = STOP_EOS
+                continue
+            self.generated[row] += 1
+            detector = self.detectors[row]
+            if detector is not None and detector.update(token):
+                self.reasons[row] = STOP_REPETITION
+            elif self.generated[row] >= self.budgets[row]:
+                self.reasons[row] = STOP_BUDGET
+        done = [reason is not None for reason in self.reasons]
+        if self.per_row:
+            return input_ids.new_tensor(done).bool()
+        return all(done)
+
+    def kept_tokens(self, row: int = 0) -> int:
+        """该行应保留的输出 token 数（去掉重复循环的副本）"""
+        return self.generated[row] - self.wasted_tokens(row)
+
+    def wasted_tokens(self, row: int = 0) -> int:
+        detector = self.detectors[row]
+        if self.reasons[row] == STOP_REPETITION and detector is not None:
+            return detector.repeated
+        return 0
+
+    def kept_ids(self, row: int = 0) -> List[int]:
+        """该行保留的输出 token（需要启用重复检测）"""
+        return self.detectors[row].tokens[:self.kept_tokens(row)]
+
+    def row_stats(self, row: int = 0) -> Dict[str, Any]:
+        """
+        该行的生成统计，合并到翻译结果字典中
+
+        Returns:
+            generated_tokens、wasted_tokens、max_new_tokens、stop_reason
+        """
+        return generation_stats(
+            self.generated[row], self.wasted_tokens(row), self.budgets[row], self.reasons[row] or STOP_BUDGET
+        )
+
+
+def generation_stats(generated: int, wasted: int, budget: int, reason: str) -> Dict[str, Any]:
+    """翻译结果中的生成统计字段"""
+    return {
+        "generated_tokens": generated,
+        "wasted_tokens": wasted,
+        "max_new_tokens": budget,
+        "stop_reason": reason
+    }
+
+
+class GenerationStats:
+    """汇总一份文档各条翻译结果的生成统计（线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.generated_tokens = 0
+        self.wasted_tokens = 0
+        self.budget_tokens = 0
+        self.stops = {STOP_EOS: 0, STOP_BUDGET: 0, STOP_REPETITION: 0}
+
+    def add(self, result: Dict[str, Any]):
+        """
+        累加一条翻译结果（来自翻译记忆或不带统计字段的结果会被忽略）
+
+        Args:
+            result: translate() 返回的结果字典
+        """
+        if "generated_tokens" not in result:
+            return
+        with self._lock:
+            self.requests += 1
+            self.generated_tokens += result["generated_tokens"]
+            self.wasted_tokens += result["wasted_tokens"]
+            self.budget_tokens += result["max_new_tokens"]
+            reason = result.get("stop_reason")
+            if reason in self.stops:
+                self.stops[reason] += 1
+
+    def as_dict(self) -> Dict[str, Any]:
+        """
+        Returns:
+            requests、generated_tokens、wasted_tokens、budget_tokens（各条预算之和）、
+            repetition_stops、budget_stops
+        """
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "generated_tokens": self.generated_tokens,
+                "wasted_tokens": self.wasted_tokens,
+                "budget_tokens": self.budget_tokens,
+                "repetition_stops": self.stops[STOP_REPETITION],
+                "budget_stops": self.stops[STOP_BUDGET]
+            }
@@ -5,8 +5,10 @@ Gradio 图形界面
 import gradio as gr
 import logging
 import os
-from translator import ChatGLMTranslator
+from backends import create_translator
+from translator_pool import TranslatorPool
 from pdf_processor import PDFProcessor
+from scheduler import BatchScheduler
 from utils import get_pdf_info, format_file_size
 from config import (
     SUPPORTED_LANGUAGES,
@@ -14,25 +16,62 @@ from config import (
     GRADIO_SERVER_PORT,
     GRADIO_SHARE,
     TEMP_DIR,
-    OUTPUT_DIR
+    OUTPUT_DIR,
+    TRANSLATOR_POOL_WORKERS,
+    TRANSLATION_BACKEND,
+    METRICS_PORT,
+    CONTINUOUS_BATCHING_ENABLED
 )
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# 初始化翻译器和 PDF 处理器
+# 翻译器、请求调度器和 PDF 处理器，在 main() 中初始化
 translator = None
+scheduler = None
 pdf_processor = None
 
-try:
-    logger.info("正在初始化 ChatGLM2-6B 翻译器...")
-    translator = ChatGLMTranslator()
-    pdf_processor = PDFProcessor(translator=translator)
-    logger.info("初始化成功")
-except Exception as e:
-    logger.error(f"初始化失败: {str(e)}")
-    translator = None
-    pdf_processor = None
+
+def init_translator():
+    """
+    初始化翻译器、请求调度器和 PDF 处理器
+
+    工作池以 spawn 方式启动的工作进程会重新导入主模块，因此这里不能放在模块顶层执行，
+    否则每个工作进程都会再创建一份翻译器、调度器和界面
+    """
+    global translator, scheduler, pdf_processor
+    try:
+        logger.info("正在初始化 ChatGLM2-6B 翻译器...")
+        if TRANSLATION_BACKEND == "chatglm" and TRANSLATOR_POOL_WORKERS > 0:
+            # 不等待模型加载完成，界面先启动
+            translator = TranslatorPool(device="cpu", wait_ready=False)
+        else:
+            # MODEL_LAZY_LOAD 为 True 时这里只构造翻译器，模型在首次请求时加载
+            translator = create_translator()
+        # 所有界面请求都经过调度器排队组批，避免并发用户同时访问模型
+        if CONTINUOUS_BATCHING_ENABLED and TRANSLATION_BACKEND == "chatglm" and not isinstance(translator, TranslatorPool):
+            from continuous_batching import ContinuousBatchingEngine
+            scheduler = ContinuousBatchingEngine(translator)
+        else:
+            scheduler = BatchScheduler(translator)
+        pdf_processor = PDFProcessor(translator=scheduler)
+        logger.info("初始化成功")
+    except Exception as e:
+        logger.error(f"初始化失败: {str(e)}")
+        translator = None
+        scheduler = None
+        pdf_processor = None
+
+
+def _translator_status() -> str:
+    """系统状态中的翻译器描述"""
+    if not translator:
+        return '❌ 未初始化'
+    if isinstance(translator, TranslatorPool):
+        return f'✅ 工作池（{translator.num_workers} 个进程 × {translator.threads_per_worker} 线程）'
+    if not hasattr(translator, "model"):
+        return f'✅ {type(translator).__name__}'
+    return '✅ 已加载' if translator.model is not None else '⏳ 首次请求时加载模型'
 
 
 def translate_pdf(
@@ -87,9 +126,22 @@ def translate_pdf(
         
         if result["success"]:
             status = f"✅ 翻译完成！共翻译 {result['pages_translated']} 页\n文件已保存到: {output_filename}"
+            if result.get("resumed_pages"):
+                status += f"\n从检查点恢复了 {result['resumed_pages']} 页"
+            if "memory_stats" in result:
+                stats = result["memory_stats"]
+                status += f"\n翻译记忆: 命中 {stats['hits']} 次，未命中 {stats['misses']} 次，命中率 {stats['hit_rate']:.0%}"
+            if "generation_stats" in result:
+                stats = result["generation_stats"]
+                status += f"\n生成 {stats['generated_tokens']} tokens，重复循环丢弃 {stats['wasted_tokens']} tokens"
+            if result.get("bypass_stats", {}).get("bypassed"):
+                stats = result["bypass_stats"]
+                status += f"\n{stats['bypassed']}/{stats['segments']} 个分段无需翻译（页码、代码、参考文献等），保留原文"
             return output_path, status
         else:
             error_msg = result.get("error", "未知错误")
+            if result.get("partial_output_path"):
+                return result["partial_output_path"], f"❌ 翻译失败: {error_msg}\n已保存前 {result['pages_written']} 页的部分结果"
             return None, f"❌ 翻译失败: {error_msg}"
             
     except Exception as e:
@@ -97,234 +149,254 @@ def translate_pdf(
         return None, f"❌ 翻译异常: {str(e)}"
 
 
-def translate_text(
+async def translate_text(
     text: str,
     source_language: str,
     target_language: str
 ):
     """
-    翻译文本
+    流式翻译文本
     
     Args:
         text: 待翻译文本
         source_language: 源语言
         target_language: 目标语言
         
-    Returns:
-        (翻译结果, 状态信息)
+    Yields:
+        (已生成的翻译结果, 状态信息)
     """
-    if not translator:
-        return "", "❌ 错误: 翻译器未初始化"
+    if not scheduler:
+        yield "", "❌ 错误: 翻译器未初始化"
+        return
     
     if not text or not text.strip():
-        return "", "⚠️ 请输入要翻译的文本"
+        yield "", "⚠️ 请输入要翻译的文本"
+        return
     
     try:
-        result = translator.translate(
+        async for result in scheduler.submit_stream(
             text=text,
             source_language=source_language,
             target_language=target_language
-        )
-        
-        if result["success"]:
-            status = f"✅ 翻译完成: {source_language} → {target_language}"
-            return result["translated_text"], status
-        else:
-            error_msg = result.get("error", "未知错误")
-            return "", f"❌ 翻译失败: {error_msg}"
+        ):
+            if not result.get("finished"):
+                yield result["translated_text"], f"⏳ 正在翻译: {source_language} → {target_language}"
+                continue
+            
+            if result["success"]:
+                status = f"✅ 翻译完成: {source_language} → {target_language}"
+                if result.get("cached"):
+                    status += "（来自翻译记忆）"
+                if "ttft_ms" in result:
+                    status += f"\n首字延迟 {result['ttft_ms']:.0f} ms，{result['tokens_per_second']:.1f} tokens/s"
+                status += f"\n排队 {result.get('queue_wait_ms', 0):.0f} ms"
+                yield result["translated_text"], status
+            else:
+                error_msg = result.get("error", "未知错误")
+                yield "", f"❌ 翻译失败: {error_msg}"
             
     except Exception as e:
         logger.error(f"文本翻译异常: {str(e)}")
-        return "", f"❌ 翻译异常: {str(e)}"
+        yield "", f"❌ 翻译异常: {str(e)}"
 
 
-# 构建 Gradio 界面
-with gr.Blocks(
-    title="OpenAI-Translator v2.0 (PDF电子书翻译工具)",
-    theme=gr.themes.Monochrome()
-) as app:
-    
-    gr.Markdown(
-        """
-        <div style="text-align: center;">
-            <h1>OpenAI-Translator v2.0 (PDF电子书翻译工具)</h1>
-        </div>
-        """,
-        elem_classes="title"
-    )
-    
-    with gr.Row():
-        with gr.Column(scale=1):
-            gr.Markdown("### 📄 上传PDF文件")
-            pdf_input = gr.File(
-                label="上传PDF文件",
-                file_types=[".pdf"],
-                type="filepath",
-                height=300
-            )
-            pdf_info = gr.Markdown(
-                value="等待上传文件...",
-                visible=True
-            )
+def build_app() -> gr.Blocks:
+    """构建 Gradio 界面（系统状态取自 init_translator 的结果）"""
+    with gr.Blocks(
+        title="OpenAI-Translator v2.0 (PDF电子书翻译工具)",
+        theme=gr.themes.Monochrome()
+    ) as app:
         
-        with gr.Column(scale=1):
-            gr.Markdown("### 📥 下载翻译文件")
-            pdf_output = gr.File(
-                label="下载翻译文件",
-                type="filepath",
-                interactive=False,
-                height=300
-            )
-    
-    # 更新 PDF 信息
-    def update_pdf_info(file):
-        if file is None:
-            return gr.update(value="等待上传文件...", visible=True)
+        gr.Markdown(
+            """
+            <div style="text-align: center;">
+                <h1>OpenAI-Translator v2.0 (PDF电子书翻译工具)</h1>
+            </div>
+            """,
+            elem_classes="title"
+        )
         
-        try:
-            input_path = file.name if hasattr(file, 'name') else file
-            info = get_pdf_info(input_path)
-            if info["success"]:
-                info_text = f"""
-                **文件信息**:
-                - 文件名: {info['file_name']}
-                - 总页数: {info['total_pages']} 页
-                - 文件大小: {info['file_size']}
-                """
-                return gr.update(value=info_text, visible=True)
-            else:
-                return gr.update(value=f"⚠️ 无法读取文件信息: {info.get('error', '未知错误')}", visible=True)
-        except Exception as e:
-            return gr.update(value=f"⚠️ 错误: {str(e)}", visible=True)
-    
-    pdf_input.change(
-        fn=update_pdf_info,
-        inputs=[pdf_input],
-        outputs=[pdf_info]
-    )
-    
-    with gr.Row():
-        with gr.Column():
-            source_lang = gr.Dropdown(
-                label="源语言 (默认: 英文)",
-                choices=list(SUPPORTED_LANGUAGES.keys()),
-                value="English",
-                info="选择源语言"
-            )
+        with gr.Row():
+            with gr.Column(scale=1):
+                gr.Markdown("### 📄 上传PDF文件")
+                pdf_input = gr.File(
+                    label="上传PDF文件",
+                    file_types=[".pdf"],
+                    type="filepath",
+                    height=300
+                )
+                pdf_info = gr.Markdown(
+                    value="等待上传文件...",
+                    visible=True
+                )
+            
+            with gr.Column(scale=1):
+                gr.Markdown("### 📥 下载翻译文件")
+                pdf_output = gr.File(
+                    label="下载翻译文件",
+                    type="filepath",
+                    interactive=False,
+                    height=300
+                )
+        
+        # 更新 PDF 信息
+        def update_pdf_info(file):
+            if file is None:
+                return gr.update(value="等待上传文件...", visible=True)
+            
+            try:
+                input_path = file.name if hasattr(file, 'name') else file
+                info = get_pdf_info(input_path)
+                if info["success"]:
+                    info_text = f"""
+                    **文件信息**:
+                    - 文件名: {info['file_name']}
+                    - 总页数: {info['total_pages']} 页
+                    - 文件大小: {info['file_size']}
+                    """
+                    return gr.update(value=info_text, visible=True)
+                else:
+                    return gr.update(value=f"⚠️ 无法读取文件信息: {info.get('error', '未知错误')}", visible=True)
+            except Exception as e:
+                return gr.update(value=f"⚠️ 错误: {str(e)}", visible=True)
+        
+        pdf_input.change(
+            fn=update_pdf_info,
+            inputs=[pdf_input],
+            outputs=[pdf_info]
+        )
         
-        with gr.Column():
-            target_lang = gr.Dropdown(
-                label="目标语言 (默认: 中文)",
-                choices=list(SUPPORTED_LANGUAGES.keys()),
-                value="Chinese",
-                info="选择目标语言"
-            )
-    
-    with gr.Row():
-        clear_btn = gr.Button("Clear", variant="secondary", scale=1)
-        submit_btn = gr.Button("Submit", variant="primary", scale=1)
-    
-    status_text = gr.Textbox(
-        label="状态",
-        interactive=False,
-        value="就绪",
-        lines=3
-    )
-    
-    # 模型状态显示
-    model_status = gr.Markdown(
-        value=f"""
-        ### 🔧 系统状态
-        - **翻译器**: {'✅ 已加载' if translator else '❌ 未初始化'}
-        - **PDF 处理器**: {'✅ 已加载' if pdf_processor else '❌ 未初始化'}
-        - **设备**: {translator.device if translator else 'N/A'}
-        """
-    )
-    
-    # 文本翻译区域（可选）
-    with gr.Accordion("文本翻译", open=False):
         with gr.Row():
             with gr.Column():
-                text_input = gr.Textbox(
-                    label="输入文本",
-                    lines=5,
-                    placeholder="请输入要翻译的文本..."
+                source_lang = gr.Dropdown(
+                    label="源语言 (默认: 英文)",
+                    choices=list(SUPPORTED_LANGUAGES.keys()),
+                    value="English",
+                    info="选择源语言"
                 )
             
             with gr.Column():
-                text_output = gr.Textbox(
-                    label="翻译结果",
-                    lines=5,
-                    interactive=False
+                target_lang = gr.Dropdown(
+                    label="目标语言 (默认: 中文)",
+                    choices=list(SUPPORTED_LANGUAGES.keys()),
+                    value="Chinese",
+                    info="选择目标语言"
                 )
         
-        text_translate_btn = gr.Button("翻译文本", variant="primary")
-    
-    # 绑定事件
-    submit_btn.click(
-        fn=translate_pdf,
-        inputs=[pdf_input, source_lang, target_lang],
-        outputs=[pdf_output, status_text],
-        show_progress=True
-    )
-    
-    clear_btn.click(
-        fn=lambda: (None, None, "English", "Chinese", "等待上传文件...", "已清空"),
-        outputs=[pdf_input, pdf_output, source_lang, target_lang, pdf_info, status_text]
-    )
-    
-    # 添加示例
-    gr.Examples(
-        examples=[
-            ["English", "Chinese"],
-            ["English", "Japanese"],
-            ["Japanese", "Chinese"],
-        ],
-        inputs=[source_lang, target_lang],
-        label="快速选择语言组合"
-    )
-    
-    text_translate_btn.click(
-        fn=translate_text,
-        inputs=[text_input, source_lang, target_lang],
-        outputs=[text_output, status_text]
-    )
-    
-    gr.Markdown(
-        """
-        ### 💡 使用说明
+        with gr.Row():
+            clear_btn = gr.Button("Clear", variant="secondary", scale=1)
+            submit_btn = gr.Button("Submit", variant="primary", scale=1)
+        
+        status_text = gr.Textbox(
+            label="状态",
+            interactive=False,
+            value="就绪",
+            lines=3
+        )
         
-        1. **PDF 翻译**：
-           - 点击"上传PDF文件"区域上传 PDF 文件
-           - 设置源语言和目标语言（默认：英文 → 中文）
-           - 点击 "Submit" 开始翻译
-           - 翻译完成后，在右侧下载翻译文件
+        # 模型状态显示
+        model_status = gr.Markdown(
+            value=f"""
+            ### 🔧 系统状态
+            - **翻译器**: {_translator_status()}
+            - **PDF 处理器**: {'✅ 已加载' if pdf_processor else '❌ 未初始化'}
+            - **设备**: {translator.device if translator else 'N/A'}
+            """
+        )
         
-        2. **文本翻译**：
-           - 展开"文本翻译"区域
-           - 输入要翻译的文本
-           - 点击"翻译文本"按钮
+        # 文本翻译区域（可选）
+        with gr.Accordion("文本翻译", open=False):
+            with gr.Row():
+                with gr.Column():
+                    text_input = gr.Textbox(
+                        label="输入文本",
+                        lines=5,
+                        placeholder="请输入要翻译的文本..."
+                    )
+                
+                with gr.Column():
+                    text_output = gr.Textbox(
+                        label="翻译结果",
+                        lines=5,
+                        interactive=False
+                    )
+            
+            text_translate_btn = gr.Button("翻译文本", variant="primary")
         
-        3. **支持的语言**：
-           - English, Chinese, Japanese, Korean, French, German, Spanish, Italian, Portuguese, Russian, Arabic, Thai, Vietnamese, Hindi, Turkish 等
+        # 绑定事件
+        submit_btn.click(
+            fn=translate_pdf,
+            inputs=[pdf_input, source_lang, target_lang],
+            outputs=[pdf_output, status_text],
+            show_progress=True
+        )
         
-        ### ⚠️ 注意事项
+        clear_btn.click(
+            fn=lambda: (None, None, "English", "Chinese", "等待上传文件...", "已清空"),
+            outputs=[pdf_input, pdf_output, source_lang, target_lang, pdf_info, status_text]
+        )
         
-        - 首次运行需要下载 ChatGLM2-6B 模型，可能需要较长时间
-        - 建议使用 GPU 加速（如果可用）
-        - 大型 PDF 文件翻译可能需要较长时间
-        """
-    )
+        # 添加示例
+        gr.Examples(
+            examples=[
+                ["English", "Chinese"],
+                ["English", "Japanese"],
+                ["Japanese", "Chinese"],
+            ],
+            inputs=[source_lang, target_lang],
+            label="快速选择语言组合"
+        )
+        
+        text_translate_btn.click(
+            fn=translate_text,
+            inputs=[text_input, source_lang, target_lang],
+            outputs=[text_output, status_text]
+        )
+        
+        gr.Markdown(
+            """
+            ### 💡 使用说明
+            
+            1. **PDF 翻译**：
+               - 点击"上传PDF文件"区域上传 PDF 文件
+               - 设置源语言和目标语言（默认：英文 → 中文）
+               - 点击 "Submit" 开始翻译
+               - 翻译完成后，在右侧下载翻译文件
+            
+            2. **文本翻译**：
+               - 展开"文本翻译"区域
+               - 输入要翻译的文本
+               - 点击"翻译文本"按钮
+            
+            3. **支持的语言**：
+               - English, Chinese, Japanese, Korean, French, German, Spanish, Italian, Portuguese, Russian, Arabic, Thai, Vietnamese, Hindi, Turkish 等
+            
+            ### ⚠️ 注意事项
+            
+            - 首次运行需要下载 ChatGLM2-6B 模型，可能需要较长时间
+            - 建议使用 GPU 加速（如果可用）
+            - 大型 PDF 文件翻译可能需要较长时间
+            """
+        )
+    
+    return app
 
 
 def main():
     """启动 Gradio 应用"""
+    init_translator()
     if not translator:
         print("⚠️  警告: 翻译器未初始化")
         print("请检查模型路径和设备配置")
         print("应用仍将启动，但翻译功能将不可用")
     
-    app.launch(
+    if METRICS_PORT > 0:
+        from instrumentation import serve_metrics, tracer
+        if not tracer.enabled:
+            logger.warning("INSTRUMENTATION_ENABLED 未开启，/metrics 不会有数据")
+        serve_metrics(METRICS_PORT)
+    
+    build_app().launch(
         server_name=GRADIO_SERVER_NAME,
         server_port=GRADIO_SERVER_PORT,
         share=GRADIO_SHARE
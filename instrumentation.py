@@ -0,0 +1,313 @@
+"""
+性能埋点模块
+记录各阶段耗时（span）和计数器（token 数、分段数等），可导出为 Prometheus 文本格式或 JSON trace
+
+未启用时 span() 返回共享的空对象，埋点的开销只有一次属性判断。
+
+用法:
+    from instrumentation import tracer
+
+    with tracer.span("translator.generate") as span:
+        response = model.chat(...)
+        span.set(output_tokens=n)
+    tracer.count("tokens_total", n, direction="output")
+"""
+import collections
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# 生成阶段的 span 名称，用于计算 tokens/s
+GENERATE_SPANS = (
+    "translator.generate", "translator.generate_batch", "translator.generate_stream", "engine.prefill", "engine.decode"
+)
+
+
+class _NoopSpan:
+    """未启用埋点时使用的空 span"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _Span:
+    """一次计时，退出时提交给 Tracer"""
+
+    __slots__ = ("tracer", "name", "attrs", "start")
+
+    def __init__(self, tracer: "Tracer", name: str, attrs: Dict):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        duration = time.perf_counter() - self.start
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        self.tracer._finish(self, duration)
+        return False
+
+    def set(self, **attrs):
+        """附加属性（页码、token 数等），写入 trace 事件"""
+        self.attrs.update(attrs)
+
+
+class Tracer:
+    """线程安全的 span 和计数器收集器"""
+
+    def __init__(self, enabled: Optional[bool] = None, max_events: Optional[int] = None):
+        """
+        初始化收集器
+
+        Args:
+            enabled: 是否启用，为 None 时使用 INSTRUMENTATION_ENABLED
+            max_events: JSON trace 保留的最近事件数，为 None 时使用 INSTRUMENTATION_MAX_EVENTS
+        """
+        if enabled is None or max_events is None:
+            from config import INSTRUMENTATION_ENABLED, INSTRUMENTATION_MAX_EVENTS
+            enabled = INSTRUMENTATION_ENABLED if enabled is None else enabled
+            max_events = INSTRUMENTATION_MAX_EVENTS if max_events is None else max_events
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        # span 名称 -> [次数, 总耗时, 最长耗时]
+        self._spans = {}
+        # (计数器名称, 排序后的标签) -> 累计值
+        self._counters = {}
+        self._events = collections.deque(maxlen=max_events)
+
+    def span(self, name: str, **attrs):
+        """
+        创建计时 span，用作上下文管理器
+
+        Args:
+            name: span 名称，如 pdf.extract、translator.generate
+            **attrs: 附加属性
+
+        Returns:
+            span 对象（未启用时为共享的空对象）
+        """
+        if not self.enabled:
+            return _NOOP_SPAN
+        return _Span(self, name, attrs)
+
+    def count(self, name: str, value: float = 1, **labels):
+        """
+        累加计数器
+
+        Args:
+            name: 计数器名称，如 tokens_total
+            value: 增量
+            **labels: 标签，如 direction="input"
+        """
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def _finish(self, span: _Span, duration: float):
+        with self._lock:
+            stats = self._spans.get(span.name)
+            if stats is None:
+                self._spans[span.name] = [1, duration, duration]
+            else:
+                stats[0] += 1
+                stats[1] += duration
+                if duration > stats[2]:
+                    stats[2] = duration
+            self._events.append((span.name, span.start, duration, threading.get_ident(), span.attrs))
+
+    def reset(self):
+        """清空已收集的数据"""
+        with self._lock:
+            self._spans.clear()
+            self._counters.clear()
+            self._events.clear()
+            self._origin = time.perf_counter()
+
+    def summary(self) -> Dict:
+        """
+        汇总统计
+
+        Returns:
+            字典：spans（每个名称的次数、总耗时、平均/最长毫秒）、counters 和 tokens_per_second
+        """
+        with self._lock:
+            spans = {name: list(stats) for name, stats in self._spans.items()}
+            counters = dict(self._counters)
+
+        output_tokens = counters.get(("tokens_total", (("direction", "output"),)), 0)
+        generate_seconds = sum(spans[name][1] for name in GENERATE_SPANS if name in spans)
+        return {
+            "spans": {
+                name: {
+                    "count": count,
+                    "total_s": total,
+                    "avg_ms": total / count * 1000,
+                    "max_ms": longest * 1000
+                }
+                for name, (count, total, longest) in sorted(spans.items())
+            },
+            "counters": {
+                _format_metric(name, labels): value for (name, labels), value in sorted(counters.items())
+            },
+            "tokens_per_second": output_tokens / generate_seconds if generate_seconds else 0.0
+        }
+
+    def prometheus(self, prefix: str = "translator") -> str:
+        """
+        导出 Prometheus 文本格式
+
+        Args:
+            prefix: 指标名前缀
+
+        Returns:
+            指标文本
+        """
+        with self._lock:
+            spans = sorted((name, list(stats)) for name, stats in self._spans.items())
+            counters = sorted(self._counters.items())
+
+        lines = [
+            f"# HELP {prefix}_span_seconds_total 各阶段累计耗时",
+            f"# TYPE {prefix}_span_seconds_total counter"
+        ]
+        lines += [f'{prefix}_span_seconds_total{{span="{name}"}} {total:.6f}' for name, (_, total, _) in spans]
+        lines += [
+            f"# HELP {prefix}_span_calls_total 各阶段调用次数",
+            f"# TYPE {prefix}_span_calls_total counter"
+        ]
+        lines += [f'{prefix}_span_calls_total{{span="{name}"}} {count}' for name, (count, _, _) in spans]
+        lines += [
+            f"# HELP {prefix}_span_max_seconds 各阶段单次最长耗时",
+            f"# TYPE {prefix}_span_max_seconds gauge"
+        ]
+        lines += [f'{prefix}_span_max_seconds{{span="{name}"}} {longest:.6f}' for name, (_, _, longest) in spans]
+
+        declared = set()
+        for (name, labels), value in counters:
+            metric = f"{prefix}_{name}"
+            if metric not in declared:
+                lines.append(f"# TYPE {metric} counter")
+                declared.add(metric)
+            lines.append(f"{_format_metric(metric, labels)} {value}")
+
+        lines += [
+            f"# TYPE {prefix}_tokens_per_second gauge",
+            f"{prefix}_tokens_per_second {self.summary()['tokens_per_second']:.3f}"
+        ]
+        return "\n".join(lines) + "\n"
+
+    def trace(self) -> Dict:
+        """
+        导出最近的 span 事件，格式为 Chrome trace（可在 chrome://tracing 或 Perfetto 中查看）
+
+        Returns:
+            包含 traceEvents 和 summary 的字典
+        """
+        with self._lock:
+            events = list(self._events)
+            origin = self._origin
+        pid = os.getpid()
+        return {
+            "traceEvents": [
+                {
+                    "name": name,
+                    "ph": "X",
+                    "ts": (start - origin) * 1e6,
+                    "dur": duration * 1e6,
+                    "pid": pid,
+                    "tid": tid,
+                    "args": attrs
+                }
+                for name, start, duration, tid, attrs in events
+            ],
+            "displayTimeUnit": "ms",
+            "summary": self.summary()
+        }
+
+    def export_json(self, path: str):
+        """
+        将 JSON trace 写入文件
+
+        Args:
+            path: 输出文件路径
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.trace(), f, ensure_ascii=False, default=str)
+        logger.info(f"性能 trace 已写入: {path}")
+
+
+def _format_metric(name: str, labels: tuple) -> str:
+    if not labels:
+        return name
+    return name + "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+def serve_metrics(port: int, host: str = "0.0.0.0"):
+    """
+    在后台线程启动 HTTP 服务：/metrics 返回 Prometheus 文本，/trace 返回 JSON trace
+
+    Args:
+        port: 端口
+        host: 监听地址
+
+    Returns:
+        ThreadingHTTPServer 实例
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            path = self.path.split("?", 1)[0].rstrip("/")
+            if path == "/metrics":
+                body = tracer.prometheus().encode("utf-8")
+                content_type = "text/plain; version=0.0.4; charset=utf-8"
+            elif path == "/trace":
+                body = json.dumps(tracer.trace(), ensure_ascii=False, default=str).encode("utf-8")
+                content_type = "application/json"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    logger.info(f"性能指标服务已启动: http://{host}:{server.server_port}/metrics")
+    return server
+
+
+# 全局收集器
+tracer = Tracer()
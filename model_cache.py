@@ -0,0 +1,167 @@
+"""
+模型快照缓存模块
+把已转换好数据类型的模型保存到本地，之后启动时直接加载，跳过下载后的逐层转换。
+
+两种格式：
+- safetensors：save_pretrained 生成的标准快照，由 from_pretrained 加载
+- mmap：torch.save 保存的全部参数和缓冲区，用 torch.load(mmap=True) 加载后直接作为模型权重，
+  同一台机器上的多个进程共享同一份物理内存页
+"""
+import hashlib
+import itertools
+import json
+import logging
+import os
+import shutil
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "snapshot.json"
+MMAP_WEIGHTS_NAME = "weights.pt"
+SNAPSHOT_FORMATS = ("safetensors", "mmap")
+
+
+class ModelSnapshotCache:
+    """已转换模型快照的本地缓存"""
+
+    def __init__(
+        self,
+        model_path: str,
+        dtype: str,
+        cache_dir: Optional[str] = None,
+        snapshot_format: str = "safetensors"
+    ):
+        """
+        Args:
+            model_path: 原始模型路径或 HuggingFace 模型名称
+            dtype: 快照的数据类型（如 float32、float16）
+            cache_dir: 缓存根目录，默认使用 MODEL_CACHE_DIR
+            snapshot_format: 快照格式（safetensors 或 mmap）
+        """
+        from config import MODEL_CACHE_DIR
+
+        if snapshot_format not in SNAPSHOT_FORMATS:
+            raise ValueError(f"不支持的快照格式: {snapshot_format}")
+        self.model_path = model_path
+        self.dtype = dtype
+        self.cache_dir = cache_dir or MODEL_CACHE_DIR
+        self.snapshot_format = snapshot_format
+
+        digest = hashlib.sha256(f"{model_path}\n{dtype}".encode("utf-8")).hexdigest()[:12]
+        name = os.path.basename(os.path.normpath(model_path)) or "model"
+        suffix = "-mmap" if snapshot_format == "mmap" else ""
+        self.path = os.path.join(self.cache_dir, f"{name}-{dtype}-{digest}{suffix}")
+
+    def _expected_manifest(self) -> dict:
+        import transformers
+
+        return {
+            "model_path": self.model_path,
+            "dtype": self.dtype,
+            "format": self.snapshot_format,
+            "transformers": transformers.__version__
+        }
+
+    def exists(self) -> bool:
+        """缓存是否完整且与当前模型、数据类型和 transformers 版本一致"""
+        manifest_path = os.path.join(self.path, MANIFEST_NAME)
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return False
+        expected = self._expected_manifest()
+        return all(manifest.get(key) == value for key, value in expected.items())
+
+    def save(self, model) -> bool:
+        """
+        保存模型快照
+
+        先写入临时目录，清单最后写入，再整体改名，避免中途失败留下不完整的缓存。
+
+        Args:
+            model: 已转换数据类型的模型
+
+        Returns:
+            是否保存成功
+        """
+        tmp_path = f"{self.path}.tmp-{os.getpid()}"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            if self.snapshot_format == "mmap":
+                import torch
+
+                os.makedirs(tmp_path)
+                # 保存全部参数（含共享权重的别名）和缓冲区（含非持久化缓冲区），
+                # 加载时逐个替换元设备上的占位张量，不依赖 state_dict 的键是否完整
+                tensors = dict(model.named_parameters(remove_duplicate=False))
+                tensors.update(model.named_buffers(remove_duplicate=False))
+                torch.save(
+                    {name: tensor.detach() for name, tensor in tensors.items()},
+                    os.path.join(tmp_path, MMAP_WEIGHTS_NAME)
+                )
+            else:
+                model.save_pretrained(tmp_path, safe_serialization=True)
+
+            manifest = self._expected_manifest()
+            manifest["created_at"] = time.strftime("%Y-%m-%d %H:%M:%S")
+            with open(os.path.join(tmp_path, MANIFEST_NAME), "w", encoding="utf-8") as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+            shutil.rmtree(self.path, ignore_errors=True)
+            os.replace(tmp_path, self.path)
+            logger.info(f"模型快照已缓存: {self.path}")
+            return True
+        except Exception as e:
+            logger.warning(f"模型快照缓存失败: {str(e)}")
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            return False
+
+    def load_mmap(self):
+        """
+        从 mmap 快照构建模型
+
+        先在元设备上按配置构建模型结构（不分配内存），再把内存映射的张量直接挂到模型上，
+        权重页由操作系统页缓存提供，多个进程加载同一快照时共享。需要 torch >= 2.1。
+
+        Returns:
+            模型
+        """
+        import torch
+        from transformers import AutoConfig, AutoModel
+
+        if self.snapshot_format != "mmap":
+            raise ValueError("只有 mmap 格式的快照可以内存映射加载")
+
+        tensors = torch.load(
+            os.path.join(self.path, MMAP_WEIGHTS_NAME),
+            map_location="cpu",
+            mmap=True,
+            weights_only=True
+        )
+        config = AutoConfig.from_pretrained(self.model_path, trust_remote_code=True)
+        with torch.device("meta"):
+            model = AutoModel.from_config(config, trust_remote_code=True, torch_dtype=getattr(torch, self.dtype))
+
+        for name, tensor in tensors.items():
+            module_name, _, attr = name.rpartition(".")
+            module = model.get_submodule(module_name)
+            if attr in module._parameters:
+                module._parameters[attr] = torch.nn.Parameter(tensor, requires_grad=False)
+            else:
+                module._buffers[attr] = tensor
+
+        missing = [
+            name for name, tensor in itertools.chain(model.named_parameters(), model.named_buffers())
+            if tensor.is_meta
+        ]
+        if missing:
+            raise RuntimeError(f"快照缺少 {len(missing)} 个张量，例如: {missing[0]}")
+        return model
+
+    def clear(self):
+        """删除快照"""
+        shutil.rmtree(self.path, ignore_errors=True)
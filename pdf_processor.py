@@ -3,9 +3,19 @@ PDF 处理模块
 支持 PDF 翻译并保留布局
 """
 import fitz  # PyMuPDF
-from typing import Dict, Optional
+from typing import Dict, Iterator, Optional
 import os
 import logging
+import queue
+import threading
+import time
+from pdf_writer import IncrementalPDFWriter, BlockPDFWriter, InPlacePDFWriter, block_font
+from checkpoint import TranslationCheckpoint
+from chunker import split_text, estimate_tokens
+from generation_budget import GenerationStats
+from instrumentation import tracer
+from script_detection import script_stats
+from segment_filter import BypassStats, classify_segment
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.pdfbase import pdfmetrics
@@ -16,6 +26,10 @@ import io
 
 logger = logging.getLogger(__name__)
 
+# 输出布局方式：reflow 用 ReportLab 重新排版译文；blocks 按文字块写回原页面，保留页数和位置；
+# inplace 与 blocks 相同，但直接在原文件的副本上增量改写，不复制图片和字体
+LAYOUT_MODES = ("reflow", "blocks", "inplace")
+
 
 class PDFProcessor:
     """PDF 处理器"""
@@ -28,33 +42,111 @@ class PDFProcessor:
             translator: 翻译器实例
         """
         self.translator = translator
+        # 按语言对缓存的分段 token 预算
+        self._chunk_budgets = {}
     
-    def extract_text_from_pdf(self, pdf_path: str) -> Dict:
+    def iter_pages(self, pdf_path: str, with_blocks: bool = False) -> Iterator[Dict]:
         """
-        从 PDF 提取文本
+        逐页惰性提取 PDF 文本
+        
+        每次只读取一页，文档在生成器结束或被关闭时释放，适合上千页的电子书。
         
         Args:
             pdf_path: PDF 文件路径
+            with_blocks: 是否同时提取文字块（位置、字号、颜色），text 由各文字块拼接而成
             
-        Returns:
-            包含文本和页面信息的字典
+        Yields:
+            页面数据字典（page_number、text、width、height，以及可选的 blocks）
         """
+        doc = fitz.open(pdf_path)
         try:
-            doc = fitz.open(pdf_path)
-            pages_data = []
-            
             for page_num in range(len(doc)):
                 page = doc[page_num]
-                text = page.get_text()
-                
-                pages_data.append({
+                page_data = {
                     "page_number": page_num + 1,
-                    "text": text,
                     "width": page.rect.width,
                     "height": page.rect.height
-                })
+                }
+                if with_blocks:
+                    page_data["blocks"] = self._extract_blocks(page)
+                    page_data["text"] = "\n\n".join(block["text"] for block in page_data["blocks"])
+                else:
+                    page_data["text"] = page.get_text()
+                yield page_data
+        finally:
+            doc.close()
+    
+    @staticmethod
+    def _extract_blocks(page) -> list:
+        """
+        提取页面的文字块
+        
+        Args:
+            page: fitz 页面
+            
+        Returns:
+            文字块列表，每项包含 bbox、text、font_size（块内字符最多的字号）和 color
+        """
+        blocks = []
+        # 不提取图片数据，只要文字
+        text_dict = page.get_text("dict", flags=fitz.TEXTFLAGS_DICT & ~fitz.TEXT_PRESERVE_IMAGES)
+        for block in text_dict["blocks"]:
+            if block.get("type") != 0:
+                continue
+            lines = []
+            sizes = {}
+            colors = {}
+            for line in block["lines"]:
+                line_text = "".join(span["text"] for span in line["spans"]).strip()
+                if line_text:
+                    lines.append(line_text)
+                for span in line["spans"]:
+                    chars = len(span["text"].strip())
+                    size = round(span["size"], 1)
+                    sizes[size] = sizes.get(size, 0) + chars
+                    colors[span["color"]] = colors.get(span["color"], 0) + chars
+            text = _join_lines(lines)
+            if not text:
+                continue
+            blocks.append({
+                "bbox": list(block["bbox"]),
+                "text": text,
+                "font_size": max(sizes, key=sizes.get),
+                "color": max(colors, key=colors.get)
+            })
+        return blocks
+    
+    @staticmethod
+    def get_page_count(pdf_path: str) -> int:
+        """
+        获取 PDF 页数（不提取文本）
+        
+        Args:
+            pdf_path: PDF 文件路径
             
+        Returns:
+            总页数
+        """
+        doc = fitz.open(pdf_path)
+        try:
+            return len(doc)
+        finally:
             doc.close()
+    
+    def extract_text_from_pdf(self, pdf_path: str) -> Dict:
+        """
+        从 PDF 提取文本
+        
+        会一次性读取全部页面，大文件请使用 iter_pages。
+        
+        Args:
+            pdf_path: PDF 文件路径
+            
+        Returns:
+            包含文本和页面信息的字典
+        """
+        try:
+            pages_data = list(self.iter_pages(pdf_path))
             
             return {
                 "success": True,
@@ -76,16 +168,21 @@ class PDFProcessor:
         output_path: str,
         source_language: str = "English",
         target_language: str = "Chinese",
-        progress_callback=None
+        progress_callback=None,
+        layout_mode: Optional[str] = None
     ) -> Dict:
         """
         翻译 PDF 文件
         
+        提取、翻译、渲染三个阶段通过有界队列并行执行，渲染阶段按页码顺序写回。
+        
         Args:
             pdf_path: 输入 PDF 文件路径
             output_path: 输出 PDF 文件路径
             source_language: 源语言
             target_language: 目标语言
+            progress_callback: 进度回调 (当前页, 总页数, 信息)，每完成一页调用一次
+            layout_mode: 输出布局方式（reflow、blocks 或 inplace），为 None 时使用 PDF_LAYOUT_MODE
             
         Returns:
             处理结果字典
@@ -96,356 +193,576 @@ class PDFProcessor:
                 "error": "翻译器未初始化"
             }
         
+        writer = None
+        checkpoint = None
         try:
-            # 提取文本
-            extract_result = self.extract_text_from_pdf(pdf_path)
-            if not extract_result["success"]:
-                return extract_result
-            
-            pages_data = extract_result["pages"]
+            from config import (
+                PDF_PIPELINE_QUEUE_SIZE, PDF_TRANSLATE_WORKERS, PDF_CHECKPOINT_ENABLED, INSTRUMENTATION_TRACE_PATH,
+                PDF_LAYOUT_MODE
+            )
             
-            # 翻译每一页
-            translated_pages = []
-            total_pages = len(pages_data)
+            layout_mode = layout_mode or PDF_LAYOUT_MODE
+            if layout_mode not in LAYOUT_MODES:
+                logger.warning(f"不支持的布局方式 {layout_mode}，使用 reflow")
+                layout_mode = "reflow"
+            if layout_mode in ("blocks", "inplace") and block_font(target_language) is None:
+                logger.warning(
+                    f"没有可在原位置写入 {target_language} 的字体（可设置 PDF_BLOCK_FONT_FILE），"
+                    f"{layout_mode} 改用 reflow"
+                )
+                layout_mode = "reflow"
+            with_blocks = layout_mode in ("blocks", "inplace")
+            total_pages = self.get_page_count(pdf_path)
             
-            for idx, page_data in enumerate(pages_data, 1):
-                # 更新进度
-                if progress_callback:
-                    progress_callback(idx, total_pages, f"正在翻译第 {idx}/{total_pages} 页...")
-                
-                text = page_data["text"]
-                if not text or not text.strip():
-                    translated_pages.append({
-                        "page_number": page_data["page_number"],
-                        "translated_text": "",
-                        "width": page_data["width"],
-                        "height": page_data["height"]
-                    })
-                    continue
-                
-                # 如果文本太长，分段处理
-                max_chunk_length = 2000
-                if len(text) > max_chunk_length:
-                    # 分段翻译
-                    chunks = [text[i:i+max_chunk_length] for i in range(0, len(text), max_chunk_length)]
-                    translated_chunks = []
-                    
-                    for chunk_idx, chunk in enumerate(chunks):
-                        logger.info(f"正在翻译第 {idx} 页，第 {chunk_idx+1}/{len(chunks)} 段: {source_language} → {target_language}")
-                        result = self.translator.translate(
-                            text=chunk,
-                            source_language=source_language,
-                            target_language=target_language
-                        )
-                        if result["success"]:
-                            translated_chunks.append(result["translated_text"])
-                            logger.info(f"第 {idx} 页第 {chunk_idx+1} 段翻译成功")
-                        else:
-                            error_msg = result.get("error", "未知错误")
-                            logger.error(f"第 {idx} 页第 {chunk_idx+1} 段翻译失败: {error_msg}，使用原文")
-                            translated_chunks.append(chunk)
-                    
-                    translated_text = "\n".join(translated_chunks)
-                else:
-                    # 直接翻译
-                    logger.info(f"正在翻译第 {idx} 页: {source_language} → {target_language}")
-                    result = self.translator.translate(
-                        text=text,
-                        source_language=source_language,
-                        target_language=target_language
+            # 断点续传：读取上次中断前已翻译的页面
+            completed_pages = {}
+            if PDF_CHECKPOINT_ENABLED:
+                try:
+                    checkpoint = TranslationCheckpoint(
+                        pdf_path, source_language, target_language, layout_mode=layout_mode
                     )
-                    
-                    if result["success"]:
-                        translated_text = result["translated_text"]
-                        # 清理翻译结果（移除可能的注释或原文）
-                        translated_text = translated_text.strip()
-                        
-                        # 如果翻译结果包含明显的原文（可能是模型错误），尝试提取
-                        if source_language == "English" and target_language == "Japanese":
-                            # 检查是否包含英文原文或中文，如果有则尝试提取日文部分
-                            lines = translated_text.split('\n')
-                            japanese_lines = []
-                            skip_patterns = ['原文', 'Original', 'Translation', '翻译', '要求', 'Requirements', '事项', 'Matters', 'English', 'Japanese']
-                            
-                            for line in lines:
-                                line = line.strip()
-                                # 跳过明显的提示词行
-                                if any(pattern in line for pattern in skip_patterns):
-                                    continue
-                                # 跳过空行或只有标点的行
-                                if not line or line in ['：', ':', '-', '—', '1.', '2.', '3.', '4.', '5.', '6.']:
-                                    continue
-                                # 优先保留包含日文假名（平假名、片假名）的行
-                                if any('\u3040' <= char <= '\u309F' or '\u30A0' <= char <= '\u30FF' for char in line):
-                                    japanese_lines.append(line)
-                                # 如果包含汉字但没有假名，可能是中文，跳过
-                                elif any('\u4e00' <= char <= '\u9fff' for char in line) and not any('\u3040' <= char <= '\u309F' or '\u30A0' <= char <= '\u30FF' for char in line):
-                                    # 检查是否主要是中文（没有日文假名）
-                                    continue
-                                # 如果整行都不是英文ASCII字符，可能是日文
-                                elif not all(c.isascii() or c.isspace() or c in '.,;:!?()[]{}' for c in line):
-                                    # 检查是否主要是非ASCII字符
-                                    non_ascii_count = sum(1 for c in line if not c.isascii() and not c.isspace())
-                                    if non_ascii_count > len(line) * 0.3:  # 至少30%是非ASCII字符
-                                        japanese_lines.append(line)
-                            
-                            if japanese_lines:
-                                translated_text = '\n'.join(japanese_lines)
-                                logger.info(f"第 {idx} 页已清理翻译结果，提取了 {len(japanese_lines)} 行日文")
-                            else:
-                                logger.warning(f"第 {idx} 页清理后没有找到日文内容，使用原始结果")
-                        
-                        elif source_language == "English" and target_language == "Korean":
-                            # 检查是否包含英文原文，如果有则尝试提取韩文部分
-                            lines = translated_text.split('\n')
-                            korean_lines = []
-                            skip_patterns = ['原文', 'Original', 'Translation', '翻译', '要求', 'Requirements', '事项', 'Matters']
-                            
-                            for line in lines:
-                                line = line.strip()
-                                # 跳过明显的提示词行
-                                if any(pattern in line for pattern in skip_patterns):
-                                    continue
-                                # 跳过空行或只有标点的行
-                                if not line or line in ['：', ':', '-', '—', '1.', '2.', '3.', '4.', '5.', '6.']:
-                                    continue
-                                # 检查是否主要是韩文字符
-                                if any('\uAC00' <= char <= '\uD7A3' for char in line):
-                                    korean_lines.append(line)
-                                # 检查是否包含韩文字符（即使混合其他字符）
-                                elif any('\uAC00' <= char <= '\uD7A3' for char in line):
-                                    # 提取包含韩文的部分
-                                    korean_part = ''.join(c for c in line if '\uAC00' <= c <= '\uD7A3' or c.isspace() or c in '.,;:!?()[]{}')
-                                    if korean_part.strip():
-                                        korean_lines.append(korean_part.strip())
-                                # 如果整行都不是英文ASCII字符，可能是韩文
-                                elif not all(c.isascii() or c.isspace() or c in '.,;:!?()[]{}' for c in line):
-                                    # 检查是否主要是非ASCII字符
-                                    non_ascii_count = sum(1 for c in line if not c.isascii() and not c.isspace())
-                                    if non_ascii_count > len(line) * 0.3:  # 至少30%是非ASCII字符
-                                        korean_lines.append(line)
-                            
-                            if korean_lines:
-                                translated_text = '\n'.join(korean_lines)
-                                logger.info(f"第 {idx} 页已清理翻译结果，提取了 {len(korean_lines)} 行韩文")
-                            else:
-                                logger.warning(f"第 {idx} 页清理后没有找到韩文内容，使用原始结果")
-                        
-                        logger.info(f"第 {idx} 页翻译成功，长度: {len(translated_text)} 字符")
-                        # 验证翻译结果不是原文
-                        if translated_text == text or translated_text == text.strip():
-                            logger.warning(f"第 {idx} 页翻译结果与原文相同，可能翻译失败")
-                        # 检查是否包含中文（如果目标是日文）
-                        if target_language == "Japanese" and any('\u4e00' <= char <= '\u9fff' for char in translated_text):
-                            chinese_count = sum(1 for c in translated_text if '\u4e00' <= c <= '\u9fff')
-                            japanese_hiragana_katakana = sum(1 for c in translated_text if '\u3040' <= c <= '\u309F' or '\u30A0' <= c <= '\u30FF')
-                            if chinese_count > japanese_hiragana_katakana * 2:  # 如果中文数量远大于日文假名，可能混入了中文
-                                logger.warning(f"第 {idx} 页翻译结果包含大量中文，可能混入了中文而非纯日文")
-                        # 检查是否包含中文（如果目标是韩文）
-                        elif target_language == "Korean" and any('\u4e00' <= char <= '\u9fff' for char in translated_text):
-                            chinese_count = sum(1 for c in translated_text if '\u4e00' <= c <= '\u9fff')
-                            korean_count = sum(1 for c in translated_text if '\uAC00' <= c <= '\uD7A3')
-                            if chinese_count > korean_count:
-                                logger.warning(f"第 {idx} 页翻译结果包含大量中文，可能翻译方向错误")
-                    else:
-                        # 翻译失败，记录错误并使用原文
-                        error_msg = result.get("error", "未知错误")
-                        logger.error(f"第 {idx} 页翻译失败: {error_msg}，使用原文")
-                        translated_text = text
-                
-                translated_pages.append({
-                    "page_number": page_data["page_number"],
-                    "translated_text": translated_text,
-                    "width": page_data["width"],
-                    "height": page_data["height"]
-                })
+                    completed_pages = checkpoint.load()
+                except Exception as e:
+                    logger.warning(f"检查点不可用，不支持断点续传: {str(e)}")
+                    if checkpoint is not None:
+                        checkpoint.close()
+                    checkpoint = None
+                    completed_pages = {}
+            # 多进程工作池可以同时翻译多页
+            num_workers = max(1, PDF_TRANSLATE_WORKERS, getattr(self.translator, "concurrency", 1))
+            
+            extract_queue = queue.Queue(maxsize=PDF_PIPELINE_QUEUE_SIZE)
+            render_queue = queue.Queue(maxsize=PDF_PIPELINE_QUEUE_SIZE)
+            stop_event = threading.Event()
+            errors = []
+            # 各阶段累计耗时（秒，不含排队等待；翻译阶段为所有线程之和）
+            stage_times = {"extract": 0.0, "translate": 0.0, "render": 0.0}
+            stage_lock = threading.Lock()
+            # 本文档各条翻译的生成 token 数和因重复循环丢弃的 token 数
+            generation_stats = GenerationStats()
+            # 本文档各分段的翻译前过滤结果
+            bypass_stats = BypassStats()
+            # 翻译记忆的命中统计从进程启动时累计，记下开始时的值，结束时报告本文档的差值
+            memory = getattr(self.translator, "memory", None)
+            memory_start = memory.stats() if memory is not None else None
+            pipeline_start = time.perf_counter()
+            
+            def add_stage_time(stage: str, seconds: float):
+                with stage_lock:
+                    stage_times[stage] += seconds
+            
+            def extract_stage():
+                """提取阶段：从生成器逐页读取文本，队列满时暂停提取"""
+                pages = self.iter_pages(pdf_path, with_blocks=with_blocks)
+                try:
+                    while True:
+                        started = time.perf_counter()
+                        with tracer.span("pdf.extract"):
+                            page_data = next(pages, None)
+                        add_stage_time("extract", time.perf_counter() - started)
+                        if page_data is None or stop_event.is_set():
+                            return
+                        if not self._put(extract_queue, (page_data["page_number"], page_data), stop_event):
+                            return
+                except Exception as e:
+                    errors.append(e)
+                    stop_event.set()
+                finally:
+                    pages.close()
+                    for _ in range(num_workers):
+                        self._put(extract_queue, None, stop_event)
+            
+            def translate_stage():
+                """翻译阶段：调用翻译器翻译每一页"""
+                try:
+                    while not stop_event.is_set():
+                        item = self._get(extract_queue, stop_event)
+                        if item is None:
+                            break
+                        idx, page_data = item
+                        translated_page = completed_pages.get(idx)
+                        if translated_page is None:
+                            started = time.perf_counter()
+                            with tracer.span("pdf.translate_page", page=idx):
+                                translated_page = self._translate_page(
+                                    page_data, idx, total_pages, source_language, target_language,
+                                    generation_stats, bypass_stats
+                                )
+                            add_stage_time("translate", time.perf_counter() - started)
+                            # 有分段翻译失败（使用了原文）的页面不记录，续传时重新翻译
+                            if checkpoint and not translated_page.get("failed_segments"):
+                                checkpoint.record(translated_page)
+                        if not self._put(render_queue, (idx, translated_page), stop_event):
+                            break
+                except Exception as e:
+                    errors.append(e)
+                    stop_event.set()
+                finally:
+                    self._put(render_queue, None, stop_event)
+            
+            threads = [threading.Thread(target=extract_stage, name="pdf-extract", daemon=True)]
+            threads += [
+                threading.Thread(target=translate_stage, name=f"pdf-translate-{i}", daemon=True)
+                for i in range(num_workers)
+            ]
+            # 渲染阶段（当前线程）：按页码顺序整理结果并逐页追加到输出文件。
+            # 先创建输出文件再启动工作线程，创建失败时不会留下无人消费的线程
+            if layout_mode == "inplace":
+                writer = InPlacePDFWriter(output_path, pdf_path, target_language)
+            elif with_blocks:
+                writer = BlockPDFWriter(output_path, pdf_path, target_language)
+            else:
+                writer = IncrementalPDFWriter(output_path)
+            for thread in threads:
+                thread.start()
+            
+            translated_count = 0
+            pending = {}
+            next_idx = 1
+            finished_workers = 0
+            try:
+                while finished_workers < num_workers:
+                    item = self._get(render_queue, stop_event)
+                    if item is None:
+                        if stop_event.is_set():
+                            break
+                        finished_workers += 1
+                        continue
+                    idx, translated_page = item
+                    pending[idx] = translated_page
+                    while next_idx in pending:
+                        translated_page = pending.pop(next_idx)
+                        started = time.perf_counter()
+                        with tracer.span("pdf.render", page=next_idx):
+                            writer.add_page(translated_page)
+                        add_stage_time("render", time.perf_counter() - started)
+                        tracer.count("pdf_pages_total")
+                        if translated_page["translated_text"] and translated_page["translated_text"].strip():
+                            translated_count += 1
+                        if progress_callback:
+                            progress_callback(next_idx, total_pages, f"已完成第 {next_idx}/{total_pages} 页")
+                        next_idx += 1
+            except Exception:
+                stop_event.set()
+                raise
+            finally:
+                for thread in threads:
+                    thread.join()
+                # 出错时也写入已完成的页面，保留可打开的部分结果
+                started = time.perf_counter()
+                with tracer.span("pdf.finalize"):
+                    writer.close()
+                add_stage_time("render", time.perf_counter() - started)
+            
+            if errors:
+                raise errors[0]
             
             # 记录翻译统计
-            translated_count = sum(1 for p in translated_pages if p["translated_text"] and p["translated_text"].strip())
-            logger.info(f"翻译完成: 共 {len(translated_pages)} 页，其中 {translated_count} 页有翻译内容")
+            pages_translated = next_idx - 1
+            logger.info(f"翻译完成: 共 {pages_translated} 页，其中 {translated_count} 页有翻译内容")
             logger.info(f"翻译方向: {source_language} → {target_language}")
             
-            # 生成翻译后的 PDF
-            self._create_translated_pdf(translated_pages, output_path)
-            
-            return {
+            result = {
                 "success": True,
                 "output_path": output_path,
-                "pages_translated": len(translated_pages),
-                "translated_count": translated_count
+                "pages_translated": pages_translated,
+                "translated_count": translated_count,
+                "resumed_pages": len(completed_pages),
+                "elapsed": time.perf_counter() - pipeline_start,
+                "stage_times": dict(stage_times)
             }
             
+            if generation_stats.requests:
+                result["generation_stats"] = generation_stats.as_dict()
+                logger.info(
+                    f"生成统计: {result['generation_stats']['generated_tokens']} tokens，"
+                    f"重复循环丢弃 {result['generation_stats']['wasted_tokens']} tokens"
+                    f"（提前停止 {result['generation_stats']['repetition_stops']} 次，"
+                    f"达到生成上限 {result['generation_stats']['budget_stops']} 次）"
+                )
+            
+            if bypass_stats.segments:
+                result["bypass_stats"] = bypass_stats.as_dict()
+                logger.info(
+                    f"翻译前过滤: {bypass_stats.bypassed}/{bypass_stats.segments} 个分段保留原文，"
+                    f"未调用模型 {result['bypass_stats']['reasons']}"
+                )
+            
+            if tracer.enabled:
+                result["instrumentation"] = tracer.summary()
+                if INSTRUMENTATION_TRACE_PATH:
+                    try:
+                        tracer.export_json(INSTRUMENTATION_TRACE_PATH)
+                    except OSError as e:
+                        logger.warning(f"写入性能 trace 失败: {str(e)}")
+            
+            # 输出文件已完整生成，不再需要检查点
+            if checkpoint:
+                checkpoint.remove()
+            
+            # 附带本文档的翻译记忆统计（同时处理的其他请求也会计入）
+            if memory is not None:
+                memory_end = memory.stats()
+                hits = memory_end["hits"] - memory_start["hits"]
+                misses = memory_end["misses"] - memory_start["misses"]
+                result["memory_stats"] = {
+                    "hits": hits,
+                    "misses": misses,
+                    "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+                    "entries": memory_end["entries"]
+                }
+                logger.info(f"翻译记忆: 命中 {result['memory_stats']['hits']} 次，未命中 {result['memory_stats']['misses']} 次")
+            
+            return result
+            
         except Exception as e:
             logger.error(f"翻译 PDF 失败: {str(e)}")
-            return {
+            result = {
                 "success": False,
                 "error": str(e)
             }
+            if writer is not None and writer.pages_written:
+                result["partial_output_path"] = output_path
+                result["pages_written"] = writer.pages_written
+            return result
+        finally:
+            # 释放检查点槽位，已记录的页面留给下次续传
+            if checkpoint is not None:
+                checkpoint.close()
     
-    def _create_translated_pdf(self, pages_data: list, output_path: str):
+    @staticmethod
+    def _put(q: queue.Queue, item, stop_event: threading.Event) -> bool:
         """
-        创建翻译后的 PDF 文件（优化版，更好的布局保留）
+        向有界队列放入数据，流水线停止时放弃
+        
+        Returns:
+            是否成功放入
+        """
+        while not stop_event.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    @staticmethod
+    def _get(q: queue.Queue, stop_event: threading.Event):
+        """
+        从队列取出数据，流水线停止时返回 None
+        """
+        while True:
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                if stop_event.is_set():
+                    return None
+    
+    def _translate_page(
+        self,
+        page_data: Dict,
+        idx: int,
+        total_pages: int,
+        source_language: str,
+        target_language: str,
+        generation_stats: Optional[GenerationStats] = None,
+        bypass_stats: Optional[BypassStats] = None
+    ) -> Dict:
+        """
+        翻译单页文本
         
         Args:
-            pages_data: 包含翻译文本的页面数据
-            output_path: 输出文件路径
+            page_data: 页面数据（包含 text、width、height）
+            idx: 页码（从 1 开始）
+            total_pages: 总页数
+            source_language: 源语言
+            target_language: 目标语言
+            generation_stats: 累加各条翻译结果的生成统计
+            bypass_stats: 累加各分段的翻译前过滤结果
+            
+        Returns:
+            包含翻译文本的页面数据，failed_segments 为翻译失败、使用原文的分段数
         """
-        try:
-            from reportlab.lib.colors import black
-            from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-            from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-            from reportlab.lib.units import inch
-            from reportlab.pdfbase import pdfmetrics
-            from reportlab.pdfbase.ttfonts import TTFont
-            from reportlab.pdfbase.cidfonts import UnicodeCIDFont
-            
-            # 创建 PDF 文档
-            doc = SimpleDocTemplate(
-                output_path,
-                pagesize=(pages_data[0]["width"], pages_data[0]["height"]) if pages_data else A4
+        text = page_data["text"]
+        if not text or not text.strip():
+            return {
+                "page_number": page_data["page_number"],
+                "translated_text": "",
+                "width": page_data["width"],
+                "height": page_data["height"]
+            }
+        
+        if "blocks" in page_data:
+            return self._translate_blocks(
+                page_data, idx, source_language, target_language, generation_stats, bypass_stats
             )
+        
+        # 如果文本太长，按段落和句子边界分段处理
+        with tracer.span("pdf.chunk", page=idx) as span:
+            chunks = self._split_page_text(text, source_language, target_language)
+            span.set(chunks=len(chunks))
+        tracer.count("pdf_chunks_total", len(chunks))
+        if len(chunks) == 1 and self._bypass_segment(chunks[0], source_language, target_language, bypass_stats):
+            logger.info(f"第 {idx} 页不需要翻译，保留原文")
+            return {
+                "page_number": page_data["page_number"],
+                "translated_text": text,
+                "width": page_data["width"],
+                "height": page_data["height"]
+            }
+        failed = 0
+        if len(chunks) > 1:
+            # 分段翻译：同一页的分段放入一次批量翻译，不必逐段排队等待调度器组批
+            bypassed = [self._bypass_segment(chunk, source_language, target_language, bypass_stats) for chunk in chunks]
+            texts = [chunk for chunk, bypass in zip(chunks, bypassed) if not bypass]
+            logger.info(f"正在翻译第 {idx} 页，{len(texts)}/{len(chunks)} 段: {source_language} → {target_language}")
+            results = self._translate_texts(texts, source_language, target_language)
             
-            # 注册中文字体（使用 ReportLab 内置的 CID 字体）
-            # 尝试注册中文字体
-            font_name = 'Helvetica'
-            try:
-                # 尝试使用系统字体或 ReportLab 内置的 CID 字体
-                # 首先尝试注册 CID 字体（支持中文）
-                try:
-                    pdfmetrics.registerFont(UnicodeCIDFont('STSong-Light'))
-                    font_name = 'STSong-Light'
-                    logger.info("已注册中文字体: STSong-Light")
-                except:
-                    # 如果失败，尝试其他中文字体
-                    try:
-                        pdfmetrics.registerFont(UnicodeCIDFont('STHeiti-Light'))
-                        font_name = 'STHeiti-Light'
-                        logger.info("已注册中文字体: STHeiti-Light")
-                    except:
-                        # 如果都失败，使用默认字体（可能不支持中文）
-                        logger.warning("无法注册中文字体，可能无法正确显示中文")
-            except Exception as e:
-                logger.warning(f"注册中文字体时出错: {str(e)}，使用默认字体")
-            
-            # 获取样式
-            styles = getSampleStyleSheet()
-            
-            # 创建自定义样式
-            normal_style = ParagraphStyle(
-                'CustomNormal',
-                parent=styles['Normal'],
-                fontSize=12,
-                leading=16,
-                spaceAfter=12,
-                fontName=font_name,
-                encoding='utf-8'
-            )
+            translated_chunks = []
+            results = iter(results)
+            for chunk_idx, (chunk, bypass) in enumerate(zip(chunks, bypassed)):
+                if bypass:
+                    translated_chunks.append(chunk)
+                    continue
+                result = next(results)
+                if generation_stats is not None:
+                    generation_stats.add(result)
+                if result["success"]:
+                    translated_chunks.append(result["translated_text"])
+                    logger.info(f"第 {idx} 页第 {chunk_idx+1} 段翻译成功")
+                else:
+                    error_msg = result.get("error", "未知错误")
+                    logger.error(f"第 {idx} 页第 {chunk_idx+1} 段翻译失败: {error_msg}，使用原文")
+                    translated_chunks.append(chunk)
+                    failed += 1
             
-            # 构建内容
-            story = []
+            translated_text = "\n".join(translated_chunks)
+        else:
+            # 直接翻译
+            logger.info(f"正在翻译第 {idx} 页: {source_language} → {target_language}")
+            result = self.translator.translate(
+                text=text,
+                source_language=source_language,
+                target_language=target_language
+            )
+            if generation_stats is not None:
+                generation_stats.add(result)
             
-            for page_data in pages_data:
-                text = page_data["translated_text"]
-                if text:
-                    # 处理文本，保留换行
-                    paragraphs = text.split('\n')
-                    for para in paragraphs:
-                        if para.strip():
-                            # 处理特殊字符
-                            para = para.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
-                            story.append(Paragraph(para, normal_style))
-                            story.append(Spacer(1, 6))
+            if result["success"]:
+                # 翻译器已按目标语言完成清理（postprocess），这里不再重复处理
+                translated_text = result["translated_text"]
                 
-                # 添加分页
-                story.append(Spacer(1, 0.2*inch))
+                logger.info(f"第 {idx} 页翻译成功，长度: {len(translated_text)} 字符")
+                # 验证翻译结果不是原文
+                if translated_text == text or translated_text == text.strip():
+                    logger.warning(f"第 {idx} 页翻译结果与原文相同，可能翻译失败")
+                # 检查是否包含中文（如果目标是日文或韩文）
+                stats = script_stats(translated_text) if target_language in ("Japanese", "Korean") else None
+                if target_language == "Japanese" and stats.han:
+                    if stats.han > stats.kana * 2:  # 如果中文数量远大于日文假名，可能混入了中文
+                        logger.warning(f"第 {idx} 页翻译结果包含大量中文，可能混入了中文而非纯日文")
+                elif target_language == "Korean" and stats.han:
+                    if stats.han > stats.hangul:
+                        logger.warning(f"第 {idx} 页翻译结果包含大量中文，可能翻译方向错误")
+            else:
+                # 翻译失败，记录错误并使用原文
+                error_msg = result.get("error", "未知错误")
+                logger.error(f"第 {idx} 页翻译失败: {error_msg}，使用原文")
+                translated_text = text
+                failed = 1
+        
+        return {
+            "page_number": page_data["page_number"],
+            "translated_text": translated_text,
+            "width": page_data["width"],
+            "height": page_data["height"],
+            "failed_segments": failed
+        }
+    
+    def _translate_texts(self, texts: list, source_language: str, target_language: str) -> list:
+        """
+        批量翻译一页的分段，翻译器不支持批量时逐段翻译
+        
+        Args:
+            texts: 分段列表
+            source_language: 源语言
+            target_language: 目标语言
             
-            # 生成 PDF
-            doc.build(story)
+        Returns:
+            与 texts 顺序一致的翻译结果列表
+        """
+        if not texts:
+            return []
+        if hasattr(self.translator, "translate_batch"):
+            return self.translator.translate_batch(
+                texts, source_language=source_language, target_language=target_language
+            )
+        return [
+            self.translator.translate(text=chunk, source_language=source_language, target_language=target_language)
+            for chunk in texts
+        ]
+    
+    def _translate_blocks(
+        self,
+        page_data: Dict,
+        idx: int,
+        source_language: str,
+        target_language: str,
+        generation_stats: Optional[GenerationStats] = None,
+        bypass_stats: Optional[BypassStats] = None
+    ) -> Dict:
+        """
+        逐块翻译页面，同一页的所有文字块放入一次批量翻译
+        
+        Args:
+            page_data: 页面数据（包含 blocks）
+            idx: 页码（从 1 开始）
+            source_language: 源语言
+            target_language: 目标语言
+            generation_stats: 累加各条翻译结果的生成统计
+            bypass_stats: 累加各分段的翻译前过滤结果
             
-        except Exception as e:
-            logger.error(f"创建 PDF 失败: {str(e)}")
-            # 如果失败，使用简单方法
-            try:
-                from reportlab.lib.colors import black
-                c = canvas.Canvas(output_path)
-                
-                for page_data in pages_data:
-                    width = page_data["width"]
-                    height = page_data["height"]
-                    c.setPageSize((width, height))
-                    
-                    text = page_data["translated_text"]
-                    if text:
-                        # 使用支持中文的字体
-                        try:
-                            from reportlab.pdfbase.cidfonts import UnicodeCIDFont
-                            from reportlab.pdfbase import pdfmetrics
-                            try:
-                                pdfmetrics.registerFont(UnicodeCIDFont('STSong-Light'))
-                                c.setFont("STSong-Light", 12)
-                            except:
-                                try:
-                                    pdfmetrics.registerFont(UnicodeCIDFont('STHeiti-Light'))
-                                    c.setFont("STHeiti-Light", 12)
-                                except:
-                                    # 如果都失败，尝试使用支持 Unicode 的方法
-                                    c.setFont("Helvetica", 12)
-                        except:
-                            c.setFont("Helvetica", 12)
-                        
-                        lines = text.split('\n')
-                        y_position = height - 50
-                        
-                        for line in lines:
-                            if y_position < 50:
-                                break
-                            # 处理长行，自动换行（对中文和英文都适用）
-                            max_chars = 60  # 中文字符数
-                            if len(line) > max_chars:
-                                # 对中文和英文混合文本进行智能分割
-                                chunks = []
-                                current_chunk = ""
-                                for char in line:
-                                    if len(current_chunk) >= max_chars:
-                                        chunks.append(current_chunk)
-                                        current_chunk = char
-                                    else:
-                                        current_chunk += char
-                                if current_chunk:
-                                    chunks.append(current_chunk)
-                                
-                                for chunk in chunks:
-                                    if y_position < 50:
-                                        break
-                                    try:
-                                        c.drawString(50, y_position, chunk)
-                                        y_position -= 20
-                                    except Exception as e:
-                                        logger.warning(f"绘制文本失败: {str(e)}")
-                                        # 如果绘制失败，尝试编码处理
-                                        try:
-                                            chunk_encoded = chunk.encode('utf-8', 'ignore').decode('utf-8')
-                                            c.drawString(50, y_position, chunk_encoded)
-                                            y_position -= 20
-                                        except:
-                                            y_position -= 20
-                            else:
-                                try:
-                                    c.drawString(50, y_position, line)
-                                    y_position -= 20
-                                except Exception as e:
-                                    logger.warning(f"绘制文本失败: {str(e)}")
-                                    try:
-                                        line_encoded = line.encode('utf-8', 'ignore').decode('utf-8')
-                                        c.drawString(50, y_position, line_encoded)
-                                        y_position -= 20
-                                    except:
-                                        y_position -= 20
-                    
-                    c.showPage()
-                
-                c.save()
-            except Exception as e2:
-                logger.error(f"简单 PDF 创建也失败: {str(e2)}")
-                raise
+        Returns:
+            页面数据，blocks 只包含需要写回的文字块（bbox、font_size、color、translated_text），
+            failed_segments 为翻译失败、使用原文的分段数
+        """
+        blocks = page_data["blocks"]
+        # (文字块下标, 翻译块, 是否保留原文)，不含字母的块（页码、公式编号等）保持原样
+        segments = []
+        with tracer.span("pdf.chunk", page=idx) as span:
+            for block_idx, block in enumerate(blocks):
+                if not any(char.isalpha() for char in block["text"]):
+                    continue
+                for chunk in self._split_page_text(block["text"], source_language, target_language):
+                    bypass = self._bypass_segment(chunk, source_language, target_language, bypass_stats)
+                    segments.append((block_idx, chunk, bypass))
+            span.set(blocks=len(blocks), chunks=len(segments))
+        tracer.count("pdf_chunks_total", len(segments))
+        
+        logger.info(f"正在翻译第 {idx} 页，{len(blocks)} 个文字块: {source_language} → {target_language}")
+        texts = [chunk for _, chunk, bypass in segments if not bypass]
+        results = self._translate_texts(texts, source_language, target_language)
+        
+        translated = {}
+        # 至少有一段调用了模型的文字块，其余文字块全部保留原文，不需要写回
+        rewritten = set()
+        failed = 0
+        results = iter(results)
+        for block_idx, chunk, bypass in segments:
+            if bypass:
+                translated.setdefault(block_idx, []).append(chunk)
+                continue
+            rewritten.add(block_idx)
+            result = next(results)
+            if generation_stats is not None:
+                generation_stats.add(result)
+            if result["success"]:
+                translated.setdefault(block_idx, []).append(result["translated_text"])
+            else:
+                failed += 1
+                translated.setdefault(block_idx, []).append(chunk)
+        if failed:
+            logger.error(f"第 {idx} 页有 {failed}/{len(texts)} 段翻译失败，使用原文")
+        
+        out_blocks = [
+            {
+                "bbox": blocks[block_idx]["bbox"],
+                "font_size": blocks[block_idx]["font_size"],
+                "color": blocks[block_idx]["color"],
+                "translated_text": "\n".join(parts)
+            }
+            for block_idx, parts in sorted(translated.items())
+            if block_idx in rewritten
+        ]
+        return {
+            "page_number": page_data["page_number"],
+            "translated_text": "\n\n".join(block["translated_text"] for block in out_blocks),
+            "width": page_data["width"],
+            "height": page_data["height"],
+            "blocks": out_blocks,
+            "failed_segments": failed
+        }
+    
+    @staticmethod
+    def _bypass_segment(
+        text: str,
+        source_language: str,
+        target_language: str,
+        bypass_stats: Optional[BypassStats] = None
+    ) -> bool:
+        """
+        判断分段是否不需要调用模型（规则见 segment_filter 模块），并计入过滤统计
+        
+        Args:
+            text: 分段文本
+            source_language: 源语言
+            target_language: 目标语言
+            bypass_stats: 累加各分段的过滤结果
+            
+        Returns:
+            是否原样保留
+        """
+        from config import SEGMENT_FILTER_ENABLED
+        
+        if not SEGMENT_FILTER_ENABLED:
+            return False
+        reason = classify_segment(text, source_language, target_language)
+        if bypass_stats is not None:
+            bypass_stats.add(reason)
+        if reason is not None:
+            tracer.count("segments_bypassed_total", reason=reason)
+        return reason is not None
+    
+    def _split_page_text(self, text: str, source_language: str, target_language: str) -> list:
+        """
+        按翻译器的 token 预算切分页面文本
+        
+        Args:
+            text: 页面文本
+            source_language: 源语言
+            target_language: 目标语言
+            
+        Returns:
+            翻译块列表
+        """
+        from config import CHUNK_MAX_TOKENS
+        
+        key = (source_language, target_language)
+        if key not in self._chunk_budgets:
+            if hasattr(self.translator, "chunk_token_budget"):
+                self._chunk_budgets[key] = self.translator.chunk_token_budget(source_language, target_language)
+            else:
+                self._chunk_budgets[key] = CHUNK_MAX_TOKENS
+        count_tokens = getattr(self.translator, "count_tokens", estimate_tokens)
+        return split_text(text, self._chunk_budgets[key], count_tokens)
+    
+    def _create_translated_pdf(self, pages_data: list, output_path: str):
+        """
+        创建翻译后的 PDF 文件（优化版，更好的布局保留）
+        
+        Args:
+            pages_data: 包含翻译文本的页面数据
+            output_path: 输出文件路径
+        """
+        with IncrementalPDFWriter(output_path) as writer:
+            for page_data in pages_data:
+                writer.add_page(page_data)
+
+
+def _join_lines(lines: list) -> str:
+    """
+    把文字块内因排版折行的各行拼接成一段
 
+    行尾连字符断开的单词直接拼接，中日韩文字之间不加空格，其余以空格连接。
+    """
+    text = ""
+    for line in lines:
+        if not text:
+            text = line
+        elif text.endswith("-") and line[:1].islower():
+            text = text[:-1] + line
+        elif ord(text[-1]) > 0x2E7F and ord(line[0]) > 0x2E7F:
+            text += line
+        else:
+            text += " " + line
+    return text
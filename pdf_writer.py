@@ -0,0 +1,550 @@
+"""
+增量 PDF 写入模块
+每翻译完一页就追加到输出文件，任何时刻输出文件都是可打开的 PDF
+"""
+import fitz  # PyMuPDF
+import functools
+import io
+import logging
+import os
+import shutil
+from typing import Dict, Optional
+from instrumentation import tracer
+from reportlab.pdfgen import canvas
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+
+logger = logging.getLogger(__name__)
+
+
+class IncrementalPDFWriter:
+    """增量 PDF 写入器"""
+    
+    def __init__(self, output_path: str, flush_interval: Optional[int] = None):
+        """
+        初始化写入器
+        
+        Args:
+            output_path: 输出文件路径
+            flush_interval: 每累计多少页写盘一次
+        """
+        from config import PDF_WRITER_FLUSH_PAGES
+        
+        self.output_path = output_path
+        self.flush_interval = max(1, flush_interval or PDF_WRITER_FLUSH_PAGES)
+        self.style = get_paragraph_style()
+        self.pages_written = 0
+        self._doc = None
+        self._saved = False
+        self._unflushed = 0
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    def add_page(self, page_data: Dict):
+        """
+        追加一页译文
+        
+        Args:
+            page_data: 包含翻译文本的页面数据
+        """
+        if self._doc is None:
+            self._doc = fitz.open()
+        self._append_page(page_data)
+        self._unflushed += 1
+        if self._unflushed >= self.flush_interval:
+            self.flush()
+    
+    def _append_page(self, page_data: Dict):
+        """用 ReportLab 重新排版一页译文并追加到内存中的文档"""
+        data = render_page(page_data, self.style)
+        with fitz.open(stream=data, filetype="pdf") as page_doc:
+            self._doc.insert_pdf(page_doc)
+    
+    def flush(self):
+        """将未写盘的页面追加到输出文件"""
+        if not self._unflushed:
+            return
+        with tracer.span("pdf.flush", pages=self._unflushed):
+            if self._saved:
+                # 增量保存只追加新对象和新的交叉引用表，已写入的内容不会重写
+                self._doc.saveIncr()
+            else:
+                self._doc.save(self.output_path)
+                self._saved = True
+            # 重新打开文件，释放已写盘页面占用的内存
+            self._doc.close()
+            self._doc = fitz.open(self.output_path)
+        self.pages_written += self._unflushed
+        self._unflushed = 0
+        logger.info(f"已写入 {self.pages_written} 页到 {self.output_path}")
+    
+    def close(self):
+        """写入剩余页面并关闭文件"""
+        try:
+            if not self._saved and not self._unflushed:
+                # 没有任何页面时输出一个空白页，保证文件可以打开
+                self._doc = self._doc or fitz.open()
+                self._doc.new_page(width=A4[0], height=A4[1])
+                self._doc.save(self.output_path)
+                self._saved = True
+            else:
+                self.flush()
+        finally:
+            if self._doc is not None:
+                self._doc.close()
+                self._doc = None
+
+
+class BlockPDFWriter(IncrementalPDFWriter):
+    """
+    按文字块写回译文的增量写入器
+    
+    在原 PDF 页面上涂掉（redact）每个已翻译文字块，再把译文按原位置和字号写入同一区域，
+    图片和矢量图形保持不变，输出页数与原文件一致。
+    """
+    
+    def __init__(
+        self,
+        output_path: str,
+        source_path: str,
+        target_language: str = "Chinese",
+        flush_interval: Optional[int] = None
+    ):
+        """
+        初始化写入器
+        
+        Args:
+            output_path: 输出文件路径
+            source_path: 原 PDF 文件路径
+            target_language: 目标语言，用于选择字体
+            flush_interval: 每累计多少页写盘一次
+        """
+        from config import PDF_BLOCK_MIN_FONT_SIZE
+        
+        super().__init__(output_path, flush_interval)
+        self.source_path = source_path
+        self.fontname, self.fontfile = block_font(target_language)
+        self.min_font_size = PDF_BLOCK_MIN_FONT_SIZE
+        self._source = fitz.open(source_path)
+    
+    def _append_page(self, page_data: Dict):
+        """在原页面上替换文字块后复制到输出文档，没有文字块的页面原样复制"""
+        index = page_data["page_number"] - 1
+        replace_blocks(
+            self._source[index], page_data.get("blocks"), self.fontname, self.fontfile, self.min_font_size
+        )
+        self._doc.insert_pdf(self._source, from_page=index, to_page=index)
+    
+    def flush(self):
+        """写盘后重新打开原文件，丢弃已写出页面上的修改以释放内存"""
+        super().flush()
+        self._source.close()
+        self._source = fitz.open(self.source_path)
+    
+    def close(self):
+        try:
+            super().close()
+        finally:
+            self._source.close()
+
+
+class InPlacePDFWriter(IncrementalPDFWriter):
+    """
+    原地改写的增量写入器
+    
+    先把原 PDF 整体复制为输出文件，再逐页替换已翻译文字块中的文字，以增量保存追加修改过的对象。
+    图片、矢量图形和原有字体不会被解码、重新编码或复制，写入耗时只与译文量有关，与文件大小无关。
+    由于增量保存保留旧版本的对象，输出文件会比原文件略大。
+    
+    MuPDF 每次保存都要完整读写一遍文件，因此默认只在 close 时保存一次（出错时 close 同样会保存，
+    进程被强制结束时由检查点恢复）。
+    """
+    
+    def __init__(
+        self,
+        output_path: str,
+        source_path: str,
+        target_language: str = "Chinese",
+        flush_interval: Optional[int] = None
+    ):
+        """
+        初始化写入器
+        
+        Args:
+            output_path: 输出文件路径
+            source_path: 原 PDF 文件路径
+            target_language: 目标语言，用于选择字体
+            flush_interval: 每累计多少页写盘一次，为 None 时只在 close 时保存
+        """
+        from config import PDF_BLOCK_MIN_FONT_SIZE
+        
+        super().__init__(output_path, flush_interval)
+        if not flush_interval:
+            self.flush_interval = float("inf")
+        self.fontname, self.fontfile = block_font(target_language)
+        self.min_font_size = PDF_BLOCK_MIN_FONT_SIZE
+        
+        shutil.copyfile(source_path, output_path)
+        self._doc = fitz.open(output_path)
+        if not self._doc.can_save_incrementally():
+            # 损坏后被修复或加密的文件不能增量保存，先完整保存一次
+            logger.info(f"{source_path} 不支持增量保存，先完整复制一次")
+            self._doc.close()
+            with fitz.open(source_path) as source:
+                source.save(output_path)
+            self._doc = fitz.open(output_path)
+        self._saved = True
+    
+    def _append_page(self, page_data: Dict):
+        """直接在输出文件的对应页面上替换文字块，未翻译的页面保持原样"""
+        replace_blocks(
+            self._doc[page_data["page_number"] - 1],
+            page_data.get("blocks"),
+            self.fontname,
+            self.fontfile,
+            self.min_font_size
+        )
+
+
+# 只移除被覆盖的文字，保留图片和矢量图形（PyMuPDF 1.24.2 起支持 graphics 参数）
+_REDACT_OPTIONS = {"images": fitz.PDF_REDACT_IMAGE_NONE}
+if hasattr(fitz, "PDF_REDACT_LINE_ART_NONE"):
+    _REDACT_OPTIONS["graphics"] = fitz.PDF_REDACT_LINE_ART_NONE
+
+
+def replace_blocks(page, blocks: Optional[list], fontname: str, fontfile: Optional[str], min_font_size: float):
+    """
+    用译文替换页面上的文字块
+    
+    涂掉（redact）每个文字块内的原文，不填充背景，再把译文按原位置、字号和颜色写入，
+    放不下时缩小字号。同一页的译文写入同一个 Shape，只提交一次内容流。
+    
+    Args:
+        page: fitz 页面
+        blocks: 文字块列表（bbox、font_size、color、translated_text），为空时不做修改
+        fontname: 字体名称
+        fontfile: 字体文件路径，使用内置字体时为 None
+        min_font_size: 缩小字号的下限
+    """
+    if not blocks:
+        return
+    with tracer.span("pdf.layout", blocks=len(blocks)):
+        for block in blocks:
+            page.add_redact_annot(fitz.Rect(block["bbox"]), fill=False)
+        page.apply_redactions(**_REDACT_OPTIONS)
+        shape = page.new_shape()
+        for block in blocks:
+            _insert_block(shape, page, block, fontname, fontfile, min_font_size)
+        shape.commit()
+    # 涂改时 MuPDF 会读取页面上的图片并留在资源缓存中，逐页清空，避免内存随文件大小增长
+    fitz.TOOLS.store_shrink(100)
+
+
+def _insert_block(shape, page, block: Dict, fontname: str, fontfile: Optional[str], min_font_size: float):
+    """把一个文字块的译文写入原位置，放不下时缩小字号"""
+    rect = fitz.Rect(block["bbox"])
+    text = block["translated_text"]
+    # 译文为空时只保留涂改
+    if not text.strip():
+        return
+    color = block.get("color", 0)
+    options = {
+        "fontname": fontname,
+        "fontfile": fontfile,
+        "color": ((color >> 16 & 255) / 255, (color >> 8 & 255) / 255, (color & 255) / 255)
+    }
+    # 按文字总面积估算能放下的字号，避免从原字号开始逐次试排（折行浪费由下面的循环兜底）
+    char_width, line_height = _font_metrics(fontname, fontfile)
+    font_size = min(block["font_size"], (rect.width * rect.height / (len(text) * char_width * line_height)) ** 0.5)
+    font_size = max(font_size, min_font_size)
+    # insert_textbox 在放不下时返回负数且不写入任何内容
+    while font_size >= min_font_size:
+        if shape.insert_textbox(rect, text, fontsize=font_size, **options) >= 0:
+            return
+        font_size *= 0.9
+    # 最小字号仍放不下时向下扩展到页面底部
+    rect.y1 = page.rect.y1
+    if shape.insert_textbox(rect, text, fontsize=min_font_size, **options) < 0:
+        logger.warning(f"第 {page.number + 1} 页有文字块的译文过长，未能完整写入")
+
+
+# insert_textbox 按每字 1 个字号宽度排版的内置 CJK 字体
+_CJK_FONTS = ("china-s", "china-ss", "china-t", "china-ts", "japan", "japan-s", "korea", "korea-s")
+
+
+@functools.lru_cache(maxsize=8)
+def _font_metrics(fontname: str, fontfile: Optional[str]):
+    """
+    估算字号的字体参数（与 insert_textbox 的排版方式一致）
+    
+    Returns:
+        (字号为 1 时的平均字宽, 行高系数)
+    """
+    char_width = 1.0 if fontname in _CJK_FONTS else 0.5
+    try:
+        font = fitz.Font(fontfile=fontfile) if fontfile else fitz.Font(fontname)
+        line_height = font.ascender - font.descender
+    except Exception:
+        line_height = 1.2
+    return char_width, max(line_height, 1.2)
+
+
+# 各目标语言使用 PyMuPDF 内置字体：中日韩使用对应的 CJK 字体，Latin-1 范围内的拉丁字母语言使用 Helvetica
+_BLOCK_FONTS = {
+    "Chinese": "china-s",
+    "Japanese": "japan",
+    "Korean": "korea",
+    "English": "helv",
+    "French": "helv",
+    "German": "helv",
+    "Spanish": "helv",
+    "Italian": "helv",
+    "Portuguese": "helv"
+}
+# 超出 Latin-1 的拉丁字母和西里尔字母语言使用 MuPDF 自带的 Noto Serif（覆盖拉丁、希腊、西里尔字母）
+_NOTO_LANGUAGES = {"Russian": "ru", "Vietnamese": "vi", "Turkish": "tr"}
+
+
+def block_font(target_language: str):
+    """
+    选择文字块模式写入译文的字体
+    
+    阿拉伯文、泰文、印地文等没有内置字体，且 insert_textbox 不做字形连写和从右到左排版，
+    未指定 PDF_BLOCK_FONT_FILE 时无法在原位置正确写入。
+    
+    Args:
+        target_language: 目标语言
+        
+    Returns:
+        (字体名称, 字体文件路径)，使用内置字体时路径为 None；没有可用字体时返回 None
+    """
+    from config import PDF_BLOCK_FONT_FILE
+    
+    if PDF_BLOCK_FONT_FILE:
+        return "blockfont", PDF_BLOCK_FONT_FILE
+    if target_language in _BLOCK_FONTS:
+        return _BLOCK_FONTS[target_language], None
+    if target_language in _NOTO_LANGUAGES:
+        try:
+            return "notoserif", _builtin_font_file(_NOTO_LANGUAGES[target_language])
+        except Exception as e:
+            logger.warning(f"无法导出内置 Noto 字体: {str(e)}")
+    return None
+
+
+@functools.lru_cache(maxsize=4)
+def _builtin_font_file(language: str) -> str:
+    """把 MuPDF 为该语言自带的字体导出到 TEMP_DIR（insert_textbox 只接受字体文件）"""
+    from config import TEMP_DIR
+    
+    font = fitz.Font(language=language)
+    path = os.path.join(TEMP_DIR, "fonts", f"{font.name.replace(' ', '')}.ttf")
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(font.buffer)
+        os.replace(tmp_path, path)
+    return path
+
+
+def render_page(page_data: Dict, style) -> bytes:
+    """
+    将单页译文渲染成独立的 PDF 数据
+    
+    Args:
+        page_data: 包含翻译文本的页面数据
+        style: 段落样式
+        
+    Returns:
+        PDF 字节数据
+    """
+    from reportlab.platypus import SimpleDocTemplate
+    
+    buffer = io.BytesIO()
+    try:
+        doc = SimpleDocTemplate(buffer, pagesize=(page_data["width"], page_data["height"]))
+        with tracer.span("pdf.layout"):
+            doc.build(page_to_flowables(page_data, style))
+    except Exception as e:
+        logger.error(f"第 {page_data.get('page_number', '?')} 页排版失败: {str(e)}，使用简单方式绘制")
+        buffer = io.BytesIO()
+        create_simple_pdf([page_data], buffer)
+    return buffer.getvalue()
+
+
+def get_paragraph_style():
+    """
+    注册中文字体并创建段落样式
+    
+    Returns:
+        ReportLab 段落样式
+    """
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+    
+    # 注册中文字体（使用 ReportLab 内置的 CID 字体）
+    # 尝试注册中文字体
+    font_name = 'Helvetica'
+    try:
+        # 尝试使用系统字体或 ReportLab 内置的 CID 字体
+        # 首先尝试注册 CID 字体（支持中文）
+        try:
+            pdfmetrics.registerFont(UnicodeCIDFont('STSong-Light'))
+            font_name = 'STSong-Light'
+            logger.info("已注册中文字体: STSong-Light")
+        except:
+            # 如果失败，尝试其他中文字体
+            try:
+                pdfmetrics.registerFont(UnicodeCIDFont('STHeiti-Light'))
+                font_name = 'STHeiti-Light'
+                logger.info("已注册中文字体: STHeiti-Light")
+            except:
+                # 如果都失败，使用默认字体（可能不支持中文）
+                logger.warning("无法注册中文字体，可能无法正确显示中文")
+    except Exception as e:
+        logger.warning(f"注册中文字体时出错: {str(e)}，使用默认字体")
+    
+    # 获取样式
+    styles = getSampleStyleSheet()
+    
+    # 创建自定义样式
+    normal_style = ParagraphStyle(
+        'CustomNormal',
+        parent=styles['Normal'],
+        fontSize=12,
+        leading=16,
+        spaceAfter=12,
+        fontName=font_name,
+        encoding='utf-8'
+    )
+    return normal_style
+
+
+def page_to_flowables(page_data: Dict, style) -> list:
+    """
+    将单页译文转换为 ReportLab 排版元素
+    
+    Args:
+        page_data: 包含翻译文本的页面数据
+        style: 段落样式
+        
+    Returns:
+        排版元素列表
+    """
+    from reportlab.platypus import Paragraph, Spacer
+    from reportlab.lib.units import inch
+    
+    flowables = []
+    text = page_data["translated_text"]
+    if text:
+        # 处理文本，保留换行
+        paragraphs = text.split('\n')
+        for para in paragraphs:
+            if para.strip():
+                # 处理特殊字符
+                para = para.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+                flowables.append(Paragraph(para, style))
+                flowables.append(Spacer(1, 6))
+    
+    # 空白页也需要至少一个元素，保证输出页与源页一一对应
+    if not flowables:
+        flowables.append(Spacer(1, 0.2*inch))
+    return flowables
+
+
+def create_simple_pdf(pages_data: list, output) -> None:
+    """
+    使用 canvas 逐行绘制的简单 PDF 生成方式
+    
+    Args:
+        pages_data: 包含翻译文本的页面数据
+        output: 输出文件路径或可写的文件对象
+    """
+    try:
+        from reportlab.lib.colors import black
+        c = canvas.Canvas(output)
+        
+        for page_data in pages_data:
+            width = page_data["width"]
+            height = page_data["height"]
+            c.setPageSize((width, height))
+            
+            text = page_data["translated_text"]
+            if text:
+                # 使用支持中文的字体
+                try:
+                    from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+                    from reportlab.pdfbase import pdfmetrics
+                    try:
+                        pdfmetrics.registerFont(UnicodeCIDFont('STSong-Light'))
+                        c.setFont("STSong-Light", 12)
+                    except:
+                        try:
+                            pdfmetrics.registerFont(UnicodeCIDFont('STHeiti-Light'))
+                            c.setFont("STHeiti-Light", 12)
+                        except:
+                            # 如果都失败，尝试使用支持 Unicode 的方法
+                            c.setFont("Helvetica", 12)
+                except:
+                    c.setFont("Helvetica", 12)
+                
+                lines = text.split('\n')
+                y_position = height - 50
+                
+                for line in lines:
+                    if y_position < 50:
+                        break
+                    # 处理长行，自动换行（对中文和英文都适用）
+                    max_chars = 60  # 中文字符数
+                    if len(line) > max_chars:
+                        # 对中文和英文混合文本进行智能分割
+                        chunks = []
+                        current_chunk = ""
+                        for char in line:
+                            if len(current_chunk) >= max_chars:
+                                chunks.append(current_chunk)
+                                current_chunk = char
+                            else:
+                                current_chunk += char
+                        if current_chunk:
+                            chunks.append(current_chunk)
+                        
+                        for chunk in chunks:
+                            if y_position < 50:
+                                break
+                            try:
+                                c.drawString(50, y_position, chunk)
+                                y_position -= 20
+                            except Exception as e:
+                                logger.warning(f"绘制文本失败: {str(e)}")
+                                # 如果绘制失败，尝试编码处理
+                                try:
+                                    chunk_encoded = chunk.encode('utf-8', 'ignore').decode('utf-8')
+                                    c.drawString(50, y_position, chunk_encoded)
+                                    y_position -= 20
+                                except:
+                                    y_position -= 20
+                    else:
+                        try:
+                            c.drawString(50, y_position, line)
+                            y_position -= 20
+                        except Exception as e:
+                            logger.warning(f"绘制文本失败: {str(e)}")
+                            try:
+                                line_encoded = line.encode('utf-8', 'ignore').decode('utf-8')
+                                c.drawString(50, y_position, line_encoded)
+                                y_position -= 20
+                            except:
+                                y_position -= 20
+            
+            c.showPage()
+        
+        c.save()
+    except Exception as e2:
+        logger.error(f"简单 PDF 创建也失败: {str(e2)}")
+        raise
@@ -0,0 +1,213 @@
+"""
+翻译结果后处理模块
+按目标语言注册清理规则，翻译器对每条模型输出只执行一次
+"""
+import logging
+from typing import Callable, Dict, List, NamedTuple, Any
+
+from script_detection import script_stats, iter_line_stats
+
+logger = logging.getLogger(__name__)
+
+
+class PostProcessError(Exception):
+    """规则判定结果不可用（例如目标为韩文但输出中没有韩文）"""
+
+
+class PostProcessContext(NamedTuple):
+    """规则执行时可用的上下文"""
+    original: str
+    source_language: str
+    target_language: str
+
+
+Rule = Callable[[str, PostProcessContext], str]
+
+_RULES: Dict[str, List[Rule]] = {}
+
+
+def register_rule(target_language: str, rule: Rule = None):
+    """
+    为目标语言注册一条清理规则，规则按注册顺序依次执行
+
+    可直接调用，也可作为装饰器使用：
+
+        @register_rule("Japanese")
+        def my_rule(text, context): ...
+
+    Args:
+        target_language: 目标语言
+        rule: 规则函数，接收当前文本和上下文，返回清理后的文本；
+              判定结果不可用时抛出 PostProcessError
+
+    Returns:
+        规则函数本身
+    """
+    def decorator(func: Rule) -> Rule:
+        _RULES.setdefault(target_language, []).append(func)
+        return func
+
+    if rule is not None:
+        return decorator(rule)
+    return decorator
+
+
+def get_rules(target_language: str) -> List[Rule]:
+    """获取目标语言已注册的规则"""
+    return list(_RULES.get(target_language, []))
+
+
+def postprocess(response: str, source_language: str, target_language: str) -> Dict[str, Any]:
+    """
+    清理模型回复并构建翻译结果字典
+
+    Args:
+        response: 模型原始回复
+        source_language: 源语言
+        target_language: 目标语言
+
+    Returns:
+        与 translate() 格式一致的结果字典
+    """
+    translated_text = response.strip()
+    context = PostProcessContext(response, source_language, target_language)
+    for rule in _RULES.get(target_language, ()):
+        try:
+            translated_text = rule(translated_text, context)
+        except PostProcessError as e:
+            logger.error(f"翻译结果未通过后处理: {str(e)}")
+            return {
+                "success": False,
+                "error": str(e),
+                "translated_text": ""
+            }
+
+    return {
+        "success": True,
+        "translated_text": translated_text,
+        "source_language": source_language,
+        "target_language": target_language
+    }
+
+
+def postprocess_batch(responses: List[str], source_language: str, target_language: str) -> List[Dict[str, Any]]:
+    """
+    批量清理同一语言对的模型回复
+
+    Args:
+        responses: 模型原始回复列表
+        source_language: 源语言
+        target_language: 目标语言
+
+    Returns:
+        结果字典列表（与输入顺序一致）
+    """
+    return [postprocess(response, source_language, target_language) for response in responses]
+
+
+# ---------------------------------------------------------------------------
+# 日文、韩文的内置规则
+# ---------------------------------------------------------------------------
+
+# 模型常把提示词或注释原样带进输出，含这些词的行直接丢弃
+_COMMON_SKIP_KEYWORDS = ['Translation', 'Original text', 'Requirements', 'Note', '翻译', '原文', '要求', '事项', 'Matters', 'English']
+_PUNCT_ONLY_LINES = {'：', ':', '-', '—'}
+
+
+class _TargetScriptRules:
+    """
+    以“目标文字”为依据的两步清理：先剔除混入的中文行，再剔除提示词行和非目标语言行
+    """
+
+    def __init__(
+        self,
+        script: str,
+        skip_keywords: List[str],
+        prefixes: List[str],
+        keep_other_non_ascii: bool,
+        require_script: bool,
+        label: str
+    ):
+        """
+        Args:
+            script: ScriptStats 中目标文字的字段名（kana、hangul）
+            skip_keywords: 需要丢弃的提示词
+            prefixes: 全部行都被丢弃时，从原始回复开头移除的前缀
+            keep_other_non_ascii: 剔除中文时是否保留不含汉字的其他非 ASCII 行
+            require_script: 混入中文且完全没有目标文字时是否判定失败
+            label: 日志中的语言名称
+        """
+        self.script = script
+        self.skip_keywords = skip_keywords
+        self.prefixes = prefixes
+        self.keep_other_non_ascii = keep_other_non_ascii
+        self.require_script = require_script
+        self.label = label
+
+    def drop_chinese(self, text: str, context: PostProcessContext) -> str:
+        stats = script_stats(text)
+        if not stats.han or getattr(stats, self.script):
+            return text
+
+        logger.warning(f"翻译结果包含中文但没有{self.label}，可能混入了中文")
+        lines = []
+        for line, line_stats in iter_line_stats(text):
+            if getattr(line_stats, self.script):
+                lines.append(line.strip())
+            elif self.keep_other_non_ascii and not line_stats.han and line_stats.non_ascii:
+                lines.append(line.strip())
+        if lines:
+            return '\n'.join(lines)
+        if self.require_script:
+            raise PostProcessError(f"翻译结果不包含{self.label}，可能模型返回了错误的语言")
+        logger.warning(f"清理后没有找到{self.label}内容，使用原始结果")
+        return text
+
+    def keep_target_lines(self, text: str, context: PostProcessContext) -> str:
+        lines = []
+        for line, line_stats in iter_line_stats(text):
+            line = line.strip()
+            # 跳过空行、只有标点的行和明显的提示词行
+            if not line or line in _PUNCT_ONLY_LINES:
+                continue
+            if any(keyword in line for keyword in self.skip_keywords):
+                continue
+            # 优先保留包含目标文字的行，其次是以非 ASCII 字符为主的行
+            if getattr(line_stats, self.script):
+                lines.append(line)
+            elif line_stats.non_ascii / len(line) > 0.5:
+                lines.append(line)
+        if lines:
+            return '\n'.join(lines)
+
+        # 全部被丢弃时，使用原始回复但移除开头的提示词
+        text = context.original.strip()
+        for prefix in self.prefixes:
+            if text.startswith(prefix):
+                text = text[len(prefix):].strip()
+                if text.startswith(':'):
+                    text = text[1:].strip()
+        return text
+
+    def register(self, target_language: str):
+        register_rule(target_language, self.drop_chinese)
+        register_rule(target_language, self.keep_target_lines)
+
+
+_TargetScriptRules(
+    script="kana",
+    skip_keywords=_COMMON_SKIP_KEYWORDS + ['Japanese', '日本語'],
+    prefixes=['Translation', '翻译结果', 'Translation (Japanese):', 'Translation (日本語):', 'Japanese (日本語 only):'],
+    keep_other_non_ascii=True,
+    require_script=False,
+    label="日文假名"
+).register("Japanese")
+
+_TargetScriptRules(
+    script="hangul",
+    skip_keywords=_COMMON_SKIP_KEYWORDS + ['Korean'],
+    prefixes=['Translation', '翻译结果', 'Translation (Korean):', 'Translation (한국어):', 'Korean (한국어 only):'],
+    keep_other_non_ascii=False,
+    require_script=True,
+    label="韩文"
+).register("Korean")
@@ -0,0 +1,52 @@
+"""
+翻译提示词模板
+各翻译后端共用，修改模板时需要递增 translator.PROMPT_VERSION
+"""
+
+
+def build_prompt(text: str, source_language: str, target_language: str) -> str:
+    """
+    构建翻译提示词
+    
+    Args:
+        text: 待翻译的文本
+        source_language: 源语言
+        target_language: 目标语言
+        
+    Returns:
+        提示词
+    """
+    # 构建翻译提示词（优化版）
+    # 根据目标语言选择不同的提示词格式
+    if target_language == "Korean":
+        prompt = f"""You must translate the following English text into Korean language (한국어). 
+IMPORTANT: You must output ONLY Korean text. Do NOT output Chinese. Do NOT output English. Only Korean.
+
+English:
+{text}
+
+Korean (한국어 only):"""
+    elif target_language == "Japanese":
+        prompt = f"""You must translate the following English text into Japanese language (日本語). 
+IMPORTANT: You must output ONLY Japanese text. Do NOT output Chinese. Do NOT output English. Only Japanese.
+
+English:
+{text}
+
+Japanese (日本語 only):"""
+    else:
+        prompt = f"""你是一位专业的翻译专家。请将以下{source_language}文本准确翻译成{target_language}。
+
+要求：
+1. 翻译要准确、自然、流畅
+2. 保持原文的语气和风格
+3. 保留原文的格式（如换行、段落等）
+4. 如果是技术术语，请使用通用的翻译
+5. 只返回翻译结果，不要添加任何解释、注释或额外说明
+6. 不要包含原文或任何注释
+
+原文：
+{text}
+
+翻译："""
+    return prompt
@@ -0,0 +1,353 @@
+"""
+翻译请求调度器
+在界面事件处理函数与翻译器之间收集并发请求，组成小批量后交给 translate_batch
+"""
+import asyncio
+import collections
+import contextlib
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List, AsyncIterator
+
+from chunker import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+
+class _Request:
+    """排队中的单条翻译请求"""
+
+    __slots__ = ("text", "source_language", "target_language", "tokens", "future", "enqueued_at")
+
+    def __init__(self, text: str, source_language: str, target_language: str, future: asyncio.Future):
+        self.text = text
+        self.source_language = source_language
+        self.target_language = target_language
+        self.tokens = estimate_tokens(text)
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+
+
+class BatchScheduler:
+    """基于 asyncio 的动态小批量调度器"""
+
+    def __init__(
+        self,
+        translator,
+        max_batch_size: Optional[int] = None,
+        max_batch_tokens: Optional[int] = None,
+        max_wait_ms: Optional[float] = None
+    ):
+        """
+        初始化调度器，并在后台线程中启动独立的事件循环
+
+        Args:
+            translator: 提供 translate_batch 的翻译器
+            max_batch_size: 单批最大请求数
+            max_batch_tokens: 单批原文 token 上限（估算值）
+            max_wait_ms: 收到第一条请求后最多等待多少毫秒再发出批次
+        """
+        from config import BATCH_SIZE, BATCH_MAX_TOKENS, SCHEDULER_MAX_WAIT_MS
+
+        self.translator = translator
+        self.max_batch_size = max(1, max_batch_size or BATCH_SIZE)
+        self.max_batch_tokens = max_batch_tokens or BATCH_MAX_TOKENS
+        self.max_wait = (max_wait_ms if max_wait_ms is not None else SCHEDULER_MAX_WAIT_MS) / 1000
+
+        # 统计信息
+        self._stats_lock = threading.Lock()
+        self._requests = 0
+        self._batches = 0
+        self._total_wait = 0.0
+        self._max_wait_seen = 0.0
+        # 正在等待结果的调用方数，只有一个时它的请求已全部入队，不必再等其他请求组批
+        self._producers = 0
+        # 已交给模型线程、尚未完成的批次和流式请求数
+        self._running = 0
+
+        # 模型调用只在单个线程中执行，避免并发访问模型
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="translator")
+        self._backlog = collections.deque()
+        self._loop = asyncio.new_event_loop()
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run_loop, name="batch-scheduler", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+
+    def __getattr__(self, name):
+        # 其余属性（memory、count_tokens、chunk_token_budget、device 等）透传给翻译器
+        return getattr(self.translator, name)
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._queue = asyncio.Queue()
+        self._dispatcher = self._loop.create_task(self._dispatch_loop())
+        self._ready.set()
+        self._loop.run_forever()
+
+    @contextlib.contextmanager
+    def _producer(self):
+        with self._stats_lock:
+            self._producers += 1
+        try:
+            yield
+        finally:
+            with self._stats_lock:
+                self._producers -= 1
+
+    def _busy(self) -> bool:
+        """是否有排队或正在执行的请求（此时流式请求改为参与组批）"""
+        with self._stats_lock:
+            running = self._running
+        return running > 0 or self._queue.qsize() > 0 or len(self._backlog) > 0
+
+    async def submit(
+        self,
+        text: str,
+        source_language: str = "English",
+        target_language: str = "Chinese"
+    ) -> Dict[str, Any]:
+        """
+        提交一条翻译请求并等待结果，可在任意事件循环中调用
+
+        Args:
+            text: 待翻译的文本
+            source_language: 源语言
+            target_language: 目标语言
+
+        Returns:
+            与 translate() 格式相同的结果字典
+        """
+        with self._producer():
+            future = asyncio.run_coroutine_threadsafe(
+                self._enqueue_many([text], source_language, target_language), self._loop
+            )
+            return (await asyncio.wrap_future(future))[0]
+
+    async def _enqueue_many(self, texts: list, source_language: str, target_language: str) -> list:
+        # 在同一步中全部放入队列，调度循环不会只取到其中一部分就认为调用方的请求已取完
+        futures = []
+        for text in texts:
+            future = self._loop.create_future()
+            self._queue.put_nowait(_Request(text, source_language, target_language, future))
+            futures.append(future)
+        return await asyncio.gather(*futures)
+
+    def translate(
+        self,
+        text: str,
+        source_language: str = "English",
+        target_language: str = "Chinese"
+    ) -> Dict[str, Any]:
+        """
+        同步翻译接口，供 PDFProcessor 等同步代码使用
+
+        Args:
+            text: 待翻译的文本
+            source_language: 源语言
+            target_language: 目标语言
+
+        Returns:
+            翻译结果字典
+        """
+        return self.translate_batch([text], source_language, target_language)[0]
+
+    def translate_batch(
+        self,
+        texts: list,
+        source_language: str = "English",
+        target_language: str = "Chinese"
+    ) -> list:
+        """
+        同步批量翻译接口，各条请求与其他调用方的请求一起参与组批
+
+        Args:
+            texts: 待翻译的文本列表
+            source_language: 源语言
+            target_language: 目标语言
+
+        Returns:
+            翻译结果列表
+        """
+        if not texts:
+            return []
+        with self._producer():
+            return asyncio.run_coroutine_threadsafe(
+                self._enqueue_many(texts, source_language, target_language), self._loop
+            ).result()
+
+    async def submit_stream(
+        self,
+        text: str,
+        source_language: str = "English",
+        target_language: str = "Chinese"
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        流式翻译，生成过程与批次一样在模型线程中串行执行
+
+        逐字生成会独占模型线程，因此只在空闲时流式输出；已有排队或正在执行的请求时，
+        与其他请求一起组批翻译，只产出最终结果。
+
+        Args:
+            text: 待翻译的文本
+            source_language: 源语言
+            target_language: 目标语言
+
+        Yields:
+            translate_stream 产出的部分结果和最终结果
+        """
+        if self._busy():
+            result = await self.submit(text, source_language, target_language)
+            result["finished"] = True
+            yield result
+            return
+
+        caller_loop = asyncio.get_running_loop()
+        items = asyncio.Queue()
+        enqueued_at = time.perf_counter()
+        with self._stats_lock:
+            self._running += 1
+
+        def produce():
+            wait = time.perf_counter() - enqueued_at
+            try:
+                for item in self.translator.translate_stream(
+                    text,
+                    source_language=source_language,
+                    target_language=target_language
+                ):
+                    if item.get("finished"):
+                        item["queue_wait_ms"] = wait * 1000
+                    caller_loop.call_soon_threadsafe(items.put_nowait, item)
+            except Exception as e:
+                caller_loop.call_soon_threadsafe(items.put_nowait, e)
+            finally:
+                with self._stats_lock:
+                    self._running -= 1
+                caller_loop.call_soon_threadsafe(items.put_nowait, None)
+
+        self._executor.submit(produce)
+        while True:
+            item = await items.get()
+            if item is None:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    async def _next_request(self, timeout: Optional[float]) -> Optional[_Request]:
+        """优先取回上一轮因超出预算而留下的请求"""
+        if self._backlog:
+            return self._backlog.popleft()
+        if timeout is None:
+            return await self._queue.get()
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def _dispatch_loop(self):
+        while True:
+            first = await self._next_request(None)
+            batch = [first]
+            batch_tokens = first.tokens
+            deadline = self._loop.time() + self.max_wait
+
+            # 在等待窗口内继续收集同一语言对的请求，直到达到条数或 token 上限
+            deferred = []
+            while len(batch) < self.max_batch_size:
+                if self._queue.empty() and not self._backlog and self._producers <= 1:
+                    # 唯一的调用方已把请求全部放入队列，继续等待也不会有新请求加入
+                    break
+                request = await self._next_request(max(0.0, deadline - self._loop.time()))
+                if request is None:
+                    break
+                same_pair = (
+                    request.source_language == first.source_language
+                    and request.target_language == first.target_language
+                )
+                if not same_pair:
+                    deferred.append(request)
+                    continue
+                if batch_tokens + request.tokens > self.max_batch_tokens:
+                    deferred.append(request)
+                    break
+                batch.append(request)
+                batch_tokens += request.tokens
+            # 留到下一轮的请求放回队首，保持先来先服务
+            self._backlog.extendleft(reversed(deferred))
+
+            await self._run_batch(batch)
+
+    async def _run_batch(self, batch: List[_Request]):
+        now = time.perf_counter()
+        waits = [now - request.enqueued_at for request in batch]
+        with self._stats_lock:
+            self._requests += len(batch)
+            self._batches += 1
+            self._total_wait += sum(waits)
+            self._max_wait_seen = max(self._max_wait_seen, max(waits))
+
+        first = batch[0]
+        with self._stats_lock:
+            self._running += 1
+        try:
+            results = await self._loop.run_in_executor(
+                self._executor,
+                lambda: self.translator.translate_batch(
+                    [request.text for request in batch],
+                    source_language=first.source_language,
+                    target_language=first.target_language
+                )
+            )
+        except Exception as e:
+            logger.error(f"批量翻译失败 ({len(batch)} 条): {str(e)}")
+            for request in batch:
+                if not request.future.done():
+                    request.future.set_exception(e)
+            return
+        finally:
+            with self._stats_lock:
+                self._running -= 1
+
+        for request, result, wait in zip(batch, results, waits):
+            result["queue_wait_ms"] = wait * 1000
+            if not request.future.done():
+                request.future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取调度统计
+
+        Returns:
+            队列深度、批次数、平均批大小和排队等待时间
+        """
+        with self._stats_lock:
+            requests = self._requests
+            batches = self._batches
+            total_wait = self._total_wait
+            max_wait = self._max_wait_seen
+        return {
+            "queue_depth": self._queue.qsize() + len(self._backlog),
+            "requests": requests,
+            "batches": batches,
+            "avg_batch_size": requests / batches if batches else 0.0,
+            "avg_wait_ms": total_wait / requests * 1000 if requests else 0.0,
+            "max_wait_ms": max_wait * 1000
+        }
+
+    async def _stop_dispatcher(self):
+        self._dispatcher.cancel()
+        try:
+            await self._dispatcher
+        except asyncio.CancelledError:
+            pass
+
+    def shutdown(self):
+        """停止调度器"""
+        asyncio.run_coroutine_threadsafe(self._stop_dispatcher(), self._loop).result(timeout=5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,195 @@
+"""
+目标文字约束解码模块
+生成时按目标语言屏蔽或压低其他文字系统的 token（例如目标为韩文时的汉字），
+让模型第一次生成就使用目标语言，而不是生成完整回复后才被后处理剔除或判定失败
+"""
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import torch
+
+from script_detection import iter_line_stats
+
+logger = logging.getLogger(__name__)
+
+# 约束方式：off 不约束，bias 压低其他文字 token 的 logit，mask 直接屏蔽
+SCRIPT_CONSTRAINT_MODES = ("off", "bias", "mask")
+
+# 参与约束的文字（ScriptStats 的字段名）；拉丁字母、数字、标点和空白始终允许
+CONSTRAINED_SCRIPTS = ("han", "hangul", "kana")
+
+# 各目标语言不允许出现的文字，未列出的目标语言不允许任何 CJK 文字
+BLOCKED_SCRIPTS = {
+    "Chinese": ("hangul", "kana"),
+    "Japanese": ("hangul",),
+    "Korean": ("han", "kana"),
+}
+DEFAULT_BLOCKED_SCRIPTS = CONSTRAINED_SCRIPTS
+
+# 目标语言与中文共用的文字：在回复中出现目标特有的文字之前压低这些 token，
+# 否则以汉字开头的回复容易整段变成中文。值为 (压低的文字, 目标特有的文字)
+LEADING_SCRIPTS = {
+    "Japanese": (("han",), "kana"),
+}
+
+
+class TokenScripts:
+    """
+    词表中含有各类 CJK 文字的 token
+
+    按单个 token 解码后分类；由多个字节 token 拼出的字符无法单独识别，不受约束。
+    """
+
+    def __init__(self, tokenizer):
+        """
+        逐个解码词表中的 token 并分类（每个 tokenizer 只需一次）
+
+        Args:
+            tokenizer: 模型的 tokenizer
+        """
+        texts = []
+        for token_id in range(len(tokenizer)):
+            try:
+                text = tokenizer.decode([token_id])
+            except Exception:
+                text = ""
+            texts.append(text.replace("\n", " "))
+        self.ids: Dict[str, List[int]] = {script: [] for script in CONSTRAINED_SCRIPTS}
+        for token_id, (_, stats) in enumerate(iter_line_stats("\n".join(texts))):
+            for script in CONSTRAINED_SCRIPTS:
+                if getattr(stats, script):
+                    self.ids[script].append(token_id)
+        self._masks = {}
+        self._lock = threading.Lock()
+        logger.info(
+            "词表文字分类完成: " + "，".join(f"{script} {len(ids)}" for script, ids in self.ids.items())
+        )
+
+    def mask(self, scripts: Tuple[str, ...], scores: torch.Tensor) -> torch.Tensor:
+        """
+        含有任一指定文字的 token 掩码
+
+        Args:
+            scripts: 文字名称
+            scores: logits，用于确定掩码的长度和设备（模型词表可能比 tokenizer 大）
+
+        Returns:
+            形状为 [词表大小] 的 bool 张量
+        """
+        key = (scripts, scores.shape[-1], scores.device)
+        mask = self._masks.get(key)
+        if mask is None:
+            with self._lock:
+                mask = torch.zeros(scores.shape[-1], dtype=torch.bool)
+                for script in scripts:
+                    ids = [token_id for token_id in self.ids[script] if token_id < scores.shape[-1]]
+                    mask[ids] = True
+                mask = mask.to(scores.device)
+                self._masks[key] = mask
+        return mask
+
+
+class ScriptLogitsProcessor:
+    """
+    按目标语言约束解码的 logits 处理器
+
+    以 LogitsProcessorList([processor]) 传给 generate、model.chat 或 model.stream_chat；
+    连续批处理引擎对单行调用 apply 和 observe。
+    """
+
+    def __init__(
+        self,
+        token_scripts: TokenScripts,
+        blocked: Tuple[str, ...],
+        leading: Tuple[str, ...],
+        marker: Optional[str],
+        mode: str,
+        bias: float
+    ):
+        """
+        Args:
+            token_scripts: 词表分类
+            blocked: 不允许出现的文字
+            leading: 出现 marker 文字之前压低的文字
+            marker: 目标语言特有的文字
+            mode: bias 或 mask（只影响 blocked，leading 总是压低）
+            bias: 压低时 logit 的减少量
+        """
+        self.token_scripts = token_scripts
+        self.blocked = blocked
+        self.leading = leading
+        self.marker_ids = set(token_scripts.ids[marker]) if marker else set()
+        self.mode = mode
+        self.bias = bias
+        self.reset()
+
+    def reset(self):
+        """清空各行的状态，用于重新生成"""
+        self.started = []
+        self._first_call = True
+
+    def observe(self, row: int, token: int):
+        """记录该行新生成的 token"""
+        while len(self.started) <= row:
+            self.started.append(False)
+        if not self.started[row] and token in self.marker_ids:
+            self.started[row] = True
+
+    def apply(self, scores: torch.Tensor) -> torch.Tensor:
+        """
+        约束一批 logits
+
+        Args:
+            scores: 形状为 [行数, 词表大小] 的 logits
+
+        Returns:
+            约束后的 logits
+        """
+        if self.blocked:
+            mask = self.token_scripts.mask(self.blocked, scores)
+            if self.mode == "mask":
+                scores = scores.masked_fill(mask, float("-inf"))
+            else:
+                scores = scores - mask.to(scores.dtype) * self.bias
+        if self.leading:
+            rows = [row for row in range(scores.shape[0]) if not (row < len(self.started) and self.started[row])]
+            if rows:
+                mask = self.token_scripts.mask(self.leading, scores).to(scores.dtype) * self.bias
+                scores = scores.clone()
+                scores[rows] -= mask
+        return scores
+
+    def __call__(self, input_ids, scores):
+        # 第一次调用时 input_ids 只有提示词，之后每次的最后一列是上一步生成的 token
+        if self._first_call:
+            self._first_call = False
+        elif self.leading:
+            for row, token in enumerate(input_ids[:, -1].tolist()):
+                self.observe(row, token)
+        return self.apply(scores)
+
+
+def script_processor(
+    token_scripts: TokenScripts,
+    target_language: str,
+    mode: str,
+    bias: float
+) -> Optional[ScriptLogitsProcessor]:
+    """
+    创建目标语言的约束处理器
+
+    Args:
+        token_scripts: 词表分类
+        target_language: 目标语言
+        mode: 约束方式（见 SCRIPT_CONSTRAINT_MODES）
+        bias: bias 模式下 logit 的减少量
+
+    Returns:
+        处理器，mode 为 off 时返回 None
+    """
+    if mode == "off":
+        return None
+    blocked = BLOCKED_SCRIPTS.get(target_language, DEFAULT_BLOCKED_SCRIPTS)
+    leading, marker = LEADING_SCRIPTS.get(target_language, ((), None))
+    return ScriptLogitsProcessor(token_scripts, blocked, leading, marker, mode, bias)
@@ -0,0 +1,176 @@
+"""
+文字系统识别模块
+用预先计算的码位映射表一次性统计文本中各类文字的数量，替代逐字符的范围比较
+"""
+import re
+import string
+from typing import Dict, Iterator, Tuple
+
+# 各类文字的码位范围
+HANGUL_RANGES = [(0xAC00, 0xD7A3), (0x1100, 0x11FF), (0x3130, 0x318F)]
+KANA_RANGES = [(0x3040, 0x309F), (0x30A0, 0x30FF), (0x31F0, 0x31FF), (0xFF66, 0xFF9F)]
+HAN_RANGES = [(0x4E00, 0x9FFF), (0x3400, 0x4DBF), (0xF900, 0xFAFF)]
+LATIN_EXT_RANGES = [(0x00C0, 0x024F), (0x1E00, 0x1EFF)]
+CJK_PUNCT_RANGES = [(0x3001, 0x303F), (0xFF01, 0xFF65), (0x2010, 0x2027), (0x2030, 0x205E)]
+UNICODE_SPACES = [0x00A0, 0x3000, 0x202F, 0x205F] + list(range(0x2000, 0x200B))
+
+# 单字符分类码：ASCII 字符全部被映射，所以未映射的字符一定是非 ASCII 的“其他”文字
+_ASCII_LETTER, _ASCII_DIGIT, _ASCII_SPACE, _ASCII_PUNCT = "A", "D", "S", "P"
+_LATIN_EXT, _HANGUL, _KANA, _HAN, _CJK_PUNCT, _UNICODE_SPACE = "L", "H", "K", "C", "Q", "W"
+
+
+def _build_table() -> Dict[int, str]:
+    table = {}
+    for c in string.ascii_letters:
+        table[ord(c)] = _ASCII_LETTER
+    for c in string.digits:
+        table[ord(c)] = _ASCII_DIGIT
+    for c in string.punctuation:
+        table[ord(c)] = _ASCII_PUNCT
+    for c in " \t\r\x0b\x0c":
+        table[ord(c)] = _ASCII_SPACE
+    # 换行保留原样，便于按行切分分类结果
+    for code in range(0x80):
+        table.setdefault(code, _ASCII_PUNCT if code != 0x0A else "\n")
+    for ranges, code in (
+        (LATIN_EXT_RANGES, _LATIN_EXT),
+        (HANGUL_RANGES, _HANGUL),
+        (KANA_RANGES, _KANA),
+        (HAN_RANGES, _HAN),
+        (CJK_PUNCT_RANGES, _CJK_PUNCT),
+    ):
+        for start, end in ranges:
+            for codepoint in range(start, end + 1):
+                table[codepoint] = code
+    for codepoint in UNICODE_SPACES:
+        table[codepoint] = _UNICODE_SPACE
+    return table
+
+
+_TABLE = _build_table()
+
+
+def _char_class(ranges) -> str:
+    return "".join(f"\\u{start:04x}-\\u{end:04x}" for start, end in ranges)
+
+
+HANGUL_RE = re.compile(f"[{_char_class(HANGUL_RANGES)}]")
+KANA_RE = re.compile(f"[{_char_class(KANA_RANGES)}]")
+HAN_RE = re.compile(f"[{_char_class(HAN_RANGES)}]")
+
+
+class ScriptStats:
+    """
+    文本的文字系统直方图
+
+    各项计数在访问时才从分类码中统计（每项一次 C 层面的 str.count），
+    只关心少数几类字符的逐行检查不必为其余类别付出代价。
+    """
+
+    __slots__ = ("_text", "_codes")
+
+    def __init__(self, text: str, codes: str):
+        self._text = text
+        self._codes = codes
+
+    @property
+    def hangul(self) -> int:
+        return self._codes.count(_HANGUL)
+
+    @property
+    def kana(self) -> int:
+        return self._codes.count(_KANA)
+
+    @property
+    def han(self) -> int:
+        return self._codes.count(_HAN)
+
+    @property
+    def latin(self) -> int:
+        return self._codes.count(_ASCII_LETTER) + self._codes.count(_LATIN_EXT)
+
+    @property
+    def digit(self) -> int:
+        return self._codes.count(_ASCII_DIGIT)
+
+    @property
+    def space(self) -> int:
+        codes = self._codes
+        return codes.count(_ASCII_SPACE) + codes.count("\n") + codes.count(_UNICODE_SPACE)
+
+    @property
+    def punct(self) -> int:
+        return self._codes.count(_ASCII_PUNCT) + self._codes.count(_CJK_PUNCT)
+
+    @property
+    def non_ascii(self) -> int:
+        """非 ASCII 且非空白的字符数"""
+        text = self._text
+        return len(text) - len(text.encode("ascii", "ignore")) - self._codes.count(_UNICODE_SPACE)
+
+    @property
+    def other(self) -> int:
+        """未归入任何类别的非 ASCII 字符数（西里尔、阿拉伯、泰文等）"""
+        return self.non_ascii - self.hangul - self.kana - self.han - self._codes.count(_LATIN_EXT) \
+            - self._codes.count(_CJK_PUNCT)
+
+    @property
+    def total(self) -> int:
+        return len(self._codes)
+
+    def ratio(self, field: str) -> float:
+        """某类字符占全部非空白字符的比例"""
+        visible = self.total - self.space
+        return getattr(self, field) / visible if visible else 0.0
+
+    def as_dict(self) -> Dict[str, int]:
+        return {
+            field: getattr(self, field)
+            for field in ("hangul", "kana", "han", "latin", "digit", "space", "punct", "other", "non_ascii", "total")
+        }
+
+    def __repr__(self):
+        return f"ScriptStats({self.as_dict()})"
+
+
+def script_stats(text: str) -> ScriptStats:
+    """
+    统计文本中各类文字的数量
+
+    Args:
+        text: 文本
+
+    Returns:
+        文字系统直方图
+    """
+    return ScriptStats(text, text.translate(_TABLE))
+
+
+def iter_line_stats(text: str) -> Iterator[Tuple[str, ScriptStats]]:
+    """
+    对整段文本只做一次分类，然后按行返回各行的直方图
+
+    Args:
+        text: 多行文本
+
+    Yields:
+        (原始行, 该行的文字系统直方图)
+    """
+    codes = text.translate(_TABLE)
+    for line, line_codes in zip(text.split("\n"), codes.split("\n")):
+        yield line, ScriptStats(line, line_codes)
+
+
+def has_hangul(text: str) -> bool:
+    """是否包含韩文字符"""
+    return HANGUL_RE.search(text) is not None
+
+
+def has_kana(text: str) -> bool:
+    """是否包含日文假名"""
+    return KANA_RE.search(text) is not None
+
+
+def has_han(text: str) -> bool:
+    """是否包含汉字"""
+    return HAN_RE.search(text) is not None
@@ -0,0 +1,216 @@
+"""
+翻译前分段过滤模块
+在调用模型之前识别不需要翻译的分段（页码、网址、代码、参考文献、公式、已是目标语言的文本），
+由调用方原样保留，省去这些分段的模型调用
+"""
+import re
+import threading
+from typing import Dict, Any, Optional
+
+from script_detection import script_stats
+
+# 跳过原因
+BYPASS_NO_TEXT = "no_text"
+BYPASS_PAGE_NUMBER = "page_number"
+BYPASS_URL = "url"
+BYPASS_TARGET_LANGUAGE = "target_language"
+BYPASS_FORMULA = "formula"
+BYPASS_REFERENCES = "references"
+BYPASS_CODE = "code"
+BYPASS_REASONS = (
+    BYPASS_NO_TEXT, BYPASS_PAGE_NUMBER, BYPASS_URL, BYPASS_TARGET_LANGUAGE,
+    BYPASS_FORMULA, BYPASS_REFERENCES, BYPASS_CODE
+)
+
+# 各语言的文字（ScriptStats 的字段名），未列出的语言视为拉丁字母
+LANGUAGE_SCRIPTS = {
+    "Chinese": "han",
+    "Japanese": "kana",
+    "Korean": "hangul",
+    "Russian": "other",
+    "Arabic": "other",
+    "Thai": "other",
+    "Hindi": "other",
+}
+# 目标语言文字占全部文字的比例达到多少视为已是目标语言
+TARGET_SCRIPT_RATIO = 0.7
+
+# 页码：12、- 12 -、3 / 10、Page 3 of 10、p. 12、xiv。
+# 罗马数字只接受全小写或全大写、由 i/v/x 组成（前言页码不超过 xxxix），
+# 避免把 Mix、CD 这类单词当作页码；单独的大写 I 是英文单词，不算页码
+_PAGE_NUMBER_RE = re.compile(
+    r"^(?!I$)(?:page|p\.|pg\.)?\s*[-–—]?\s*"
+    r"(?:\d+|(?-i:(?=[ivx])x{0,3}(?:ix|iv|v?i{0,3}))|(?-i:(?=[IVX])X{0,3}(?:IX|IV|V?I{0,3})))"
+    r"\s*[-–—]?\s*(?:(?:/|of)\s*\d+)?$",
+    re.IGNORECASE
+)
+_URL_RE = re.compile(r"^<?(?:(?:https?|ftp)://|www\.)\S+$|^<?[\w.+-]+@[\w-]+\.[\w.-]+>?$", re.IGNORECASE)
+_SEPARATOR_RE = re.compile(r"^[-–—|•·,;:()\[\]<>]+$")
+
+# 公式：没有三个字母以上的单词（数学函数名除外），且含有运算符
+_WORD_RE = re.compile(r"[A-Za-z]{3,}")
+_MATH_FUNCTIONS = {"sin", "cos", "tan", "log", "exp", "max", "min", "lim", "sup", "inf", "det", "sqrt", "mod", "arg"}
+_MATH_OPERATOR_RE = re.compile(r"[=+*/^<>≤≥≈≠±×÷∑∏∫√∞∂∇∈∉⊂⊆∪∩→←⇒⇔]|(?<=\w)-(?=\w)")
+
+# 代码：括号调用、分号、花括号、比较和赋值运算符、函数定义、行首关键字等标记相对单词数的密度，
+# 并且要有多行结构（至少 CODE_MIN_LINES 行含标记或缩进）；文字块内的折行会被拼接成一行，
+# 没有多行结构时需要 CODE_SINGLE_LINE_MIN_MARKS 个标记，避免把含括号、分号的普通句子当作代码
+_CODE_MARK_RE = re.compile(
+    r"\w\(|\w\[|[{};]|==|!=|<=|>=|=>|->|::|\+\+|--|&&|\|\||\+=|-=|:=|\)\s*:|(?<![=!<>+\-*/:])=(?![=>])|"
+    r"\b(?:def|class|func|fn)\s+\w+\s*[(:]|"
+    r"^\s*(?:def|class|import|from|return|package|public|private|protected|static|void|func|fn|var|let|const|"
+    r"#include|#define|@\w+)\b",
+    re.MULTILINE
+)
+_IDENTIFIER_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+_INDENT_RE = re.compile(r"^(?: {2,}|\t)\S")
+CODE_MIN_MARKS = 3
+CODE_MARK_RATIO = 0.4
+CODE_MIN_LINES = 3
+CODE_SINGLE_LINE_MIN_MARKS = 8
+
+# 参考文献：按条目编号或“姓, 名首字母.”切分条目，短条目中同时有年份和文献特征的视为参考文献
+_REFERENCE_HEADING_RE = re.compile(
+    r"^\s*(?:references|bibliography|works cited|literature cited|参考文献|参考資料|참고문헌)\s*$",
+    re.IGNORECASE | re.MULTILINE
+)
+_REFERENCE_ENTRY_RE = re.compile(
+    r"(?m)^\s*(?=\[\d+\]\s|\d+\.\s+[A-Z]|[A-Z][A-Za-z'’\-]+,\s+(?:[A-Z]\.\s*)+)"
+)
+_REFERENCE_START_RE = re.compile(r"^\s*(?:\[\d+\]\s|\d+\.\s+[A-Z]|[A-Z][A-Za-z'’\-]+,\s+(?:[A-Z]\.\s*)+|[A-Z]\.\s)")
+_YEAR_RE = re.compile(r"\b(?:19|20)\d{2}[a-z]?\b")
+_CITATION_RE = re.compile(
+    r"et al\.|\b(?:doi|DOI)\b|arXiv|\bpp\.\s*\d|\b[Vv]ol\.\s*\d|\bProc\.|Proceedings|\bIn:|Journal|Press|ISBN|"
+    r"https?://|\b[A-Z]\.\s*(?:[A-Z]\.\s*)?[A-Z][a-z]+"
+)
+REFERENCE_MAX_ENTRY_CHARS = 600
+REFERENCE_MIN_RATIO = 0.7
+
+
+def classify_segment(text: str, source_language: str, target_language: str) -> Optional[str]:
+    """
+    判断分段是否不需要翻译
+
+    Args:
+        text: 分段文本
+        source_language: 源语言
+        target_language: 目标语言
+
+    Returns:
+        跳过原因（BYPASS_REASONS 之一），需要翻译时返回 None
+    """
+    text = text.strip()
+    if not any(char.isalpha() for char in text):
+        return BYPASS_NO_TEXT
+    if _PAGE_NUMBER_RE.match(text):
+        return BYPASS_PAGE_NUMBER
+    tokens = text.split()
+    if any(_URL_RE.match(token) for token in tokens) and all(
+        _URL_RE.match(token) or _SEPARATOR_RE.match(token) for token in tokens
+    ):
+        return BYPASS_URL
+    if _in_target_language(text, source_language, target_language):
+        return BYPASS_TARGET_LANGUAGE
+    if _is_formula(text):
+        return BYPASS_FORMULA
+    if _is_references(text):
+        return BYPASS_REFERENCES
+    if _is_code(text):
+        return BYPASS_CODE
+    return None
+
+
+def _in_target_language(text: str, source_language: str, target_language: str) -> bool:
+    """目标语言的文字占多数，且没有非拉丁字母的源语言文字（两者文字相同时无法判断）"""
+    target_script = LANGUAGE_SCRIPTS.get(target_language, "latin")
+    source_script = LANGUAGE_SCRIPTS.get(source_language, "latin")
+    if target_script == source_script:
+        return False
+    stats = script_stats(text)
+    letters = stats.han + stats.kana + stats.hangul + stats.latin + stats.other
+    if not letters:
+        return False
+    # 拉丁字母的术语、缩写常夹在其他语言中，只对非拉丁字母的源语言要求完全没有源语言文字
+    if source_script != "latin" and _script_count(stats, source_script):
+        return False
+    if target_script == "han" and (stats.kana or stats.hangul):
+        return False
+    return _script_count(stats, target_script) / letters >= TARGET_SCRIPT_RATIO
+
+
+def _script_count(stats, script: str) -> int:
+    # 日文由假名和汉字组成，出现假名时两者都算作日文
+    if script == "kana":
+        return stats.kana + stats.han if stats.kana else 0
+    return getattr(stats, script)
+
+
+def _is_formula(text: str) -> bool:
+    words = [word for word in _WORD_RE.findall(text) if word.lower() not in _MATH_FUNCTIONS]
+    return not words and _MATH_OPERATOR_RE.search(text) is not None
+
+
+def _is_references(text: str) -> bool:
+    """绝大部分文字属于参考文献条目（可以有 References 等标题）"""
+    body = _REFERENCE_HEADING_RE.sub("", text, count=1).strip()
+    if not body:
+        return False
+    reference_chars = 0
+    for entry in _REFERENCE_ENTRY_RE.split(body):
+        entry = entry.strip()
+        if (
+            entry
+            and len(entry) <= REFERENCE_MAX_ENTRY_CHARS
+            and _REFERENCE_START_RE.match(entry)
+            and _YEAR_RE.search(entry)
+            and _CITATION_RE.search(entry)
+        ):
+            reference_chars += len(entry)
+    return reference_chars >= REFERENCE_MIN_RATIO * len(body)
+
+
+def _is_code(text: str) -> bool:
+    identifiers = len(_IDENTIFIER_RE.findall(text))
+    marks = len(_CODE_MARK_RE.findall(text))
+    if marks < CODE_MIN_MARKS or marks < CODE_MARK_RATIO * identifiers:
+        return False
+    structured_lines = sum(
+        1 for line in text.splitlines() if line.strip() and (_CODE_MARK_RE.search(line) or _INDENT_RE.match(line))
+    )
+    return structured_lines >= CODE_MIN_LINES or marks >= CODE_SINGLE_LINE_MIN_MARKS
+
+
+class BypassStats:
+    """汇总一份文档各分段的过滤结果（线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.segments = 0
+        self.bypassed = 0
+        self.reasons = {reason: 0 for reason in BYPASS_REASONS}
+
+    def add(self, reason: Optional[str]):
+        """
+        记录一个分段的过滤结果
+
+        Args:
+            reason: 跳过原因，需要翻译时为 None
+        """
+        with self._lock:
+            self.segments += 1
+            if reason is not None:
+                self.bypassed += 1
+                self.reasons[reason] += 1
+
+    def as_dict(self) -> Dict[str, Any]:
+        """
+        Returns:
+            segments（分段总数）、bypassed（跳过的分段数）、bypass_ratio、reasons（各原因的分段数）
+        """
+        with self._lock:
+            return {
+                "segments": self.segments,
+                "bypassed": self.bypassed,
+                "bypass_ratio": self.bypassed / self.segments if self.segments else 0.0,
+                "reasons": {reason: count for reason, count in self.reasons.items() if count}
+            }
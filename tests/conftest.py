@@ -0,0 +1,53 @@
+"""
+测试公共配置：把仓库根目录加入导入路径，并在导入 config 之前关闭会读写磁盘的默认功能
+"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ.setdefault("TRANSLATION_MEMORY_ENABLED", "False")
+os.environ.setdefault("PDF_CHECKPOINT_ENABLED", "False")
+os.environ.setdefault("MODEL_CACHE_ENABLED", "False")
+os.environ.setdefault("MODEL_MMAP_WEIGHTS", "False")
+
+
+def _char_tokenizer():
+    """按字符切分的小词表 tokenizer（不需要下载任何文件）"""
+    from tokenizers import Tokenizer, decoders, models, pre_tokenizers
+    from transformers import PreTrainedTokenizerFast
+
+    chars = [chr(code) for code in range(32, 127)] + list("你好世界")
+    vocab = {"<unk>": 0, "<pad>": 1, "<eos>": 2}
+    for char in chars:
+        vocab.setdefault(char, len(vocab))
+    backend = Tokenizer(models.WordLevel(vocab, unk_token="<unk>"))
+    backend.pre_tokenizer = pre_tokenizers.Split("", behavior="isolated")
+    backend.decoder = decoders.Fuse()
+    return PreTrainedTokenizerFast(
+        tokenizer_object=backend, unk_token="<unk>", pad_token="<pad>", eos_token="<eos>"
+    )
+
+
+@pytest.fixture
+def tiny_translator():
+    """使用随机初始化的单层 GPT-2 和字符 tokenizer 的 ChatGLMTranslator"""
+    torch = pytest.importorskip("torch")
+    pytest.importorskip("transformers")
+    from transformers import GPT2Config, GPT2LMHeadModel
+    from translator import ChatGLMTranslator
+
+    class TinyTranslator(ChatGLMTranslator):
+        def _load_model(self):
+            torch.manual_seed(0)
+            self.tokenizer = _char_tokenizer()
+            self.model = GPT2LMHeadModel(GPT2Config(
+                vocab_size=len(self.tokenizer), n_positions=512, n_embd=16, n_layer=1, n_head=2,
+                eos_token_id=self.tokenizer.eos_token_id, pad_token_id=self.tokenizer.pad_token_id
+            ))
+            self.model.eval()
+
+    return TinyTranslator(model_path="tiny", device="cpu", memory=None, lazy=False)
@@ -0,0 +1,85 @@
+"""断点续传检查点：记录、恢复、并发任务和中断写入"""
+import pytest
+
+from checkpoint import TranslationCheckpoint
+
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    # 检查点只按文件内容哈希，不需要是合法的 PDF
+    path = tmp_path / "input.pdf"
+    path.write_bytes(b"%PDF-1.4 test document")
+    return str(path)
+
+
+def _checkpoint(pdf_path, tmp_path, **kwargs):
+    return TranslationCheckpoint(pdf_path, "English", "Chinese", checkpoint_dir=str(tmp_path / "ckpt"), **kwargs)
+
+
+def _page(number):
+    return {"page_number": number, "translated_text": f"第 {number} 页"}
+
+
+def test_record_and_resume(pdf_path, tmp_path):
+    checkpoint = _checkpoint(pdf_path, tmp_path)
+    checkpoint.record(_page(1))
+    checkpoint.record(_page(2))
+    # 模拟进程中断：没有 remove，只释放槽位
+    checkpoint.close()
+
+    resumed = _checkpoint(pdf_path, tmp_path)
+    assert resumed.path == checkpoint.path
+    assert sorted(resumed.load()) == [1, 2]
+    resumed.remove()
+
+    assert _checkpoint(pdf_path, tmp_path).load() == {}
+
+
+def test_layout_mode_is_separate(pdf_path, tmp_path):
+    reflow = _checkpoint(pdf_path, tmp_path)
+    reflow.record(_page(1))
+    blocks = _checkpoint(pdf_path, tmp_path, layout_mode="blocks")
+    assert blocks.load() == {}
+
+
+def test_torn_last_line_is_truncated(pdf_path, tmp_path):
+    checkpoint = _checkpoint(pdf_path, tmp_path)
+    checkpoint.record(_page(1))
+    checkpoint.close()
+    with open(checkpoint.path, "a", encoding="utf-8") as f:
+        f.write('{"page_number": 2, "transl')
+
+    resumed = _checkpoint(pdf_path, tmp_path)
+    assert sorted(resumed.load()) == [1]
+    resumed.record(_page(3))
+    assert sorted(resumed.load()) == [1, 3]
+
+
+def test_torn_only_line_is_truncated(pdf_path, tmp_path):
+    checkpoint = _checkpoint(pdf_path, tmp_path)
+    checkpoint.close()
+    with open(checkpoint.path, "w", encoding="utf-8") as f:
+        f.write('{"page_number": 1')
+
+    resumed = _checkpoint(pdf_path, tmp_path)
+    assert resumed.load() == {}
+    resumed.record(_page(1))
+    assert sorted(resumed.load()) == [1]
+
+
+def test_concurrent_jobs_do_not_share_progress(pdf_path, tmp_path):
+    first = _checkpoint(pdf_path, tmp_path)
+    second = _checkpoint(pdf_path, tmp_path)
+    assert first.path != second.path
+
+    first.record(_page(1))
+    second.record(_page(2))
+    first.remove()
+    assert sorted(second.load()) == [2]
+
+    # 第二个任务中断后重新运行，接着使用它的槽位而不是已清空的第一个
+    second.close()
+    resumed = _checkpoint(pdf_path, tmp_path)
+    assert resumed.path == second.path
+    assert sorted(resumed.load()) == [2]
+    assert _checkpoint(pdf_path, tmp_path).load() == {}
@@ -0,0 +1,84 @@
+"""按段落、句子边界和 token 预算分段"""
+import pytest
+
+from chunker import estimate_tokens, split_text
+
+
+def _count_chars(text):
+    return len(text)
+
+
+def _squash(text):
+    return "".join(text.split())
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("", 0),
+    ("abcd", 1),
+    ("abcde", 2),
+    ("你好世界", 4),
+    ("こんにちは", 5),
+    ("안녕", 2),
+    ("你好 abcd", 4),
+])
+def test_estimate_tokens(text, expected):
+    assert estimate_tokens(text) == expected
+
+
+@pytest.mark.parametrize("text", ["", "   ", "\n\n\t"])
+def test_empty_text(text):
+    assert split_text(text, 10) == []
+
+
+def test_short_text_is_one_chunk():
+    assert split_text("  Hello world.  \n", 100) == ["Hello world."]
+
+
+def test_splits_on_paragraphs_first():
+    first = "First paragraph. It has two sentences."
+    second = "Second paragraph. Also two sentences."
+    chunks = split_text(f"{first}\n\n{second}", 45, _count_chars)
+    assert chunks == [first, second]
+
+
+def test_splits_long_paragraph_on_sentences():
+    sentences = [f"Sentence number {i} is here." for i in range(6)]
+    chunks = split_text(" ".join(sentences), 60, _count_chars)
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert chunk.endswith(".")
+        assert len(chunk) <= 60
+    assert " ".join(chunks) == " ".join(sentences)
+
+
+def test_splits_cjk_sentences_without_spaces():
+    text = "今天天气很好。我们去公园散步吧！你觉得怎么样？"
+    chunks = split_text(text, 10, _count_chars)
+    assert chunks == ["今天天气很好。", "我们去公园散步吧！", "你觉得怎么样？"]
+
+
+def test_hard_splits_a_single_long_word():
+    word = "x" * 25
+    chunks = split_text(word, 10, _count_chars)
+    assert chunks == ["x" * 10, "x" * 10, "x" * 5]
+
+
+def test_packs_units_up_to_budget():
+    # 六个 10 字符的句子，句子之间的空格计入后一句，预算 33 时每块放三句
+    sentences = ["Abcdefghi." for _ in range(6)]
+    chunks = split_text(" ".join(sentences), 33, _count_chars)
+    assert chunks == [" ".join(sentences[:3]), " ".join(sentences[3:])]
+
+
+@pytest.mark.parametrize("max_tokens", [1, 5, 20, 200])
+def test_chunks_fit_budget_and_keep_all_text(max_tokens):
+    text = (
+        "Translation quality depends on context. Long pages are split;\n"
+        "each chunk keeps whole sentences when possible!\n\n"
+        "第二段落包含中文句子。还有一句？\n"
+        "Supercalifragilisticexpialidocious words are split by characters."
+    )
+    chunks = split_text(text, max_tokens)
+    assert all(chunk and chunk == chunk.strip() for chunk in chunks)
+    assert all(estimate_tokens(chunk) <= max(max_tokens, 1) for chunk in chunks)
+    assert _squash("".join(chunks)) == _squash(text)
@@ -0,0 +1,57 @@
+"""连续批处理引擎的错误处理"""
+import pytest
+
+pytest.importorskip("torch")
+
+from continuous_batching import ContinuousBatchingEngine
+
+
+@pytest.fixture
+def engine(tiny_translator):
+    engine = ContinuousBatchingEngine(tiny_translator, max_batch_size=4, max_length=96)
+    yield engine
+    engine.shutdown()
+
+
+def test_translate_batch_returns_one_result_per_text(engine):
+    results = engine.translate_batch(["Hello", "This is a test.", ""])
+    assert len(results) == 3
+    assert results[2]["success"] is False
+
+
+def test_admission_error_fails_the_admitted_sequence(engine, monkeypatch):
+    # 停止解码线程，在测试线程中逐条放入批次
+    engine.shutdown()
+    short = engine._submit("Hi", "English", "Chinese")
+    long = engine._submit("A much longer sentence that needs padding.", "English", "Chinese")
+    sequences = [engine._queue.get_nowait(), engine._queue.get_nowait()]
+    monkeypatch.setattr(engine, "_append_token", lambda sequence, token: False)
+    engine._admit(sequences[0])
+    assert engine._active_rows() == 1
+
+    # 第二条的提示词更长，放入批次时需要左侧填充已有的批次
+    def broken_pad(length):
+        raise RuntimeError("pad failed")
+
+    monkeypatch.setattr(engine, "_pad_batch", broken_pad)
+    with pytest.raises(RuntimeError):
+        engine._admit(sequences[1])
+    result = long.result(timeout=0)
+    assert result["success"] is False
+    assert "pad failed" in result["error"]
+    assert not short.done()
+
+
+def test_engine_recovers_after_admission_error(engine, monkeypatch):
+    calls = []
+
+    def broken_insert(*args):
+        calls.append(args)
+        raise RuntimeError("insert failed")
+
+    monkeypatch.setattr(engine, "_insert", broken_insert)
+    result = engine._submit("Hello", "English", "Chinese").result(timeout=30)
+    assert result["success"] is False and "insert failed" in result["error"]
+
+    monkeypatch.undo()
+    assert "success" in engine.translate("Hello again")
@@ -0,0 +1,127 @@
+"""生成预算、重复循环检测和生成统计"""
+import pytest
+
+import config
+from generation_budget import (
+    DEFAULT_EXPANSION_RATIO,
+    EXPANSION_RATIOS,
+    GenerationCriteria,
+    GenerationStats,
+    RepetitionDetector,
+    STOP_BUDGET,
+    STOP_EOS,
+    STOP_REPETITION,
+    generation_budget,
+    generation_stats,
+)
+
+
+@pytest.fixture
+def budget_config(monkeypatch):
+    monkeypatch.setattr(config, "GENERATION_BUDGET_ENABLED", True)
+    monkeypatch.setattr(config, "GENERATION_BUDGET_MARGIN", 1.5)
+    monkeypatch.setattr(config, "GENERATION_BUDGET_MIN_TOKENS", 16)
+    monkeypatch.setattr(config, "MAX_LENGTH", 2048)
+
+
+def test_budget_scales_with_target_language(budget_config):
+    assert generation_budget(100, "Chinese") == 100 * EXPANSION_RATIOS["Chinese"] * 1.5 + 16
+    assert generation_budget(100, "Korean") == 100 * EXPANSION_RATIOS["Korean"] * 1.5 + 16
+    assert generation_budget(100, "Klingon") == 100 * DEFAULT_EXPANSION_RATIO * 1.5 + 16
+
+
+def test_budget_is_capped_by_remaining_length(budget_config):
+    assert generation_budget(1000, "Korean", prompt_tokens=1500) == 548
+    assert generation_budget(10, "Chinese", prompt_tokens=100, max_length=110) == 10
+    assert generation_budget(10, "Chinese", prompt_tokens=500, max_length=100) == 1
+
+
+def test_budget_disabled_uses_remaining_length(budget_config, monkeypatch):
+    monkeypatch.setattr(config, "GENERATION_BUDGET_ENABLED", False)
+    assert generation_budget(10, "Chinese", prompt_tokens=48) == 2000
+
+
+def _feed(detector, tokens):
+    return [detector.update(token) for token in tokens]
+
+
+def test_detector_ignores_normal_text():
+    detector = RepetitionDetector(8)
+    assert not any(_feed(detector, list(range(200))))
+
+
+def test_detector_finds_single_token_loop():
+    detector = RepetitionDetector(8)
+    flags = _feed(detector, [1, 2, 3] + [7] * 9)
+    assert flags[-1] and not any(flags[:-1])
+    assert detector.repeated == 8
+
+
+def test_detector_finds_phrase_loop():
+    detector = RepetitionDetector(8)
+    phrase = [10, 11, 12, 13]
+    flags = _feed(detector, [1, 2] + phrase * 3)
+    assert flags[-1] and not any(flags[:-1])
+    # 第一次出现的短语保留，之后的两个副本可以丢弃
+    assert detector.repeated == 8
+
+
+def test_detector_needs_two_full_repeats():
+    # 较长的单元只重复一遍时不判定为循环
+    detector = RepetitionDetector(4)
+    phrase = list(range(20, 30))
+    assert not any(_feed(detector, phrase * 2))
+    assert not _feed(detector, phrase[:5])[-1]
+
+
+def _step(criteria, column):
+    torch = pytest.importorskip("torch")
+    return criteria(torch.tensor([[token] for token in column]))
+
+
+def test_criteria_stops_each_row_for_its_own_reason():
+    criteria = GenerationCriteria([3, 100, 100], eos_token_ids=[0], repetition_tokens=4)
+    steps = [
+        [5, 6, 7],
+        [5, 0, 7],
+        [5, 9, 7],
+        [5, 9, 7],
+        [5, 9, 7],
+    ]
+    for column in steps:
+        done = _step(criteria, column)
+    assert criteria.reasons == [STOP_BUDGET, STOP_EOS, STOP_REPETITION]
+    assert criteria.generated == [3, 1, 5]
+    assert criteria.kept_tokens(2) == 1 and criteria.wasted_tokens(2) == 4
+    assert criteria.kept_ids(2) == [7]
+    if criteria.per_row:
+        assert done.tolist() == [True, True, True]
+    else:
+        assert done is True
+
+
+def test_criteria_row_stats_and_reset():
+    criteria = GenerationCriteria([2], eos_token_ids=[0], repetition_tokens=0)
+    _step(criteria, [5])
+    assert criteria.row_stats() == generation_stats(1, 0, 2, STOP_BUDGET)
+    _step(criteria, [6])
+    assert criteria.reasons == [STOP_BUDGET]
+
+    criteria.reset()
+    assert criteria.generated == [0] and criteria.reasons == [None]
+
+
+def test_generation_stats_aggregate():
+    stats = GenerationStats()
+    stats.add(generation_stats(10, 0, 20, STOP_EOS))
+    stats.add(generation_stats(30, 12, 30, STOP_REPETITION))
+    stats.add(generation_stats(40, 0, 40, STOP_BUDGET))
+    stats.add({"success": True, "translated_text": "cached", "cached": True})
+    assert stats.as_dict() == {
+        "requests": 3,
+        "generated_tokens": 80,
+        "wasted_tokens": 12,
+        "budget_tokens": 90,
+        "repetition_stops": 1,
+        "budget_stops": 1
+    }
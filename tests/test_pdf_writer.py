@@ -0,0 +1,47 @@
+"""文字块模式的字体选择和译文写入"""
+import pytest
+
+fitz = pytest.importorskip("fitz")
+
+import config
+from pdf_writer import block_font, replace_blocks
+
+
+@pytest.fixture(autouse=True)
+def temp_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "TEMP_DIR", str(tmp_path))
+    monkeypatch.setattr(config, "PDF_BLOCK_FONT_FILE", "")
+
+
+def _rewrite(target_language, text):
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_text((50, 50), "hello world")
+    fontname, fontfile = block_font(target_language)
+    replace_blocks(page, [{"bbox": (40, 30, 300, 60), "translated_text": text, "font_size": 11}], fontname, fontfile, 4)
+    return page.get_text().strip()
+
+
+@pytest.mark.parametrize("language, text", [
+    ("Chinese", "你好世界"),
+    ("French", "Bonjour ça va"),
+    ("Russian", "Привет мир"),
+    ("Vietnamese", "Xin chào thế giới"),
+    ("Turkish", "Günaydın İstanbul"),
+])
+def test_block_font_renders_target_script(language, text):
+    assert _rewrite(language, text) == text
+
+
+@pytest.mark.parametrize("language", ["Arabic", "Thai", "Hindi"])
+def test_no_builtin_font_for_complex_scripts(language):
+    assert block_font(language) is None
+
+
+def test_configured_font_file_is_used_for_every_language(monkeypatch):
+    monkeypatch.setattr(config, "PDF_BLOCK_FONT_FILE", "/fonts/custom.ttf")
+    assert block_font("Arabic") == ("blockfont", "/fonts/custom.ttf")
+
+
+def test_empty_translation_only_redacts():
+    assert _rewrite("Chinese", "") == ""
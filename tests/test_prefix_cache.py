@@ -0,0 +1,60 @@
+"""提示词前缀 KV 缓存"""
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from generation_budget import GenerationCriteria
+
+
+def _criteria(translator, budget):
+    return GenerationCriteria([budget], translator._eos_token_ids(), 0)
+
+
+def test_prefix_generation_matches_full_prefill(tiny_translator):
+    translator = tiny_translator
+    translator.prefix_cache_enabled = True
+    chat_prompt = translator._build_chat_prompt(translator._build_prompt("Hello world", "English", "Chinese"))
+
+    # top_p 极小时只保留概率最高的 token，与贪心解码一致
+    criteria = _criteria(translator, 12)
+    response = translator._generate_with_prefix(
+        chat_prompt, "English", "Chinese", 2048, 1e-9, 1.0, criteria
+    )
+    assert response is not None
+    assert translator.prefix_cache_enabled
+
+    input_ids = translator.tokenizer(chat_prompt, return_tensors="pt")["input_ids"]
+    with torch.no_grad():
+        expected = translator.model.generate(
+            input_ids=input_ids,
+            attention_mask=torch.ones_like(input_ids),
+            max_new_tokens=criteria.generated[0] + (criteria.reasons[0] == "eos"),
+            do_sample=False,
+            pad_token_id=translator.tokenizer.pad_token_id
+        )
+    expected_ids = expected[0, input_ids.shape[1]:input_ids.shape[1] + criteria.kept_tokens()].tolist()
+    assert response == translator._decode_response(expected_ids)
+
+
+def test_prefix_cache_stats(tiny_translator):
+    translator = tiny_translator
+    translator.prefix_cache_enabled = True
+    for text in ("Hello", "Another sentence"):
+        chat_prompt = translator._build_chat_prompt(translator._build_prompt(text, "English", "Chinese"))
+        assert translator._generate_with_prefix(
+            chat_prompt, "English", "Chinese", 2048, 0.7, 0.95, _criteria(translator, 4)
+        ) is not None
+    stats = translator.prefix_cache_stats()
+    assert stats["entries"] == 1
+    assert stats["hits"] == 2 and stats["misses"] == 0
+    assert stats["cached_tokens"] > 0
+
+
+def test_prompt_without_prefix_is_a_miss(tiny_translator):
+    translator = tiny_translator
+    translator.prefix_cache_enabled = True
+    response = translator._generate_with_prefix(
+        "unrelated prompt", "English", "Chinese", 2048, 0.7, 0.95, _criteria(translator, 4)
+    )
+    assert response is None
+    assert translator.prefix_cache_stats()["misses"] == 1
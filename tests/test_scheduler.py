@@ -0,0 +1,153 @@
+"""BatchScheduler 的组批、等待窗口、错误传播和流式请求"""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from backends import StubBackend
+from scheduler import BatchScheduler
+
+
+class RecordingBackend(StubBackend):
+    """记录每次 translate_batch 的批大小，可设置为抛出异常"""
+
+    def __init__(self, **kwargs):
+        super().__init__(latency_ms=0, token_latency_ms=0, **kwargs)
+        self.batches = []
+        self.error = None
+
+    def translate_batch(self, texts, source_language="English", target_language="Chinese", **kwargs):
+        self.batches.append((len(texts), source_language, target_language))
+        if self.error is not None:
+            raise self.error
+        return super().translate_batch(texts, source_language, target_language)
+
+
+@pytest.fixture
+def backend():
+    return RecordingBackend()
+
+
+@pytest.fixture
+def make_scheduler(backend):
+    schedulers = []
+
+    def make(**kwargs):
+        scheduler = BatchScheduler(backend, **kwargs)
+        schedulers.append(scheduler)
+        return scheduler
+
+    yield make
+    for scheduler in schedulers:
+        scheduler.shutdown()
+
+
+def test_single_caller_does_not_wait(make_scheduler):
+    scheduler = make_scheduler(max_wait_ms=1000)
+    start = time.perf_counter()
+    for _ in range(3):
+        assert scheduler.translate("Hello world.")["success"]
+    assert time.perf_counter() - start < 1.0
+
+
+def test_translate_batch_is_one_batch(make_scheduler, backend):
+    scheduler = make_scheduler(max_batch_size=8, max_wait_ms=1000)
+    results = scheduler.translate_batch(["one", "two", "three"])
+    assert [result["translated_text"] for result in results] == ["[Chinese] one", "[Chinese] two", "[Chinese] three"]
+    assert backend.batches == [(3, "English", "Chinese")]
+
+
+def test_batch_size_limit(make_scheduler, backend):
+    scheduler = make_scheduler(max_batch_size=2, max_wait_ms=1000)
+    assert len(scheduler.translate_batch(["a", "b", "c", "d", "e"])) == 5
+    assert [size for size, _, _ in backend.batches] == [2, 2, 1]
+
+
+def test_concurrent_callers_share_a_batch(make_scheduler, backend):
+    scheduler = make_scheduler(max_batch_size=8, max_wait_ms=1000)
+    barrier = threading.Barrier(3)
+    results = []
+
+    def call(text):
+        barrier.wait()
+        results.append(scheduler.translate(text))
+
+    threads = [threading.Thread(target=call, args=(f"text {i}",)) for i in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(results) == 3
+    assert sum(size for size, _, _ in backend.batches) == 3
+    assert len(backend.batches) < 3
+
+
+def test_language_pairs_are_not_mixed(make_scheduler, backend):
+    scheduler = make_scheduler(max_batch_size=8, max_wait_ms=200)
+
+    async def run():
+        return await asyncio.gather(
+            scheduler.submit("hello", "English", "Chinese"),
+            scheduler.submit("hello", "English", "Japanese"),
+            scheduler.submit("world", "English", "Chinese")
+        )
+
+    results = asyncio.run(run())
+    assert [result["target_language"] for result in results] == ["Chinese", "Japanese", "Chinese"]
+    assert sorted(target for _, _, target in backend.batches) == ["Chinese", "Japanese"]
+
+
+def test_batch_error_reaches_every_caller(make_scheduler, backend):
+    scheduler = make_scheduler(max_wait_ms=0)
+    backend.error = RuntimeError("model crashed")
+    with pytest.raises(RuntimeError, match="model crashed"):
+        scheduler.translate_batch(["a", "b"])
+
+    # 出错后调度器继续处理后续请求
+    backend.error = None
+    assert scheduler.translate("again")["success"]
+    assert scheduler.stats()["requests"] == 3
+
+
+def test_stream_when_idle_yields_partial_results(make_scheduler):
+    scheduler = make_scheduler()
+
+    async def run():
+        return [item async for item in scheduler.submit_stream("one two three")]
+
+    items = asyncio.run(run())
+    assert len(items) > 1
+    assert not items[0]["finished"]
+    assert items[-1]["finished"] and items[-1]["translated_text"] == "[Chinese] one two three"
+
+
+def test_stream_when_busy_joins_batches(make_scheduler, backend):
+    scheduler = make_scheduler(max_wait_ms=0)
+    release = threading.Event()
+    original = backend.translate_batch
+
+    def slow_batch(texts, *args, **kwargs):
+        release.wait(5)
+        return original(texts, *args, **kwargs)
+
+    backend.translate_batch = slow_batch
+    worker = threading.Thread(target=scheduler.translate, args=("busy",))
+    worker.start()
+    while not scheduler._busy():
+        time.sleep(0.01)
+
+    async def run():
+        return [item async for item in scheduler.submit_stream("one two three")]
+
+    async def run_and_release():
+        task = asyncio.ensure_future(run())
+        await asyncio.sleep(0.05)
+        release.set()
+        return await task
+
+    items = asyncio.run(run_and_release())
+    worker.join()
+    assert len(items) == 1
+    assert items[0]["finished"] and items[0]["translated_text"] == "[Chinese] one two three"
+    assert "queue_wait_ms" in items[0]
@@ -0,0 +1,106 @@
+"""翻译前分段过滤"""
+import pytest
+
+from segment_filter import (
+    BYPASS_CODE, BYPASS_FORMULA, BYPASS_NO_TEXT, BYPASS_PAGE_NUMBER, BYPASS_REFERENCES,
+    BYPASS_TARGET_LANGUAGE, BYPASS_URL, BypassStats, classify_segment
+)
+
+
+def classify(text, source="English", target="Chinese"):
+    return classify_segment(text, source, target)
+
+
+@pytest.mark.parametrize("text", ["Page 3 of 10", "p. 12", "xiv", "XIV", "iv", "Page I"])
+def test_page_numbers(text):
+    assert classify(text) == BYPASS_PAGE_NUMBER
+
+
+@pytest.mark.parametrize("text", ["I", "Mix", "mix", "CD", "MIX", "Dim", "Civil"])
+def test_words_that_look_like_roman_numerals_are_translated(text):
+    assert classify(text) is None
+
+
+@pytest.mark.parametrize("text", ["12", "- 12 -", "3 / 10", "(3.2)"])
+def test_no_text(text):
+    assert classify(text) == BYPASS_NO_TEXT
+
+
+@pytest.mark.parametrize("text", ["https://example.org/docs/api.html", "support@example.org", "www.example.com | https://a.b/c"])
+def test_urls(text):
+    assert classify(text) == BYPASS_URL
+
+
+def test_url_inside_sentence_is_translated():
+    assert classify("See https://example.org for details.") is None
+
+
+def test_target_language():
+    assert classify("译者注：本节中的术语保留英文原文。") == BYPASS_TARGET_LANGUAGE
+    assert classify("この文章は日本語です。", "English", "Japanese") == BYPASS_TARGET_LANGUAGE
+
+
+def test_mixed_source_script_is_translated():
+    assert classify("系统 overview", "Korean", "Chinese") is None
+    assert classify("시스템 概要 설명", "Korean", "Chinese") is None
+
+
+@pytest.mark.parametrize("text", ["T = n / (t_p + k * t_d)", "f(x) = sin(x) + cos(2x)", "x_i + y_i <= 1"])
+def test_formulas(text):
+    assert classify(text) == BYPASS_FORMULA
+
+
+def test_references():
+    text = (
+        "References\n"
+        "[1] A. Smith. Reliable systems at scale. In Proc. of the Conference on Systems, pp. 1-10, 2019.\n"
+        "[2] B. Chen, C. Lee. Caching for translation. Journal of Translation, vol. 3, 2021."
+    )
+    assert classify(text) == BYPASS_REFERENCES
+
+
+def test_prose_citing_a_year_is_translated():
+    assert classify("In 2019 the Journal reported that Smith et al. improved throughput by half.") is None
+
+
+def test_multi_line_code():
+    code = (
+        "def translate_batch(texts, max_batch_size=8):\n"
+        "    results = []\n"
+        "    for i in range(0, len(texts), max_batch_size):\n"
+        "        results.extend(model.generate(texts[i:i + max_batch_size]))\n"
+        "    return results"
+    )
+    assert classify(code) == BYPASS_CODE
+
+
+def test_code_joined_into_one_line():
+    code = "for (int i = 0; i < n; i++) { sum += values[i] * weights[i]; } return sum / n;"
+    assert classify(code) == BYPASS_CODE
+
+
+@pytest.mark.parametrize("text", [
+    "Call f(x); see g(y).",
+    "The function max(a, b) returns the larger value; min(a, b) returns the smaller one (see Section 3.2).",
+    "We use torch.cat(x) and torch.stack(y); both return tensors.",
+    "Set x = 5 and y = 10; then f(x) + f(y) is 15 (approximately).",
+    "Call f(x);\nsee g(y).",
+])
+def test_sentences_with_parentheses_and_semicolons_are_translated(text):
+    assert classify(text) is None
+
+
+def test_plain_prose_is_translated():
+    assert classify("This chapter explains how the cache works.") is None
+
+
+def test_bypass_stats():
+    stats = BypassStats()
+    for reason in (None, BYPASS_CODE, BYPASS_CODE, BYPASS_URL):
+        stats.add(reason)
+    assert stats.as_dict() == {
+        "segments": 4,
+        "bypassed": 3,
+        "bypass_ratio": 0.75,
+        "reasons": {BYPASS_URL: 1, BYPASS_CODE: 2}
+    }
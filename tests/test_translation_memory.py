@@ -0,0 +1,102 @@
+"""翻译记忆：缓存键、LRU 淘汰、持久化以及与翻译器的配合"""
+import pytest
+
+from generation_budget import STOP_BUDGET, STOP_EOS, STOP_REPETITION
+from translation_memory import TranslationMemory, normalize_text
+
+
+class RecordingMemory(TranslationMemory):
+    """记录最近一次查询的缓存键"""
+
+    last_key = None
+
+    def get(self, key):
+        self.last_key = key
+        return super().get(key)
+
+
+@pytest.fixture
+def memory(tmp_path):
+    memory = TranslationMemory(db_path=str(tmp_path / "memory.db"), max_entries=100)
+    yield memory
+    memory.close()
+
+
+def test_normalize_text():
+    assert normalize_text("  Hello \t world  \r\n  second　line  ") == "Hello world\nsecond line"
+    # NFC：组合字符与预组合字符视为相同
+    assert normalize_text("é") == normalize_text("é")
+
+
+def test_key_ignores_whitespace_but_not_params():
+    key = TranslationMemory.make_key("Hello  world", "English", "Chinese", {"top_p": 0.7})
+    assert key == TranslationMemory.make_key(" Hello world ", "English", "Chinese", {"top_p": 0.7})
+    assert key != TranslationMemory.make_key("Hello world", "English", "Japanese", {"top_p": 0.7})
+    assert key != TranslationMemory.make_key("Hello world", "English", "Chinese", {"top_p": 0.8})
+    assert key != TranslationMemory.make_key("Hello World", "English", "Chinese", {"top_p": 0.7})
+
+
+def test_get_put_and_stats(memory):
+    assert memory.get("missing") is None
+    memory.put("key", "译文")
+    assert memory.get("key") == "译文"
+    assert memory.stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5, "entries": 1}
+
+    memory.clear()
+    assert memory.get("key") is None
+    assert memory.stats()["entries"] == 0
+
+
+def test_persists_across_instances(tmp_path):
+    path = str(tmp_path / "memory.db")
+    first = TranslationMemory(db_path=path)
+    first.put("key", "译文")
+    first.close()
+
+    second = TranslationMemory(db_path=path)
+    assert second.get("key") == "译文"
+    second.close()
+
+
+def test_evicts_least_recently_used(memory, monkeypatch):
+    monkeypatch.setattr(memory, "EVICT_INTERVAL", 1)
+    memory.max_entries = 2
+    memory.put("a", "A")
+    memory.put("b", "B")
+    # 读取 a 后它比 b 更新，写入 c 时淘汰 b
+    assert memory.get("a") == "A"
+    memory.put("c", "C")
+    assert memory.stats()["entries"] == 2
+    assert memory.get("b") is None
+    assert memory.get("a") == "A"
+    assert memory.get("c") == "C"
+
+
+def test_translator_uses_memory(tiny_translator, tmp_path):
+    memory = RecordingMemory(db_path=str(tmp_path / "memory.db"))
+    tiny_translator.memory = memory
+
+    # 测试模型没有 ChatGLM 的 chat 接口，经 translate_batch 调用 generate
+    first = tiny_translator.translate_batch(["hello"], max_length=64)[0]
+    assert first["success"] and not first.get("cached")
+    key = memory.last_key
+    assert key
+    # 只有正常结束（eos）的译文才写入
+    assert memory.stats()["entries"] == (1 if first["stop_reason"] == STOP_EOS else 0)
+
+    memory.put(key, "你好")
+    second = tiny_translator.translate_batch(["  hello "], max_length=64)[0]
+    assert second["cached"] and second["translated_text"] == "你好"
+    assert memory.last_key == key
+    memory.close()
+
+
+@pytest.mark.parametrize("stop_reason, stored", [(STOP_EOS, True), (STOP_BUDGET, False), (STOP_REPETITION, False)])
+def test_translator_stores_only_complete_results(tiny_translator, tmp_path, stop_reason, stored):
+    memory = TranslationMemory(db_path=str(tmp_path / "memory.db"))
+    tiny_translator.memory = memory
+    tiny_translator._store_memory("key", {"success": True, "translated_text": "译文", "stop_reason": stop_reason})
+    tiny_translator._store_memory("failed", {"success": False, "translated_text": ""})
+    assert (memory.get("key") is not None) == stored
+    assert memory.get("failed") is None
+    memory.close()
@@ -0,0 +1,100 @@
+"""TranslatorPool 的工作进程重启与 token 统计"""
+import functools
+import os
+import time
+
+import translator_pool
+from backends import StubBackend
+from translator_pool import TranslatorPool
+
+
+# 工厂在工作进程中调用，必须定义在模块顶层才能被 spawn 序列化
+
+def stub_factory():
+    return StubBackend(latency_ms=0)
+
+
+def crash_once_factory(marker: str):
+    # 第一次启动时在加载阶段退出，之后正常启动
+    if not os.path.exists(marker):
+        open(marker, "w").close()
+        os._exit(1)
+    return StubBackend(latency_ms=0)
+
+
+def crash_factory():
+    os._exit(1)
+
+
+def _wait_for(condition, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_worker_dying_before_ready_is_restarted(tmp_path):
+    factory = functools.partial(crash_once_factory, str(tmp_path / "crashed"))
+    pool = TranslatorPool(num_workers=1, threads_per_worker=1, translator_factory=factory,
+                          health_check_interval=0.1, wait_ready=False)
+    try:
+        assert pool.wait_ready(30)
+        worker = pool.stats()["workers"][0]
+        assert worker["restarts"] == 1
+        assert worker["error"] is None
+        assert pool.translate("hello")["success"]
+    finally:
+        pool.shutdown()
+
+
+def test_worker_crashing_on_every_start_is_marked_failed():
+    pool = TranslatorPool(num_workers=1, threads_per_worker=1, translator_factory=crash_factory,
+                          health_check_interval=0.1, wait_ready=False)
+    try:
+        assert not pool.wait_ready(30)
+        worker = pool.stats()["workers"][0]
+        assert worker["error"]
+        assert worker["restarts"] == translator_pool._MAX_START_FAILURES - 1
+        result = pool.translate("hello")
+        assert not result["success"]
+        assert result["error"]
+    finally:
+        pool.shutdown()
+
+
+def test_worker_killed_after_ready_is_restarted():
+    pool = TranslatorPool(num_workers=1, threads_per_worker=1, translator_factory=stub_factory,
+                          health_check_interval=0.1)
+    try:
+        process = pool._workers[0].process
+        process.kill()
+        assert _wait_for(lambda: pool.stats()["workers"][0]["restarts"] == 1)
+        assert pool.wait_ready(30)
+        assert pool.translate("hello")["success"]
+    finally:
+        pool.shutdown()
+
+
+def test_count_tokens_without_model_path_uses_worker():
+    pool = TranslatorPool(num_workers=1, threads_per_worker=1, translator_factory=stub_factory,
+                          health_check_interval=0.1)
+    try:
+        text = "The quick brown fox jumps over the lazy dog."
+        assert pool.count_tokens(text) == StubBackend().count_tokens(text)
+    finally:
+        pool.shutdown()
+
+
+def test_count_tokens_uses_parent_tokenizer(tiny_translator, monkeypatch):
+    pool = TranslatorPool(num_workers=1, threads_per_worker=1, translator_factory=stub_factory,
+                          health_check_interval=0.1, wait_ready=False)
+    try:
+        pool._tokenizer = tiny_translator.tokenizer
+        # 主进程已有 tokenizer 时不经过工作进程
+        monkeypatch.setattr(pool, "_submit", None)
+        assert pool.count_tokens("hello") == 5
+    finally:
+        monkeypatch.undo()
+        pool.shutdown()
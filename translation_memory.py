@@ -0,0 +1,188 @@
+"""
+翻译记忆缓存
+基于 SQLite 的持久化翻译结果缓存，按 LRU 策略限制条目数
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Optional, Dict, Any
+
+logger = logging.getLogger(__name__)
+
+_SPACE_RE = re.compile(r"[ \t　]+")
+
+
+def normalize_text(text: str) -> str:
+    """
+    规范化源文本，使仅空白不同的文本命中同一条缓存
+
+    Args:
+        text: 源文本
+
+    Returns:
+        规范化后的文本
+    """
+    text = unicodedata.normalize("NFC", text)
+    lines = [_SPACE_RE.sub(" ", line).strip() for line in text.splitlines()]
+    return "\n".join(lines).strip()
+
+
+class TranslationMemory:
+    """持久化翻译记忆"""
+
+    # 每写入多少条检查一次容量，避免每次写入都扫描表
+    EVICT_INTERVAL = 64
+
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        max_entries: Optional[int] = None
+    ):
+        """
+        初始化翻译记忆
+
+        Args:
+            db_path: SQLite 数据库文件路径
+            max_entries: 最大缓存条目数
+        """
+        from config import TRANSLATION_MEMORY_PATH, TRANSLATION_MEMORY_MAX_ENTRIES
+
+        self.db_path = db_path or TRANSLATION_MEMORY_PATH
+        self.max_entries = max_entries or TRANSLATION_MEMORY_MAX_ENTRIES
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS memory (
+                key TEXT PRIMARY KEY,
+                translated_text TEXT NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_memory_last_used ON memory(last_used)")
+        self._conn.commit()
+        logger.info(f"翻译记忆已打开: {self.db_path}")
+
+    @staticmethod
+    def make_key(
+        text: str,
+        source_language: str,
+        target_language: str,
+        params: Dict[str, Any]
+    ) -> str:
+        """
+        生成缓存键
+
+        Args:
+            text: 源文本
+            source_language: 源语言
+            target_language: 目标语言
+            params: 影响输出的参数（提示词版本、采样参数等）
+
+        Returns:
+            缓存键（SHA-256 十六进制）
+        """
+        payload = json.dumps(
+            [normalize_text(text), source_language, target_language, params],
+            ensure_ascii=False,
+            sort_keys=True
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        查询缓存，命中时刷新最近使用时间
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            缓存的译文，未命中时返回 None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT translated_text FROM memory WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute(
+                "UPDATE memory SET last_used = ? WHERE key = ?", (time.time(), key)
+            )
+            self._conn.commit()
+            return row[0]
+
+    def put(self, key: str, translated_text: str):
+        """
+        写入缓存
+
+        Args:
+            key: 缓存键
+            translated_text: 译文
+        """
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO memory (key, translated_text, last_used) VALUES (?, ?, ?)",
+                (key, translated_text, time.time())
+            )
+            self._writes += 1
+            if self._writes % self.EVICT_INTERVAL == 0:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """删除超出容量的最久未使用条目（调用方需持有锁）"""
+        cursor = self._conn.execute(
+            "DELETE FROM memory WHERE key IN ("
+            "SELECT key FROM memory ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+        if cursor.rowcount:
+            logger.info(f"翻译记忆已淘汰 {cursor.rowcount} 条旧记录")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计
+
+        Returns:
+            包含命中、未命中、命中率和条目数的字典
+        """
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM memory").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries
+        }
+
+    def clear(self):
+        """清空缓存和统计"""
+        with self._lock:
+            self._conn.execute("DELETE FROM memory")
+            self._conn.commit()
+            self.hits = 0
+            self.misses = 0
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
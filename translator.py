@@ -2,13 +2,32 @@
 基于 ChatGLM2-6B 的翻译引擎
 """
 import torch
-from transformers import AutoTokenizer, AutoModel
-from typing import Optional, Dict, Any
+from transformers import AutoTokenizer, AutoModel, LogitsProcessorList, StoppingCriteriaList
+from transformers import TemperatureLogitsWarper, TopPLogitsWarper
+from typing import Optional, Dict, Any, List, Iterator
+import copy
+import inspect
 import logging
 import os
+import threading
+import time
+from generation_budget import GenerationCriteria, STOP_EOS, STOP_REPETITION, generation_budget
+from instrumentation import tracer
+from postprocess import postprocess, postprocess_batch
+from prompts import build_prompt
+from script_constraint import SCRIPT_CONSTRAINT_MODES, ScriptLogitsProcessor, TokenScripts, script_processor
 
 logger = logging.getLogger(__name__)
 
+# 提示词版本，修改提示词模板时需要递增，使旧的翻译记忆失效
+PROMPT_VERSION = "1"
+
+# 支持的 CPU 量化方式
+QUANTIZATION_MODES = ("none", "int8", "int4")
+
+# 用于定位提示词模板中原文位置的占位符
+_PREFIX_SENTINEL = "\u0000TEXT\u0000"
+
 
 class ChatGLMTranslator:
     """基于 ChatGLM2-6B 的翻译器"""
@@ -16,7 +35,9 @@ class ChatGLMTranslator:
     def __init__(
         self,
         model_path: Optional[str] = None,
-        device: Optional[str] = None
+        device: Optional[str] = None,
+        memory=None,
+        lazy: Optional[bool] = None
     ):
         """
         初始化翻译器
@@ -24,8 +45,10 @@ class ChatGLMTranslator:
         Args:
             model_path: 模型路径或 HuggingFace 模型名称
             device: 设备类型 (cuda 或 cpu)
+            memory: 翻译记忆实例，为 None 时按配置自动创建
+            lazy: 是否延迟到首次请求时再加载模型，为 None 时使用 MODEL_LAZY_LOAD
         """
-        from config import MODEL_PATH, DEVICE
+        from config import MODEL_PATH, DEVICE, TRANSLATION_MEMORY_ENABLED, MODEL_LAZY_LOAD, QUANTIZATION
         
         self.model_path = model_path or MODEL_PATH
         self.device = device or DEVICE
@@ -35,17 +58,139 @@ class ChatGLMTranslator:
             logger.warning("CUDA 不可用，使用 CPU")
             self.device = "cpu"
         
+        # 量化只用于 CPU 推理
+        self.quantization = QUANTIZATION
+        if self.quantization not in QUANTIZATION_MODES:
+            logger.warning(f"不支持的量化方式 {self.quantization}，不进行量化")
+            self.quantization = "none"
+        elif self.quantization != "none" and self.device != "cpu":
+            logger.warning(f"量化 ({self.quantization}) 只用于 CPU 推理，当前设备 {self.device} 不进行量化")
+            self.quantization = "none"
+        
+        # 翻译记忆缓存
+        if memory is None and TRANSLATION_MEMORY_ENABLED:
+            try:
+                from translation_memory import TranslationMemory
+                memory = TranslationMemory()
+            except Exception as e:
+                logger.warning(f"翻译记忆初始化失败，不使用缓存: {str(e)}")
+                memory = None
+        self.memory = memory
+        
         self.tokenizer = None
         self.model = None
-        self._load_model()
+        # 各加载阶段耗时（秒）
+        self.load_timings = {}
+        self.load_error = None
+        self._load_lock = threading.Lock()
+        # 提示词前缀的 KV 缓存：(源语言, 目标语言) -> (前缀 token, past_key_values)，不适用时为 None
+        from config import PREFIX_CACHE_ENABLED
+        self.prefix_cache_enabled = PREFIX_CACHE_ENABLED
+        self._prefix_cache = {}
+        self._prefix_lock = threading.Lock()
+        self._prefix_stats = {"hits": 0, "misses": 0, "cached_tokens": 0}
+        # 只计算最后一个位置 logits 的前向参数，首次调用时按模型确定
+        self._logits_kwargs = None
+        # 按目标语言约束解码，词表分类在首次使用时计算
+        from config import SCRIPT_CONSTRAINT_MODE
+        self.script_constraint = SCRIPT_CONSTRAINT_MODE
+        if self.script_constraint not in SCRIPT_CONSTRAINT_MODES:
+            logger.warning(f"不支持的文字约束方式 {self.script_constraint}，不进行约束")
+            self.script_constraint = "off"
+        self._token_scripts = None
+        self._token_scripts_lock = threading.Lock()
+        
+        if lazy if lazy is not None else MODEL_LAZY_LOAD:
+            logger.info("模型将在首次请求时加载")
+        else:
+            self._load_model()
+    
+    def ensure_loaded(self) -> bool:
+        """
+        确保模型已加载，延迟加载模式下由首个请求触发，并发请求只加载一次
+        
+        Returns:
+            模型是否可用
+        """
+        if self.model is not None and self.tokenizer is not None:
+            return True
+        with self._load_lock:
+            if self.model is not None and self.tokenizer is not None:
+                return True
+            try:
+                self._load_model()
+                self.load_error = None
+            except Exception as e:
+                self.load_error = str(e)
+                return False
+        return self.model is not None and self.tokenizer is not None
+    
+    def memory_usage(self) -> Dict[str, float]:
+        """
+        当前进程的内存占用，独占部分（uss_mb）即每多运行一个工作进程需要的内存
+        
+        Returns:
+            内存占用字典（MB），字段见 utils.get_process_memory
+        """
+        from utils import get_process_memory
+        return get_process_memory()
+    
+    def _quantize_int4(self) -> bool:
+        """
+        使用模型自带的 quantize 方法进行 int4 权重量化（ChatGLM2 的远程代码提供），需在转换为 float32 之前执行
+        
+        Returns:
+            是否成功，不支持时由调用方退回 int8
+        """
+        if not hasattr(self.model, "quantize"):
+            logger.warning("模型不支持 int4 量化，改用 int8 动态量化")
+            return False
+        try:
+            self.model = self.model.quantize(4)
+            return True
+        except Exception as e:
+            logger.warning(f"int4 量化失败，改用 int8 动态量化: {str(e)}")
+            return False
+    
+    def _quantize_int8(self):
+        """对全部 Linear 层做 int8 动态量化（权重离线量化，激活按批动态量化），只适用于 CPU"""
+        self.model = torch.ao.quantization.quantize_dynamic(
+            self.model,
+            {torch.nn.Linear},
+            dtype=torch.qint8,
+            # 原地替换，避免深拷贝整个 float32 模型
+            inplace=True
+        )
+    
+    def _not_loaded_message(self) -> str:
+        if self.load_error:
+            return f"模型未加载: {self.load_error}"
+        return "模型未加载"
     
     def _load_model(self):
-        """加载模型"""
+        """加载模型，CPU 上优先使用已转换好的本地快照"""
+        from config import MODEL_CACHE_ENABLED, MODEL_MMAP_WEIGHTS
+        
+        timings = {}
+        start = time.perf_counter()
         try:
             logger.info(f"正在加载模型: {self.model_path}")
             logger.info(f"使用设备: {self.device}")
             
+            # CPU 推理需要 float32，把转换后的权重缓存下来，下次启动直接内存映射加载
+            # （int4 量化直接作用于原始权重，不使用 float32 快照）
+            snapshot = None
+            if (MODEL_CACHE_ENABLED or MODEL_MMAP_WEIGHTS) and self.device == "cpu" and self.quantization != "int4":
+                from model_cache import ModelSnapshotCache
+                snapshot = ModelSnapshotCache(
+                    self.model_path,
+                    "float32",
+                    snapshot_format="mmap" if MODEL_MMAP_WEIGHTS else "safetensors"
+                )
+            from_snapshot = snapshot is not None and snapshot.exists()
+            
             # 加载 tokenizer
+            phase_start = time.perf_counter()
             self.tokenizer = AutoTokenizer.from_pretrained(
                 self.model_path,
                 trust_remote_code=True
@@ -77,19 +222,73 @@ class ChatGLMTranslator:
                         return original_pad(encoded_inputs, max_length=max_length, **kwargs)
                 self.tokenizer._pad = patched_pad
                 logger.info("已修复 tokenizer _pad 方法兼容性问题")
+            timings["tokenizer"] = time.perf_counter() - phase_start
             
             # 加载模型
-            self.model = AutoModel.from_pretrained(
-                self.model_path,
-                trust_remote_code=True,
-                device_map="auto" if self.device == "cuda" else None
-            )
+            phase_start = time.perf_counter()
+            if from_snapshot and snapshot.snapshot_format == "mmap":
+                # 权重直接引用内存映射的文件页，多个工作进程共享同一份物理内存
+                logger.info(f"从本地快照内存映射加载模型: {snapshot.path}")
+                self.model = snapshot.load_mmap()
+            elif from_snapshot:
+                # 快照已是 float32，safetensors 内存映射加载，不再整体复制一份
+                logger.info(f"从本地快照加载模型: {snapshot.path}")
+                self.model = AutoModel.from_pretrained(
+                    snapshot.path,
+                    trust_remote_code=True,
+                    torch_dtype=torch.float32,
+                    low_cpu_mem_usage=True
+                )
+            else:
+                self.model = AutoModel.from_pretrained(
+                    self.model_path,
+                    trust_remote_code=True,
+                    device_map="auto" if self.device == "cuda" else None
+                )
+            timings["weights"] = time.perf_counter() - phase_start
             
-            if self.device == "cpu":
+            if self.quantization == "int4":
+                phase_start = time.perf_counter()
+                if self._quantize_int4():
+                    timings["quantize"] = time.perf_counter() - phase_start
+                else:
+                    self.quantization = "int8"
+            
+            if self.device == "cpu" and not from_snapshot:
+                phase_start = time.perf_counter()
                 self.model = self.model.float()
+                timings["convert"] = time.perf_counter() - phase_start
             
             self.model.eval()
-            logger.info("模型加载成功")
+            
+            if snapshot is not None and not from_snapshot:
+                phase_start = time.perf_counter()
+                saved = snapshot.save(self.model)
+                timings["snapshot_write"] = time.perf_counter() - phase_start
+                if saved and snapshot.snapshot_format == "mmap":
+                    # 换成内存映射的权重，释放本进程私有的那份拷贝
+                    phase_start = time.perf_counter()
+                    self.model = snapshot.load_mmap().eval()
+                    timings["mmap_reload"] = time.perf_counter() - phase_start
+            
+            if self.quantization == "int8":
+                phase_start = time.perf_counter()
+                self._quantize_int8()
+                timings["quantize"] = time.perf_counter() - phase_start
+            
+            timings["total"] = time.perf_counter() - start
+            self.load_timings = timings
+            if self.quantization != "none":
+                logger.info(f"已启用 {self.quantization} 量化")
+            logger.info(
+                "模型加载成功，耗时: " + "，".join(f"{name} {seconds:.1f}s" for name, seconds in timings.items())
+            )
+            memory = self.memory_usage()
+            if "uss_mb" in memory:
+                logger.info(
+                    f"进程内存: RSS {memory['rss_mb']:.0f} MB，PSS {memory['pss_mb']:.0f} MB，"
+                    f"独占 {memory['uss_mb']:.0f} MB，共享 {memory['shared_mb']:.0f} MB"
+                )
             
         except Exception as e:
             logger.error(f"模型加载失败: {str(e)}")
@@ -125,10 +324,10 @@ class ChatGLMTranslator:
                 "translated_text": ""
             }
         
-        if not self.model or not self.tokenizer:
+        if not self.ensure_loaded():
             return {
                 "success": False,
-                "error": "模型未加载",
+                "error": self._not_loaded_message(),
                 "translated_text": ""
             }
         
@@ -139,244 +338,849 @@ class ChatGLMTranslator:
             top_p = top_p or TOP_P
             temperature = temperature or TEMPERATURE
             
-            # 构建翻译提示词（优化版）
-            # 根据目标语言选择不同的提示词格式
-            if target_language == "Korean":
-                prompt = f"""You must translate the following English text into Korean language (한국어). 
-IMPORTANT: You must output ONLY Korean text. Do NOT output Chinese. Do NOT output English. Only Korean.
-
-English:
-{text}
-
-Korean (한국어 only):"""
-            elif target_language == "Japanese":
-                prompt = f"""You must translate the following English text into Japanese language (日本語). 
-IMPORTANT: You must output ONLY Japanese text. Do NOT output Chinese. Do NOT output English. Only Japanese.
-
-English:
-{text}
-
-Japanese (日本語 only):"""
-            else:
-                prompt = f"""你是一位专业的翻译专家。请将以下{source_language}文本准确翻译成{target_language}。
-
-要求：
-1. 翻译要准确、自然、流畅
-2. 保持原文的语气和风格
-3. 保留原文的格式（如换行、段落等）
-4. 如果是技术术语，请使用通用的翻译
-5. 只返回翻译结果，不要添加任何解释、注释或额外说明
-6. 不要包含原文或任何注释
-
-原文：
-{text}
-
-翻译："""
+            # 优先查询翻译记忆
+            memory_key = self._memory_key(text, source_language, target_language, max_length, top_p, temperature)
+            cached = self._lookup_memory(memory_key, source_language, target_language)
+            if cached:
+                return cached
             
-            # 使用 ChatGLM 进行生成
-            # 捕获可能的 tokenizer 错误并重试
-            try:
+            with tracer.span("translator.prompt"):
+                prompt = self._build_prompt(text, source_language, target_language)
+                chat_prompt = self._build_chat_prompt(prompt)
+                prompt_tokens = len(self.tokenizer(chat_prompt)["input_ids"])
+                criteria = self._generation_criteria([
+                    generation_budget(self.count_tokens(text), target_language, prompt_tokens, max_length)
+                ])
+                processor = self._script_processor(target_language)
+            with tracer.span("translator.generate") as span:
+                response = self._generate_with_prefix(
+                    chat_prompt, source_language, target_language, max_length, top_p, temperature, criteria, processor
+                )
+                if response is None:
+                    response = self._chat(prompt, prompt_tokens, top_p, temperature, criteria, processor)
+                if tracer.enabled:
+                    self._record_tokens(span, prompt_tokens, self.count_tokens(response))
+            with tracer.span("translator.postprocess"):
+                result = self._build_result(response, source_language, target_language)
+            result.update(criteria.row_stats())
+            self._store_memory(memory_key, result)
+            return result
+            
+        except Exception as e:
+            logger.error(f"翻译失败: {str(e)}")
+            return {
+                "success": False,
+                "error": str(e),
+                "translated_text": ""
+            }
+    
+    def count_tokens(self, text: str) -> int:
+        """
+        统计文本的 token 数（不含特殊 token）
+        
+        Args:
+            text: 文本
+            
+        Returns:
+            token 数
+        """
+        if not self.ensure_loaded():
+            from chunker import estimate_tokens
+            return estimate_tokens(text)
+        return len(self.tokenizer.encode(text, add_special_tokens=False))
+    
+    def chunk_token_budget(self, source_language: str, target_language: str) -> int:
+        """
+        计算单个翻译块可以容纳的原文 token 数
+        
+        max_length 同时包含提示词和生成的译文，因此先扣除提示词模板的开销，
+        再按译文/原文长度比为输出预留空间。
+        
+        Args:
+            source_language: 源语言
+            target_language: 目标语言
+            
+        Returns:
+            原文 token 预算
+        """
+        from config import MAX_LENGTH, CHUNK_MAX_TOKENS, CHUNK_OUTPUT_RATIO
+        
+        prompt_overhead = self.count_tokens(
+            self._build_chat_prompt(self._build_prompt("", source_language, target_language))
+        )
+        available = MAX_LENGTH - prompt_overhead
+        budget = int(available / (1 + CHUNK_OUTPUT_RATIO))
+        return max(1, min(budget, CHUNK_MAX_TOKENS))
+    
+    @staticmethod
+    def _record_tokens(span, input_tokens: int, output_tokens: int):
+        """
+        记录一次生成的输入/输出 token 数（仅在启用埋点时调用）
+        
+        Args:
+            span: 生成阶段的 span
+            input_tokens: 提示词 token 数
+            output_tokens: 生成的 token 数
+        """
+        span.set(input_tokens=input_tokens, output_tokens=output_tokens)
+        tracer.count("tokens_total", input_tokens, direction="input")
+        tracer.count("tokens_total", output_tokens, direction="output")
+        tracer.count("generate_calls_total")
+    
+    def _memory_key(
+        self,
+        text: str,
+        source_language: str,
+        target_language: str,
+        max_length: int,
+        top_p: float,
+        temperature: float
+    ) -> Optional[str]:
+        """
+        生成翻译记忆的缓存键，未启用缓存时返回 None
+        """
+        if self.memory is None:
+            return None
+        params = {
+            "prompt_version": PROMPT_VERSION,
+            "model": self.model_path,
+            "max_length": max_length,
+            "top_p": top_p,
+            "temperature": temperature
+        }
+        # 量化后的输出与 float32 不同，分开缓存（未量化时保持原有的键不变）
+        if self.quantization != "none":
+            params["quantization"] = self.quantization
+        # 文字约束会改变输出，开启后不复用未约束时缓存的（可能是错误语言的）译文
+        if self.script_constraint != "off":
+            from config import SCRIPT_CONSTRAINT_BIAS
+            params["script_constraint"] = self.script_constraint
+            params["script_constraint_bias"] = SCRIPT_CONSTRAINT_BIAS
+        return self.memory.make_key(text, source_language, target_language, params)
+    
+    def _lookup_memory(
+        self,
+        memory_key: Optional[str],
+        source_language: str,
+        target_language: str
+    ) -> Optional[Dict[str, Any]]:
+        """
+        查询翻译记忆，命中时返回与 translate() 相同格式的结果
+        """
+        if not memory_key:
+            return None
+        try:
+            translated_text = self.memory.get(memory_key)
+        except Exception as e:
+            logger.warning(f"查询翻译记忆失败: {str(e)}")
+            return None
+        if translated_text is None:
+            return None
+        return {
+            "success": True,
+            "translated_text": translated_text,
+            "source_language": source_language,
+            "target_language": target_language,
+            "cached": True
+        }
+    
+    def _store_memory(self, memory_key: Optional[str], result: Dict[str, Any]):
+        """
+        将成功的翻译结果写入翻译记忆
+        
+        因生成上限或重复循环提前停止的译文可能不完整，不写入，
+        调整 GENERATION_BUDGET_MARGIN、REPETITION_STOP_TOKENS 后重新翻译即可修复
+        """
+        if not memory_key or not result.get("success"):
+            return
+        if result.get("stop_reason", STOP_EOS) != STOP_EOS:
+            return
+        try:
+            self.memory.put(memory_key, result["translated_text"])
+        except Exception as e:
+            logger.warning(f"写入翻译记忆失败: {str(e)}")
+    
+    def _build_prompt(self, text: str, source_language: str, target_language: str) -> str:
+        """
+        构建翻译提示词
+        
+        Args:
+            text: 待翻译的文本
+            source_language: 源语言
+            target_language: 目标语言
+            
+        Returns:
+            提示词
+        """
+        return build_prompt(text, source_language, target_language)
+    
+    def _chat(
+        self,
+        prompt: str,
+        prompt_tokens: int,
+        top_p: float,
+        temperature: float,
+        criteria: GenerationCriteria,
+        processor: Optional[ScriptLogitsProcessor] = None
+    ) -> str:
+        """
+        调用 ChatGLM 生成单条回复
+        
+        Args:
+            prompt: 提示词
+            prompt_tokens: 对话格式提示词的 token 数
+            top_p: top_p 参数
+            temperature: temperature 参数
+            criteria: 停止条件（生成预算和重复检测）
+            processor: 目标文字约束，为 None 时不约束
+            
+        Returns:
+            模型原始回复（陷入重复循环时去掉重复的部分）
+        """
+        max_length = prompt_tokens + criteria.budgets[0]
+        stopping_criteria = StoppingCriteriaList([criteria])
+        # 使用 ChatGLM 进行生成
+        # 捕获可能的 tokenizer 错误并重试
+        try:
+            response, history = self.model.chat(
+                self.tokenizer,
+                prompt,
+                history=[],
+                max_length=max_length,
+                top_p=top_p,
+                temperature=temperature,
+                logits_processor=self._logits_processor(processor),
+                stopping_criteria=stopping_criteria
+            )
+        except TypeError as e:
+            if 'padding_side' in str(e):
+                # 如果还是出现 padding_side 错误，尝试更彻底的修复
+                logger.warning(f"检测到 padding_side 错误，尝试修复: {str(e)}")
+                # 重新修复 tokenizer
+                if hasattr(self.tokenizer, '_pad'):
+                    original_pad = self.tokenizer._pad
+                    def patched_pad(*args, **kwargs):
+                        kwargs.pop('padding_side', None)
+                        return original_pad(*args, **kwargs)
+                    self.tokenizer._pad = patched_pad
+                # 重试（出错发生在编码提示词时，停止条件尚未使用）
                 response, history = self.model.chat(
                     self.tokenizer,
                     prompt,
                     history=[],
                     max_length=max_length,
                     top_p=top_p,
-                    temperature=temperature
+                    temperature=temperature,
+                    logits_processor=self._logits_processor(processor),
+                    stopping_criteria=StoppingCriteriaList([criteria])
                 )
-            except TypeError as e:
-                if 'padding_side' in str(e):
-                    # 如果还是出现 padding_side 错误，尝试更彻底的修复
-                    logger.warning(f"检测到 padding_side 错误，尝试修复: {str(e)}")
-                    # 重新修复 tokenizer
-                    if hasattr(self.tokenizer, '_pad'):
-                        original_pad = self.tokenizer._pad
-                        def patched_pad(*args, **kwargs):
-                            kwargs.pop('padding_side', None)
-                            return original_pad(*args, **kwargs)
-                        self.tokenizer._pad = patched_pad
-                    # 重试
-                    response, history = self.model.chat(
-                        self.tokenizer,
-                        prompt,
-                        history=[],
-                        max_length=max_length,
-                        top_p=top_p,
-                        temperature=temperature
-                    )
-                else:
-                    raise
-            
-            translated_text = response.strip()
-            
-            # 清理翻译结果，移除可能的提示词或注释
-            if target_language == "Japanese":
-                # 检查是否包含日文字符（平假名、片假名、汉字）
-                has_japanese = any('\u3040' <= char <= '\u309F' or '\u30A0' <= char <= '\u30FF' or '\u4E00' <= char <= '\u9FAF' for char in translated_text)
-                has_chinese = any('\u4e00' <= char <= '\u9fff' for char in translated_text)
-                # 检查是否包含日文特有的假名
-                has_hiragana_katakana = any('\u3040' <= char <= '\u309F' or '\u30A0' <= char <= '\u30FF' for char in translated_text)
-                
-                # 如果包含中文但没有日文假名，说明可能混入了中文
-                if has_chinese and not has_hiragana_katakana:
-                    logger.warning(f"翻译结果包含中文但没有日文假名，可能混入了中文")
-                    # 尝试从结果中提取日文部分
-                    lines = translated_text.split('\n')
-                    japanese_lines = []
-                    for line in lines:
-                        line = line.strip()
-                        # 优先保留包含日文假名的行
-                        if any('\u3040' <= char <= '\u309F' or '\u30A0' <= char <= '\u30FF' for char in line):
-                            japanese_lines.append(line)
-                        # 如果包含汉字但没有假名，可能是中文，跳过
-                        elif any('\u4e00' <= char <= '\u9fff' for char in line) and not any('\u3040' <= char <= '\u309F' or '\u30A0' <= char <= '\u30FF' for char in line):
-                            # 检查是否主要是中文（没有日文假名）
-                            continue
-                        # 保留其他非ASCII字符的行（可能是日文）
-                        elif not all(c.isascii() or c.isspace() or c in '.,;:!?()[]{}' for c in line):
-                            japanese_lines.append(line)
-                    
-                    if japanese_lines:
-                        translated_text = '\n'.join(japanese_lines)
-                    else:
-                        logger.warning(f"清理后没有找到日文内容，使用原始结果")
-                
-                # 移除可能的英文提示词
-                lines = translated_text.split('\n')
-                cleaned_lines = []
-                skip_keywords = ['Translation', 'Original text', 'Requirements', 'Note', '翻译', '原文', '要求', 'English', 'Japanese', '日本語']
-                
-                for line in lines:
-                    line = line.strip()
-                    # 跳过明显的提示词行
-                    if any(keyword in line for keyword in skip_keywords):
-                        continue
-                    # 跳过空行或只有标点的行
-                    if not line or line in ['：', ':', '-', '—']:
-                        continue
-                    # 优先保留包含日文假名的行
-                    if any('\u3040' <= char <= '\u309F' or '\u30A0' <= char <= '\u30FF' for char in line):
-                        cleaned_lines.append(line)
-                    # 如果整行主要是非ASCII字符（可能是日文），也保留
-                    elif not all(c.isascii() or c.isspace() or c in '.,;:!?()[]{}' for c in line):
-                        # 检查是否主要是非ASCII字符
-                        non_ascii_ratio = sum(1 for c in line if not c.isascii() and not c.isspace()) / max(len(line), 1)
-                        if non_ascii_ratio > 0.5:  # 至少50%是非ASCII字符
-                            cleaned_lines.append(line)
-                
-                if cleaned_lines:
-                    translated_text = '\n'.join(cleaned_lines)
-                else:
-                    # 如果清理后没有内容，使用原始结果但移除明显的提示词
-                    translated_text = response.strip()
-                    # 移除开头的提示词
-                    for keyword in ['Translation', '翻译结果', 'Translation (Japanese):', 'Translation (日本語):', 'Japanese (日本語 only):']:
-                        if translated_text.startswith(keyword):
-                            translated_text = translated_text[len(keyword):].strip()
-                            if translated_text.startswith(':'):
-                                translated_text = translated_text[1:].strip()
-            
-            elif target_language == "Korean":
-                # 检查是否包含韩文字符
-                has_korean = any('\uAC00' <= char <= '\uD7A3' for char in translated_text)
-                has_chinese = any('\u4e00' <= char <= '\u9fff' for char in translated_text)
-                
-                # 如果包含中文但没有韩文，说明翻译错误，尝试重新翻译或标记为失败
-                if has_chinese and not has_korean:
-                    logger.warning(f"翻译结果包含中文但没有韩文，可能翻译方向错误")
-                    # 尝试从结果中提取可能的韩文部分
-                    lines = translated_text.split('\n')
-                    korean_lines = []
-                    for line in lines:
-                        line = line.strip()
-                        # 只保留包含韩文字符的行
-                        if any('\uAC00' <= char <= '\uD7A3' for char in line):
-                            korean_lines.append(line)
-                    if korean_lines:
-                        translated_text = '\n'.join(korean_lines)
-                    else:
-                        # 如果没有韩文，标记为翻译失败
-                        logger.error(f"翻译结果没有韩文内容，返回空结果")
-                        return {
-                            "success": False,
-                            "error": "翻译结果不包含韩文，可能模型返回了错误的语言",
-                            "translated_text": ""
-                        }
-                
-                # 移除可能的英文提示词
-                lines = translated_text.split('\n')
-                cleaned_lines = []
-                skip_keywords = ['Translation', 'Original text', 'Requirements', 'Note', '翻译', '原文', '要求', 'English', 'Korean']
-                
-                for line in lines:
-                    line = line.strip()
-                    # 跳过明显的提示词行
-                    if any(keyword in line for keyword in skip_keywords):
-                        continue
-                    # 跳过空行或只有标点的行
-                    if not line or line in ['：', ':', '-', '—']:
-                        continue
-                    # 优先保留包含韩文字符的行
-                    if any('\uAC00' <= char <= '\uD7A3' for char in line):
-                        cleaned_lines.append(line)
-                    # 如果整行主要是非ASCII字符（可能是韩文），也保留
-                    elif not all(c.isascii() or c.isspace() or c in '.,;:!?()[]{}' for c in line):
-                        # 检查是否主要是非ASCII字符
-                        non_ascii_ratio = sum(1 for c in line if not c.isascii() and not c.isspace()) / max(len(line), 1)
-                        if non_ascii_ratio > 0.5:  # 至少50%是非ASCII字符
-                            cleaned_lines.append(line)
-                
-                if cleaned_lines:
-                    translated_text = '\n'.join(cleaned_lines)
-                else:
-                    # 如果清理后没有内容，使用原始结果但移除明显的提示词
-                    translated_text = response.strip()
-                    # 移除开头的提示词
-                    for keyword in ['Translation', '翻译结果', 'Translation (Korean):', 'Translation (한국어):', 'Korean (한국어 only):']:
-                        if translated_text.startswith(keyword):
-                            translated_text = translated_text[len(keyword):].strip()
-                            if translated_text.startswith(':'):
-                                translated_text = translated_text[1:].strip()
+            else:
+                raise
+        if criteria.reasons[0] == STOP_REPETITION:
+            response = self._decode_response(criteria.kept_ids())
+        return response
+    
+    def _build_result(self, response: str, source_language: str, target_language: str) -> Dict[str, Any]:
+        """
+        清理模型回复并构建翻译结果字典（规则见 postprocess 模块）
+        
+        Args:
+            response: 模型原始回复
+            source_language: 源语言
+            target_language: 目标语言
             
-            return {
-                "success": True,
-                "translated_text": translated_text,
-                "source_language": source_language,
-                "target_language": target_language
+        Returns:
+            包含翻译结果的字典
+        """
+        return postprocess(response, source_language, target_language)
+    
+    def translate_stream(
+        self,
+        text: str,
+        source_language: str = "English",
+        target_language: str = "Chinese",
+        max_length: Optional[int] = None,
+        top_p: Optional[float] = None,
+        temperature: Optional[float] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        流式翻译文本，边生成边返回
+        
+        生成过程中产出 {"translated_text": 已生成的原始文本, "finished": False}，
+        最后产出一条经过清理的完整结果（格式同 translate()），并附带
+        finished=True、首 token 延迟 ttft_ms、输出 token 数和每秒 token 数。
+        
+        Args:
+            text: 待翻译的文本
+            source_language: 源语言
+            target_language: 目标语言
+            max_length: 最大生成长度
+            top_p: top_p 参数
+            temperature: temperature 参数
+            
+        Yields:
+            部分结果或最终结果字典
+        """
+        if not text or not text.strip():
+            yield {
+                "success": False,
+                "error": "文本为空",
+                "translated_text": "",
+                "finished": True
             }
+            return
+        
+        if not self.ensure_loaded():
+            yield {
+                "success": False,
+                "error": self._not_loaded_message(),
+                "translated_text": "",
+                "finished": True
+            }
+            return
+        
+        try:
+            from config import MAX_LENGTH, TOP_P, TEMPERATURE
+            
+            max_length = max_length or MAX_LENGTH
+            top_p = top_p or TOP_P
+            temperature = temperature or TEMPERATURE
+            
+            memory_key = self._memory_key(text, source_language, target_language, max_length, top_p, temperature)
+            cached = self._lookup_memory(memory_key, source_language, target_language)
+            if cached:
+                cached["finished"] = True
+                yield cached
+                return
+            
+            # 不支持流式生成的模型退回一次性生成
+            if not hasattr(self.model, 'stream_chat'):
+                result = self.translate(text, source_language, target_language, max_length, top_p, temperature)
+                result["finished"] = True
+                yield result
+                return
+            
+            with tracer.span("translator.prompt"):
+                prompt = self._build_prompt(text, source_language, target_language)
+                prompt_tokens = len(self.tokenizer(self._build_chat_prompt(prompt))["input_ids"])
+                criteria = self._generation_criteria([
+                    generation_budget(self.count_tokens(text), target_language, prompt_tokens, max_length)
+                ])
+                processor = self._script_processor(target_language)
+            # span 包含调用方处理每条部分结果的时间
+            with tracer.span("translator.generate_stream") as span:
+                start = time.perf_counter()
+                first_token_at = None
+                response = ""
+                for response, _ in self.model.stream_chat(
+                    self.tokenizer,
+                    prompt,
+                    history=[],
+                    max_length=prompt_tokens + criteria.budgets[0],
+                    top_p=top_p,
+                    temperature=temperature,
+                    logits_processor=self._logits_processor(processor),
+                    stopping_criteria=StoppingCriteriaList([criteria])
+                ):
+                    if first_token_at is None and response:
+                        first_token_at = time.perf_counter()
+                    yield {
+                        "success": True,
+                        "translated_text": response,
+                        "finished": False
+                    }
+                end = time.perf_counter()
+                if criteria.reasons[0] == STOP_REPETITION:
+                    response = self._decode_response(criteria.kept_ids())
+                output_tokens = self.count_tokens(response)
+                if tracer.enabled:
+                    self._record_tokens(span, prompt_tokens, output_tokens)
+                    span.set(ttft_ms=((first_token_at or end) - start) * 1000)
+            
+            with tracer.span("translator.postprocess"):
+                result = self._build_result(response, source_language, target_language)
+            result.update(criteria.row_stats())
+            self._store_memory(memory_key, result)
+            
+            first_token_at = first_token_at or end
+            decode_time = end - first_token_at
+            result["finished"] = True
+            result["ttft_ms"] = (first_token_at - start) * 1000
+            result["output_tokens"] = output_tokens
+            result["tokens_per_second"] = output_tokens / decode_time if decode_time > 0 else 0.0
+            logger.info(
+                f"流式翻译完成: 首 token {result['ttft_ms']:.0f} ms，"
+                f"{output_tokens} tokens，{result['tokens_per_second']:.1f} tokens/s"
+            )
+            yield result
             
         except Exception as e:
-            logger.error(f"翻译失败: {str(e)}")
-            return {
+            logger.error(f"流式翻译失败: {str(e)}")
+            yield {
                 "success": False,
                 "error": str(e),
-                "translated_text": ""
+                "translated_text": "",
+                "finished": True
             }
     
     def translate_batch(
         self,
         texts: list,
         source_language: str = "English",
-        target_language: str = "Chinese"
+        target_language: str = "Chinese",
+        max_batch_size: Optional[int] = None,
+        max_batch_tokens: Optional[int] = None,
+        max_length: Optional[int] = None,
+        top_p: Optional[float] = None,
+        temperature: Optional[float] = None
     ) -> list:
         """
         批量翻译文本
         
+        将多条提示词填充后放入同一次 generate 调用，结果与 translate() 的返回格式一致。
+        
         Args:
             texts: 待翻译的文本列表
             source_language: 源语言
             target_language: 目标语言
+            max_batch_size: 单批最大条数
+            max_batch_tokens: 单批填充后的提示词 token 上限（条数 × 最长提示词长度）
+            max_length: 最大生成长度
+            top_p: top_p 参数
+            temperature: temperature 参数
             
         Returns:
-            翻译结果列表
-        """
-        results = []
-        for text in texts:
-            result = self.translate(
-                text,
-                source_language=source_language,
-                target_language=target_language
-            )
-            results.append(result)
+            翻译结果列表（与输入顺序一致）
+        """
+        from config import MAX_LENGTH, TOP_P, TEMPERATURE, BATCH_SIZE, BATCH_MAX_TOKENS
+        
+        max_batch_size = max(1, max_batch_size or BATCH_SIZE)
+        max_batch_tokens = max_batch_tokens or BATCH_MAX_TOKENS
+        max_length = max_length or MAX_LENGTH
+        top_p = top_p or TOP_P
+        temperature = temperature or TEMPERATURE
+        
+        loaded = any(text and text.strip() for text in texts) and self.ensure_loaded()
+        results = [None] * len(texts)
+        pending = []
+        memory_keys = {}
+        for idx, text in enumerate(texts):
+            if not text or not text.strip():
+                results[idx] = {
+                    "success": False,
+                    "error": "文本为空",
+                    "translated_text": ""
+                }
+            elif not loaded:
+                results[idx] = {
+                    "success": False,
+                    "error": self._not_loaded_message(),
+                    "translated_text": ""
+                }
+            else:
+                memory_key = self._memory_key(
+                    text, source_language, target_language, max_length, top_p, temperature
+                )
+                cached = self._lookup_memory(memory_key, source_language, target_language)
+                if cached:
+                    results[idx] = cached
+                else:
+                    memory_keys[idx] = memory_key
+                    pending.append(idx)
+        
+        if not pending:
+            return results
+        
+        # 构建提示词并按长度降序排列，减少同批内的填充浪费
+        prompts = {}
+        prompt_lengths = {}
+        with tracer.span("translator.prompt", batch_size=len(pending)):
+            for idx in pending:
+                prompt = self._build_chat_prompt(
+                    self._build_prompt(texts[idx], source_language, target_language)
+                )
+                prompts[idx] = prompt
+                prompt_lengths[idx] = len(self.tokenizer(prompt)["input_ids"])
+        pending.sort(key=lambda idx: prompt_lengths[idx], reverse=True)
+        
+        for batch in self._plan_batches(pending, prompt_lengths, max_batch_size, max_batch_tokens):
+            try:
+                with tracer.span("translator.generate_batch", batch_size=len(batch)) as span:
+                    criteria = self._generation_criteria([
+                        generation_budget(self.count_tokens(texts[idx]), target_language, prompt_lengths[idx], max_length)
+                        for idx in batch
+                    ])
+                    processor = self._script_processor(target_language)
+                    # 单条的批次可以直接从前缀缓存开始生成（填充后的多条提示词位置不一致，不使用缓存）
+                    response = None
+                    if len(batch) == 1:
+                        response = self._generate_with_prefix(
+                            prompts[batch[0]], source_language, target_language, max_length, top_p, temperature,
+                            criteria, processor
+                        )
+                    if response is not None:
+                        responses = [response]
+                    else:
+                        responses = self._generate_batch(
+                            [prompts[idx] for idx in batch],
+                            max_length=max_length,
+                            top_p=top_p,
+                            temperature=temperature,
+                            criteria=criteria,
+                            processor=processor
+                        )
+                    if tracer.enabled:
+                        self._record_tokens(
+                            span,
+                            sum(prompt_lengths[idx] for idx in batch),
+                            sum(self.count_tokens(response) for response in responses)
+                        )
+                with tracer.span("translator.postprocess", batch_size=len(batch)):
+                    batch_results = postprocess_batch(responses, source_language, target_language)
+                for row, (idx, result) in enumerate(zip(batch, batch_results)):
+                    result.update(criteria.row_stats(row))
+                    results[idx] = result
+                    self._store_memory(memory_keys[idx], result)
+            except Exception as e:
+                # 批量生成失败时退回逐条翻译，保证每条都有结果
+                logger.warning(f"批量生成失败，退回逐条翻译 ({len(batch)} 条): {str(e)}")
+                for idx in batch:
+                    results[idx] = self.translate(
+                        texts[idx],
+                        source_language=source_language,
+                        target_language=target_language,
+                        max_length=max_length,
+                        top_p=top_p,
+                        temperature=temperature
+                    )
+        
         return results
-
+    
+    @staticmethod
+    def _plan_batches(
+        indices: List[int],
+        prompt_lengths: Dict[int, int],
+        max_batch_size: int,
+        max_batch_tokens: int
+    ) -> List[List[int]]:
+        """
+        按条数和 token 预算切分批次
+        
+        Args:
+            indices: 已按提示词长度降序排列的文本下标
+            prompt_lengths: 下标到提示词 token 数的映射
+            max_batch_size: 单批最大条数
+            max_batch_tokens: 单批填充后的提示词 token 上限
+            
+        Returns:
+            批次列表，每个批次是下标列表
+        """
+        batches = []
+        current = []
+        for idx in indices:
+            # 降序排列时批内最长的提示词就是第一条
+            longest = prompt_lengths[current[0]] if current else prompt_lengths[idx]
+            if current and (
+                len(current) >= max_batch_size
+                or (len(current) + 1) * longest > max_batch_tokens
+            ):
+                batches.append(current)
+                current = []
+            current.append(idx)
+        if current:
+            batches.append(current)
+        return batches
+    
+    def prefix_cache_stats(self) -> Dict[str, Any]:
+        """
+        提示词前缀缓存统计
+        
+        Returns:
+            字典：entries（已缓存的语言对数）、hits、misses、cached_tokens（命中时跳过预填充的 token 总数）
+        """
+        with self._prefix_lock:
+            stats = dict(self._prefix_stats)
+        stats["entries"] = sum(1 for entry in self._prefix_cache.values() if entry is not None)
+        return stats
+    
+    def _get_prefix_entry(self, source_language: str, target_language: str):
+        """
+        获取（必要时计算）语言对的提示词前缀 KV 缓存
+        
+        前缀是对话格式提示词中原文之前的部分（指令说明等），每个语言对只预填充一次。
+        最后一个 token 可能与原文开头合并成不同的 token，不放入缓存。
+        
+        Args:
+            source_language: 源语言
+            target_language: 目标语言
+            
+        Returns:
+            (前缀 token 列表, past_key_values)，无法缓存时返回 None
+        """
+        key = (source_language, target_language)
+        if key in self._prefix_cache:
+            return self._prefix_cache[key]
+        with self._prefix_lock:
+            if key in self._prefix_cache:
+                return self._prefix_cache[key]
+            entry = None
+            try:
+                chat_prompt = self._build_chat_prompt(
+                    self._build_prompt(_PREFIX_SENTINEL, source_language, target_language)
+                )
+                prefix = chat_prompt[:chat_prompt.index(_PREFIX_SENTINEL)]
+                prefix_ids = self.tokenizer(prefix)["input_ids"][:-1]
+                if prefix_ids:
+                    input_ids = torch.tensor([prefix_ids], device=self.model.device)
+                    with torch.no_grad():
+                        outputs = self.model(
+                            input_ids=input_ids,
+                            attention_mask=torch.ones_like(input_ids),
+                            use_cache=True
+                        )
+                    entry = (prefix_ids, outputs.past_key_values)
+                    logger.info(f"已缓存 {source_language} → {target_language} 的提示词前缀: {len(prefix_ids)} tokens")
+            except Exception as e:
+                logger.warning(f"提示词前缀缓存不可用 ({source_language} → {target_language}): {str(e)}")
+            self._prefix_cache[key] = entry
+            return entry
+    
+    def _generate_with_prefix(
+        self,
+        chat_prompt: str,
+        source_language: str,
+        target_language: str,
+        max_length: int,
+        top_p: float,
+        temperature: float,
+        criteria: GenerationCriteria,
+        processor: Optional[ScriptLogitsProcessor] = None
+    ) -> Optional[str]:
+        """
+        从缓存的提示词前缀开始生成单条回复
+        
+        复制前缀的 KV 缓存，只预填充前缀之后的 token，然后逐步采样解码（与连续批处理引擎相同）。
+        不使用 generate：ChatGLM2 的 prepare_inputs_for_generation 在第一步不会按传入的缓存裁剪
+        input_ids，会把整段提示词叠加在缓存上重新计算。
+        
+        Args:
+            chat_prompt: 对话格式的提示词
+            source_language: 源语言
+            target_language: 目标语言
+            max_length: 最大生成长度
+            top_p: top_p 参数
+            temperature: temperature 参数
+            criteria: 停止条件（生成预算和重复检测）
+            processor: 目标文字约束，为 None 时不约束
+            
+        Returns:
+            模型回复，未启用缓存或提示词与前缀不匹配时返回 None（由调用方走普通生成）
+        """
+        if not self.prefix_cache_enabled:
+            return None
+        entry = self._get_prefix_entry(source_language, target_language)
+        if entry is None:
+            return None
+        prefix_ids, prefix_past = entry
+        
+        input_ids = self.tokenizer(chat_prompt, return_tensors="pt")["input_ids"]
+        cached = len(prefix_ids)
+        total = input_ids.shape[1]
+        if total <= cached or input_ids[0, :cached].tolist() != prefix_ids:
+            self._count_prefix("miss")
+            return None
+        
+        input_ids = input_ids.to(self.model.device)
+        device = input_ids.device
+        max_total = max(min(max_length, total + criteria.budgets[0]), total + 1)
+        warpers = LogitsProcessorList([TemperatureLogitsWarper(temperature), TopPLogitsWarper(top_p)])
+        try:
+            with tracer.span("translator.prefill", cached_tokens=cached, new_tokens=total - cached):
+                # 模型前向会在 Cache 对象上原地追加，必须复制
+                logits, past = self._forward_last(
+                    input_ids=input_ids[:, cached:],
+                    past_key_values=copy.deepcopy(prefix_past),
+                    position_ids=torch.arange(cached, total, device=device).unsqueeze(0),
+                    attention_mask=torch.ones((1, total), dtype=torch.long, device=device)
+                )
+            generated = input_ids
+            while True:
+                scores = logits.float()
+                if processor is not None:
+                    scores = processor(generated, scores)
+                scores = warpers(generated, scores)
+                token = torch.multinomial(torch.softmax(scores, dim=-1), num_samples=1)
+                generated = torch.cat([generated, token], dim=1)
+                length = generated.shape[1]
+                if bool(criteria(generated)) or length >= max_total:
+                    break
+                logits, past = self._forward_last(
+                    input_ids=token,
+                    past_key_values=past,
+                    position_ids=torch.tensor([[length - 1]], device=device),
+                    attention_mask=torch.ones((1, length), dtype=torch.long, device=device)
+                )
+        except Exception as e:
+            # 模型不支持从外部传入的缓存继续生成，之后不再尝试
+            logger.warning(f"从提示词前缀缓存生成失败，关闭前缀缓存: {str(e)}")
+            self.prefix_cache_enabled = False
+            criteria.reset()
+            if processor is not None:
+                processor.reset()
+            return None
+        
+        self._count_prefix("hit", cached)
+        return self._decode_response(generated[0, total:total + criteria.kept_tokens()].tolist())
+    
+    def _count_prefix(self, result: str, cached_tokens: int = 0):
+        """记录一次前缀缓存命中或未命中（多个页面线程同时调用）"""
+        with self._prefix_lock:
+            self._prefix_stats["hits" if result == "hit" else "misses"] += 1
+            self._prefix_stats["cached_tokens"] += cached_tokens
+        tracer.count("prefix_cache_total", result=result)
+    
+    def _forward_last(self, **kwargs):
+        """
+        调用模型前向，只计算最后一个位置的 logits
+        
+        Returns:
+            (最后一个位置的 logits, past_key_values)
+        """
+        if self._logits_kwargs is None:
+            params = inspect.signature(self.model.forward).parameters
+            if "return_last_logit" in params:
+                self._logits_kwargs = {"return_last_logit": True}
+            elif "logits_to_keep" in params:
+                self._logits_kwargs = {"logits_to_keep": 1}
+            elif "num_logits_to_keep" in params:
+                self._logits_kwargs = {"num_logits_to_keep": 1}
+            else:
+                self._logits_kwargs = {}
+        with torch.no_grad():
+            outputs = self.model(use_cache=True, **kwargs, **self._logits_kwargs)
+        return outputs.logits[:, -1], outputs.past_key_values
+    
+    def _build_chat_prompt(self, prompt: str) -> str:
+        """
+        将提示词包装成与 model.chat 相同的对话格式
+        
+        Args:
+            prompt: 提示词
+            
+        Returns:
+            对话格式的提示词（tokenizer 不支持时原样返回）
+        """
+        if hasattr(self.tokenizer, 'build_prompt'):
+            return self.tokenizer.build_prompt(prompt, history=[])
+        return prompt
+    
+    def _generate_batch(
+        self,
+        prompts: List[str],
+        max_length: int,
+        top_p: float,
+        temperature: float,
+        criteria: GenerationCriteria,
+        processor: Optional[ScriptLogitsProcessor] = None
+    ) -> List[str]:
+        """
+        对一批提示词执行一次填充后的 generate
+        
+        各行按自身的生成预算或重复循环提前结束，全部结束时 generate 返回。
+        
+        Args:
+            prompts: 对话格式的提示词列表
+            max_length: 最大生成长度
+            top_p: top_p 参数
+            temperature: temperature 参数
+            criteria: 每行的停止条件（生成预算和重复检测）
+            processor: 目标文字约束，为 None 时不约束
+            
+        Returns:
+            与提示词一一对应的模型回复
+        """
+        # 仅解码器模型需要左侧填充，生成的 token 才能在各行末尾对齐
+        self.tokenizer.padding_side = "left"
+        inputs = self.tokenizer(prompts, return_tensors="pt", padding=True)
+        inputs = inputs.to(self.model.device)
+        prompt_length = inputs["input_ids"].shape[1]
+        
+        with torch.no_grad():
+            outputs = self.model.generate(
+                **inputs,
+                max_length=max(min(max_length, prompt_length + max(criteria.budgets)), prompt_length + 1),
+                do_sample=True,
+                top_p=top_p,
+                temperature=temperature,
+                pad_token_id=self.tokenizer.pad_token_id,
+                logits_processor=self._logits_processor(processor),
+                stopping_criteria=StoppingCriteriaList([criteria])
+            )
+        
+        return [
+            self._decode_response(output[prompt_length:prompt_length + criteria.kept_tokens(row)])
+            for row, output in enumerate(outputs.tolist())
+        ]
+    
+    def _decode_response(self, token_ids: List[int]) -> str:
+        """
+        把生成的 token 解码为模型回复（与 model.chat 的处理一致）
+        
+        Args:
+            token_ids: 生成的 token
+            
+        Returns:
+            模型回复
+        """
+        response = self.tokenizer.decode(token_ids, skip_special_tokens=True)
+        if hasattr(self.model, 'process_response'):
+            response = self.model.process_response(response)
+        return response
+    
+    def _eos_token_ids(self) -> set:
+        """模型生成配置和 tokenizer 中的全部结束 token"""
+        eos_ids = set()
+        generation_config = getattr(self.model, "generation_config", None)
+        for eos in (getattr(generation_config, "eos_token_id", None), self.tokenizer.eos_token_id):
+            if isinstance(eos, int):
+                eos_ids.add(eos)
+            elif eos:
+                eos_ids.update(eos)
+        return eos_ids
+    
+    def _generation_criteria(self, budgets: List[int]) -> GenerationCriteria:
+        """
+        创建停止条件
+        
+        Args:
+            budgets: 每行最多生成的 token 数（见 generation_budget）
+            
+        Returns:
+            GenerationCriteria 实例
+        """
+        from config import REPETITION_STOP_TOKENS
+        return GenerationCriteria(budgets, self._eos_token_ids(), REPETITION_STOP_TOKENS)
+    
+    def _script_processor(self, target_language: str) -> Optional[ScriptLogitsProcessor]:
+        """
+        创建目标文字约束（见 script_constraint 模块）
+        
+        Args:
+            target_language: 目标语言
+            
+        Returns:
+            ScriptLogitsProcessor 实例，未启用约束时返回 None
+        """
+        if self.script_constraint == "off":
+            return None
+        if self._token_scripts is None:
+            with self._token_scripts_lock:
+                if self._token_scripts is None:
+                    self._token_scripts = TokenScripts(self.tokenizer)
+        from config import SCRIPT_CONSTRAINT_BIAS
+        return script_processor(self._token_scripts, target_language, self.script_constraint, SCRIPT_CONSTRAINT_BIAS)
+    
+    @staticmethod
+    def _logits_processor(processor: Optional[ScriptLogitsProcessor]) -> Optional[LogitsProcessorList]:
+        """包装成 generate 的 logits_processor 参数（model.chat 会在列表中追加自己的处理器，每次调用都新建）"""
+        return LogitsProcessorList([processor]) if processor is not None else None
@@ -0,0 +1,529 @@
+"""
+多进程翻译工作池
+在纯 CPU 部署中把请求分发到多个各自持有模型的工作进程，每个进程固定线程数（并尽量绑定到不同的 CPU 核心），
+接口与 ChatGLMTranslator 的 translate / translate_batch 一致
+"""
+import functools
+import itertools
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing.connection import wait as wait_connections
+from typing import Optional, Dict, Any, Callable, List, Iterator
+
+logger = logging.getLogger(__name__)
+
+# 工作进程崩溃时，进行中的请求最多重新提交的次数
+_MAX_ATTEMPTS = 2
+# 工作进程在就绪前连续退出多少次后不再重启（通常是模型或环境问题）
+_MAX_START_FAILURES = 3
+
+
+def _worker_main(worker_id: int, factory: Callable, threads: int, cpus: Optional[List[int]], requests, responses):
+    """工作进程入口：创建翻译器后循环处理请求"""
+    # 必须在导入 torch 之前设置，否则 OpenMP 线程池已按全部核心创建。spawn 会先重新导入主模块，
+    # 因此主模块在导入时不能导入 torch 或创建翻译器（见 gradio_app.init_translator）
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    os.environ["MKL_NUM_THREADS"] = str(threads)
+    if cpus and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+    try:
+        translator = factory()
+    except Exception as e:
+        responses.send(("failed", worker_id, None, str(e)))
+        return
+    responses.send(("ready", worker_id, None, None))
+
+    while True:
+        message = requests.get()
+        if message is None:
+            break
+        request_id, method, args, kwargs = message
+        if method == "ping":
+            responses.send(("pong", worker_id, request_id, None))
+            continue
+        try:
+            result = getattr(translator, method)(*args, **kwargs)
+            responses.send(("result", worker_id, request_id, result))
+        except Exception as e:
+            responses.send(("error", worker_id, request_id, str(e)))
+
+
+class _Pending:
+    """已分发、等待结果的请求"""
+
+    __slots__ = ("method", "args", "kwargs", "future", "attempts")
+
+    def __init__(self, method: str, args: tuple, kwargs: dict):
+        self.method = method
+        self.args = args
+        self.kwargs = kwargs
+        self.future = Future()
+        self.attempts = 0
+
+
+class _Worker:
+    """父进程中对一个工作进程的记录"""
+
+    def __init__(self, worker_id: int, cpus: Optional[List[int]]):
+        self.worker_id = worker_id
+        self.cpus = cpus
+        self.process = None
+        self.requests = None
+        # 结果管道的读端；每个进程独占一条，进程被强制终止时不会破坏其他进程的结果通道
+        self.responses = None
+        self.ready = False
+        # 初始化失败的原因（模型加载失败通常是配置问题，不反复重启）
+        self.error = None
+        self.in_flight: Dict[int, _Pending] = {}
+        self.ping_sent_at = None
+        self.started_at = 0.0
+        self.handled = 0
+        self.restarts = 0
+        # 就绪前连续退出的次数
+        self.start_failures = 0
+
+
+def _default_factory(model_path: Optional[str], device: str):
+    from translator import ChatGLMTranslator
+    return ChatGLMTranslator(model_path=model_path, device=device, lazy=False)
+
+
+class TranslatorPool:
+    """多进程翻译工作池"""
+
+    def __init__(
+        self,
+        num_workers: Optional[int] = None,
+        threads_per_worker: Optional[int] = None,
+        translator_factory: Optional[Callable] = None,
+        model_path: Optional[str] = None,
+        device: str = "cpu",
+        health_check_interval: Optional[float] = None,
+        start_timeout: Optional[float] = None,
+        wait_ready: bool = True
+    ):
+        """
+        初始化工作池并启动工作进程
+
+        Args:
+            num_workers: 工作进程数
+            threads_per_worker: 每个进程的计算线程数，0 或 None 表示按 CPU 核心数平均分配
+            translator_factory: 在工作进程中创建翻译器的可序列化函数，默认创建 ChatGLMTranslator
+            model_path: 默认工厂使用的模型路径
+            device: 默认工厂使用的设备
+            health_check_interval: 健康检查间隔（秒）
+            start_timeout: 等待工作进程加载模型的最长时间（秒）
+            wait_ready: 是否等待所有工作进程就绪后再返回
+        """
+        from config import (
+            TRANSLATOR_POOL_WORKERS,
+            TRANSLATOR_POOL_THREADS,
+            TRANSLATOR_POOL_HEALTH_INTERVAL,
+            TRANSLATOR_POOL_START_TIMEOUT
+        )
+
+        self.num_workers = max(1, num_workers or TRANSLATOR_POOL_WORKERS or 1)
+        cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+        threads = threads_per_worker or TRANSLATOR_POOL_THREADS or max(1, len(cpus) // self.num_workers)
+        self.threads_per_worker = threads
+        self.device = device
+        # PDFProcessor 据此决定并行翻译的页数
+        self.concurrency = self.num_workers
+        self.health_check_interval = health_check_interval or TRANSLATOR_POOL_HEALTH_INTERVAL
+        self.start_timeout = start_timeout or TRANSLATOR_POOL_START_TIMEOUT
+        self._factory = translator_factory or functools.partial(_default_factory, model_path, device)
+        # 分段时在主进程中统计 token 数使用的 tokenizer（自定义工厂未指定 model_path 时由工作进程统计）
+        if model_path is None and translator_factory is None:
+            from config import MODEL_PATH
+            model_path = MODEL_PATH
+        self._tokenizer_path = model_path
+        self._tokenizer = None
+        self._tokenizer_lock = threading.Lock()
+
+        self._ctx = multiprocessing.get_context("spawn")
+        # 已重启进程的旧结果管道，由收集线程关闭
+        self._retired = []
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._request_ids = itertools.count()
+        self._closed = False
+
+        # 核心数足够时给每个进程分配互不重叠的核心
+        pin = len(cpus) >= self.num_workers * threads
+        self._workers = [
+            _Worker(i, cpus[i * threads:(i + 1) * threads] if pin else None)
+            for i in range(self.num_workers)
+        ]
+        with self._lock:
+            for worker in self._workers:
+                self._start_worker(worker)
+
+        self._collector = threading.Thread(target=self._collect_loop, name="pool-collector", daemon=True)
+        self._collector.start()
+        self._monitor = threading.Thread(target=self._monitor_loop, name="pool-monitor", daemon=True)
+        self._monitor.start()
+
+        logger.info(f"翻译工作池: {self.num_workers} 个进程，每个 {threads} 个线程{'（已绑定核心）' if pin else ''}")
+        if wait_ready:
+            self.wait_ready(self.start_timeout)
+
+    # ------------------------------------------------------------------
+    # 工作进程管理
+    # ------------------------------------------------------------------
+
+    def _start_worker(self, worker: _Worker):
+        """启动（或重启）工作进程，调用方需持有锁"""
+        worker.requests = self._ctx.Queue()
+        worker.responses, writer = self._ctx.Pipe(duplex=False)
+        worker.ready = False
+        worker.ping_sent_at = None
+        worker.started_at = time.monotonic()
+        worker.process = self._ctx.Process(
+            target=_worker_main,
+            args=(worker.worker_id, self._factory, self.threads_per_worker, worker.cpus,
+                  worker.requests, writer),
+            name=f"translator-worker-{worker.worker_id}",
+            daemon=True
+        )
+        worker.process.start()
+        writer.close()
+
+    def _restart_worker(self, worker: _Worker, reason: str):
+        """
+        终止并重启工作进程，进行中的请求重新分发，调用方需持有锁
+
+        Returns:
+            旧进程，由调用方在释放锁之后 join（等待退出期间不阻塞请求分发）
+        """
+        logger.warning(f"工作进程 {worker.worker_id} {reason}，正在重启")
+        old_process = worker.process
+        if old_process.is_alive():
+            old_process.terminate()
+        if worker.responses is not None:
+            self._retired.append(worker.responses)
+        orphans = list(worker.in_flight.values())
+        worker.in_flight.clear()
+        worker.restarts += 1
+        self._start_worker(worker)
+
+        for pending in orphans:
+            if pending.attempts < _MAX_ATTEMPTS:
+                self._dispatch(pending)
+            else:
+                pending.future.set_exception(RuntimeError(f"工作进程 {worker.worker_id} {reason}"))
+        self._changed.notify_all()
+        return old_process
+
+    def _mark_failed(self, worker: _Worker, error: str):
+        """工作进程无法初始化，不再使用，进行中的请求交给其他进程，调用方需持有锁"""
+        logger.error(f"工作进程 {worker.worker_id} 初始化失败: {error}")
+        worker.error = error
+        orphans = list(worker.in_flight.values())
+        worker.in_flight.clear()
+        for pending in orphans:
+            self._dispatch(pending)
+        self._changed.notify_all()
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """
+        等待所有工作进程加载完模型
+
+        Args:
+            timeout: 最长等待时间（秒）
+
+        Returns:
+            是否全部就绪
+        """
+        deadline = time.monotonic() + (timeout or self.start_timeout)
+        with self._changed:
+            while not all(worker.ready or worker.error for worker in self._workers):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    logger.warning("等待工作进程就绪超时")
+                    return False
+                self._changed.wait(remaining)
+            return all(worker.ready for worker in self._workers)
+
+    def _collect_loop(self):
+        while not self._closed:
+            with self._changed:
+                for connection in self._retired:
+                    connection.close()
+                self._retired.clear()
+                readers = {worker.responses: worker for worker in self._workers if worker.responses is not None}
+            if not readers:
+                time.sleep(0.5)
+                continue
+            for connection in wait_connections(list(readers), timeout=0.5):
+                try:
+                    message = connection.recv()
+                except (EOFError, OSError):
+                    # 进程已退出，由监控线程重启
+                    with self._changed:
+                        worker = readers[connection]
+                        if worker.responses is connection:
+                            worker.responses = None
+                            connection.close()
+                    continue
+                self._handle_response(readers[connection], connection, *message)
+
+    def _handle_response(self, worker: _Worker, connection, kind: str, worker_id: int,
+                         request_id: Optional[int], payload: Any):
+        with self._changed:
+            if worker.responses is not connection:
+                # 进程已被重启，旧进程的结果不再处理（进行中的请求已重新分发）
+                return
+            if kind == "ready":
+                worker.ready = True
+                worker.start_failures = 0
+                logger.info(f"工作进程 {worker_id} 已就绪，用时 {time.monotonic() - worker.started_at:.1f}s")
+            elif kind == "failed":
+                self._mark_failed(worker, payload)
+            elif kind == "pong":
+                worker.ping_sent_at = None
+            else:
+                pending = worker.in_flight.pop(request_id, None)
+                worker.handled += 1
+                if pending is not None and not pending.future.done():
+                    if kind == "result":
+                        pending.future.set_result(payload)
+                    else:
+                        pending.future.set_exception(RuntimeError(payload))
+            self._changed.notify_all()
+
+    def _monitor_loop(self):
+        while not self._closed:
+            time.sleep(self.health_check_interval)
+            stopped = []
+            with self._changed:
+                if self._closed:
+                    break
+                now = time.monotonic()
+                for worker in self._workers:
+                    if worker.error:
+                        continue
+                    if not worker.process.is_alive():
+                        reason = f"异常退出（退出码 {worker.process.exitcode}）"
+                        if not worker.ready:
+                            # 加载模型期间退出（例如内存不足被系统终止），多次失败后不再重启
+                            worker.start_failures += 1
+                            if worker.start_failures >= _MAX_START_FAILURES:
+                                self._mark_failed(worker, f"启动时{reason}，已重试 {worker.start_failures} 次")
+                                stopped.append(worker.process)
+                                continue
+                        stopped.append(self._restart_worker(worker, reason))
+                    elif not worker.ready:
+                        if now - worker.started_at > self.start_timeout:
+                            stopped.append(self._restart_worker(worker, "启动超时"))
+                    elif worker.ping_sent_at is not None:
+                        # 空闲时发出的心跳超过两个检查周期仍未响应，认为进程已卡死
+                        if now - worker.ping_sent_at > 2 * self.health_check_interval:
+                            stopped.append(self._restart_worker(worker, "心跳无响应"))
+                    elif not worker.in_flight:
+                        # 正在翻译的进程无法响应心跳，只检查空闲进程
+                        worker.ping_sent_at = now
+                        worker.requests.put((next(self._request_ids), "ping", (), {}))
+            for process in stopped:
+                process.join(timeout=5)
+
+    # ------------------------------------------------------------------
+    # 请求分发
+    # ------------------------------------------------------------------
+
+    def _dispatch(self, pending: _Pending):
+        """把请求交给进行中请求最少的就绪进程，调用方需持有锁"""
+        usable = [worker for worker in self._workers if not worker.error]
+        if not usable:
+            pending.future.set_exception(RuntimeError(f"工作进程初始化失败: {self._workers[0].error}"))
+            return
+        # 没有就绪进程时交给启动中的进程，它就绪后按顺序处理
+        candidates = [worker for worker in usable if worker.ready] or usable
+        worker = min(candidates, key=lambda w: len(w.in_flight))
+        request_id = next(self._request_ids)
+        pending.attempts += 1
+        worker.in_flight[request_id] = pending
+        worker.requests.put((request_id, pending.method, pending.args, pending.kwargs))
+
+    def _submit(self, method: str, *args, **kwargs) -> Future:
+        if self._closed:
+            raise RuntimeError("工作池已关闭")
+        pending = _Pending(method, args, kwargs)
+        with self._changed:
+            self._dispatch(pending)
+        return pending.future
+
+    def translate(
+        self,
+        text: str,
+        source_language: str = "English",
+        target_language: str = "Chinese",
+        **kwargs
+    ) -> Dict[str, Any]:
+        """
+        翻译文本，由空闲的工作进程处理
+
+        Args:
+            text: 待翻译的文本
+            source_language: 源语言
+            target_language: 目标语言
+            **kwargs: 透传给 ChatGLMTranslator.translate 的生成参数
+
+        Returns:
+            包含翻译结果的字典
+        """
+        try:
+            return self._submit("translate", text, source_language, target_language, **kwargs).result()
+        except Exception as e:
+            logger.error(f"翻译失败: {str(e)}")
+            return {
+                "success": False,
+                "error": str(e),
+                "translated_text": ""
+            }
+
+    def translate_batch(
+        self,
+        texts: list,
+        source_language: str = "English",
+        target_language: str = "Chinese",
+        **kwargs
+    ) -> list:
+        """
+        批量翻译，文本按顺序均分给各工作进程，各进程内部再批量生成
+
+        Args:
+            texts: 待翻译的文本列表
+            source_language: 源语言
+            target_language: 目标语言
+            **kwargs: 透传给 ChatGLMTranslator.translate_batch 的参数
+
+        Returns:
+            翻译结果列表（与输入顺序一致）
+        """
+        if not texts:
+            return []
+        shard_size = -(-len(texts) // self.num_workers)
+        shards = [texts[i:i + shard_size] for i in range(0, len(texts), shard_size)]
+        futures = [
+            self._submit("translate_batch", shard, source_language, target_language, **kwargs)
+            for shard in shards
+        ]
+
+        results = []
+        for shard, future in zip(shards, futures):
+            try:
+                results.extend(future.result())
+            except Exception as e:
+                logger.error(f"批量翻译失败 ({len(shard)} 条): {str(e)}")
+                results.extend(
+                    {"success": False, "error": str(e), "translated_text": ""} for _ in shard
+                )
+        return results
+
+    def translate_stream(
+        self,
+        text: str,
+        source_language: str = "English",
+        target_language: str = "Chinese",
+        **kwargs
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        与 ChatGLMTranslator.translate_stream 接口一致；工作进程不回传中间结果，只产出最终结果
+
+        Yields:
+            最终结果（finished=True）
+        """
+        result = self.translate(text, source_language, target_language, **kwargs)
+        result["finished"] = True
+        yield result
+
+    def chunk_token_budget(self, source_language: str, target_language: str) -> int:
+        """由工作进程按其 tokenizer 计算分段 token 预算"""
+        return self._submit("chunk_token_budget", source_language, target_language).result()
+
+    def count_tokens(self, text: str) -> int:
+        """
+        统计文本的 token 数（不含特殊 token），与工作进程中的翻译器一致
+
+        分段时会对每个段落、句子调用，因此在主进程中加载同一个 tokenizer（不加载模型），
+        避免排在正在翻译的请求之后；无法加载时交给工作进程统计。
+
+        Args:
+            text: 文本
+
+        Returns:
+            token 数
+        """
+        tokenizer = self._load_tokenizer()
+        if tokenizer is None:
+            return self._submit("count_tokens", text).result()
+        return len(tokenizer.encode(text, add_special_tokens=False))
+
+    def _load_tokenizer(self):
+        if self._tokenizer is not None or self._tokenizer_path is None:
+            return self._tokenizer
+        with self._tokenizer_lock:
+            if self._tokenizer is None and self._tokenizer_path is not None:
+                try:
+                    from transformers import AutoTokenizer
+                    self._tokenizer = AutoTokenizer.from_pretrained(self._tokenizer_path, trust_remote_code=True)
+                except Exception as e:
+                    logger.warning(f"主进程加载 tokenizer 失败，由工作进程统计 token 数: {str(e)}")
+                    self._tokenizer_path = None
+        return self._tokenizer
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取工作池状态
+
+        Returns:
+            每个工作进程的存活、就绪、进行中请求数、已处理请求数和重启次数
+        """
+        with self._lock:
+            return {
+                "workers": [
+                    {
+                        "worker_id": worker.worker_id,
+                        "pid": worker.process.pid,
+                        "alive": worker.process.is_alive(),
+                        "ready": worker.ready,
+                        "error": worker.error,
+                        "in_flight": len(worker.in_flight),
+                        "handled": worker.handled,
+                        "restarts": worker.restarts
+                    }
+                    for worker in self._workers
+                ],
+                "threads_per_worker": self.threads_per_worker
+            }
+
+    def shutdown(self):
+        """停止所有工作进程"""
+        with self._changed:
+            if self._closed:
+                return
+            self._closed = True
+            for worker in self._workers:
+                if worker.process.is_alive():
+                    worker.requests.put(None)
+        for worker in self._workers:
+            worker.process.join(timeout=10)
+            if worker.process.is_alive():
+                worker.process.terminate()
+            for pending in worker.in_flight.values():
+                if not pending.future.done():
+                    pending.future.set_exception(RuntimeError("工作池已关闭"))
+        self._collector.join(timeout=2)
+        for connection in self._retired + [worker.responses for worker in self._workers]:
+            if connection is not None:
+                connection.close()
@@ -2,6 +2,7 @@
 工具函数
 """
 import os
+import sys
 import logging
 from typing import Optional
 
@@ -72,3 +73,46 @@ def validate_language(language: str) -> bool:
     from config import SUPPORTED_LANGUAGES
     return language in SUPPORTED_LANGUAGES
 
+
+
+def get_process_memory(pid: Optional[int] = None) -> dict:
+    """
+    获取进程内存占用（MB），用于估算单机可运行的工作进程数
+    
+    Linux 下读取 /proc/<pid>/smaps_rollup：
+    rss 为常驻内存，pss 按共享进程数均摊共享页，uss 为进程独占的页（即每多一个进程新增的开销），
+    shared 为与其他进程（或页缓存中的内存映射权重）共享的页。
+    其他平台只返回当前进程的峰值 RSS（Windows 上返回空字典）。
+    
+    Args:
+        pid: 进程号，默认当前进程
+        
+    Returns:
+        内存占用字典
+    """
+    path = f"/proc/{pid or 'self'}/smaps_rollup"
+    try:
+        fields = {}
+        with open(path, "r") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0].endswith(":") and parts[1].isdigit():
+                    fields[parts[0][:-1]] = int(parts[1]) / 1024
+        return {
+            "rss_mb": fields.get("Rss", 0.0),
+            "pss_mb": fields.get("Pss", 0.0),
+            "uss_mb": fields.get("Private_Clean", 0.0) + fields.get("Private_Dirty", 0.0),
+            "shared_mb": fields.get("Shared_Clean", 0.0) + fields.get("Shared_Dirty", 0.0)
+        }
+    except OSError:
+        pass
+    
+    try:
+        import resource
+    except ImportError:
+        # Windows 没有 resource 模块
+        return {}
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 上 ru_maxrss 单位是字节，Linux 上是 KB
+    peak_mb = peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+    return {"peak_rss_mb": peak_mb}